@@ -0,0 +1,104 @@
+"""
+RNTuple benchmark
+==================
+
+This standalone script compares reading the same synthetic EventNtuple-like data from a
+TTree and from an RNTuple through pyutils.pyimport.Importer, reporting read throughput
+(events/s and MB/s of in-memory data) and peak memory for each.
+
+The RNTuple is written with uproot (mkrntuple, uproot 5.6+). With older uproot, give an
+RNTuple file made elsewhere holding the same fields:
+
+    python rntuple_benchmark.py --events 1000000 --repeats 5
+    python rntuple_benchmark.py --rntuple-file my_rntuple.root
+"""
+
+# 1. Setting up your environment
+
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+import awkward as ak
+import uproot
+
+from pyutils.pylogger import Logger
+from pyutils.pyimport import Importer
+
+parser = argparse.ArgumentParser(description="Compare TTree and RNTuple read performance")
+parser.add_argument("--events", type=int, default=200000, help="Number of synthetic events")
+parser.add_argument("--repeats", type=int, default=3, help="Timed reads per format (best is reported)")
+parser.add_argument("--rntuple-file", default=None, help="Existing RNTuple file, instead of writing one")
+parser.add_argument("--output-dir", default=None, help="Directory for the synthetic files (default: a temporary directory)")
+args = parser.parse_args()
+
+logger = Logger(print_prefix="[rntuple benchmark]", verbosity=1)
+
+# 2. Generating synthetic data
+
+# Flat event-level fields plus jagged per-track fields, as in the EventNtuple
+rng = np.random.default_rng(42)
+n_tracks = rng.poisson(2.0, args.events)
+n_total = int(n_tracks.sum())
+data = {
+    "event": np.arange(args.events, dtype=np.int32),
+    "run": np.full(args.events, 1201, dtype=np.int32),
+    "subrun": (np.arange(args.events) // 1000).astype(np.int32),
+    "nhits": rng.poisson(40, args.events).astype(np.int32),
+    "trk_pdg": ak.unflatten(rng.choice(np.array([11, -11, 13, -13], dtype=np.int32), n_total), n_tracks),
+    "trk_mom": ak.unflatten(rng.normal(100.0, 5.0, n_total).astype(np.float32), n_tracks),
+    "trk_t0": ak.unflatten(rng.uniform(400.0, 1700.0, n_total).astype(np.float32), n_tracks)
+}
+branches = list(data.keys())
+
+output_dir = args.output_dir or tempfile.mkdtemp()
+ttree_file = os.path.join(output_dir, "benchmark_ttree.root")
+rntuple_file = args.rntuple_file or os.path.join(output_dir, "benchmark_rntuple.root")
+
+# 3. Writing the files
+
+logger.log(f"Writing {args.events} events to {output_dir}", "info")
+with uproot.recreate(ttree_file) as file:
+    # mktree rather than assignment, which newer uproot writes as an RNTuple
+    tree = file.mktree("ntuple", {name: str(ak.Array(array).type.content) for name, array in data.items()})
+    tree.extend(data)
+
+if args.rntuple_file is None:
+    with uproot.recreate(rntuple_file) as file:
+        if not hasattr(file, "mkrntuple"):
+            raise SystemExit("This uproot cannot write RNTuples: upgrade to uproot 5.6+, or pass --rntuple-file")
+        file.mkrntuple("ntuple", ak.Array(data))
+
+# 4. Timing the reads
+
+def benchmark(file_name):
+    """Best wall time, in-memory MB and peak traced memory over the repeats"""
+    best = None
+    for _ in range(args.repeats):
+        importer = Importer(file_name=file_name, branches=branches, tree_path="ntuple", verbosity=0)
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = importer.import_branches()
+        wall_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or wall_time < best[0]:
+            best = (wall_time, result.nbytes / 1024**2, peak / 1024**2, len(result))
+        del result
+    return best
+
+results = {"TTree": benchmark(ttree_file), "RNTuple": benchmark(rntuple_file)}
+
+# 5. Summary
+
+for name, (wall_time, mb, peak_mb, events) in results.items():
+    logger.log(
+        f"{name:<8} {os.path.getsize(ttree_file if name == 'TTree' else rntuple_file) / 1024**2:8.1f} MB on disk, "
+        f"{events / wall_time:10.0f} events/s, {mb / wall_time:8.1f} MB/s, peak memory {peak_mb:8.1f} MB",
+        "info"
+    )
+speedup = results["TTree"][0] / results["RNTuple"][0]
+logger.log(f"RNTuple reads {speedup:.2f}x {'faster' if speedup >= 1 else 'slower'} than TTree", "success")
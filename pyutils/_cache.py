@@ -0,0 +1,102 @@
+# Internal helpers for on-disk caches and cross-process file locks
+
+import os
+import json
+import fcntl
+import pickle
+import hashlib
+import tempfile
+import importlib.metadata
+from contextlib import contextmanager
+
+def get_cache_dir(*subdirs):
+    """Return (and create) a pyutils cache directory
+
+    Honours $PYUTILS_CACHE_DIR, then $XDG_CACHE_HOME/pyutils, then ~/.cache/pyutils
+
+    Args:
+        *subdirs: Optional sub-directories below the cache root
+
+    Returns:
+        str: Path to the directory
+    """
+    root = os.environ.get("PYUTILS_CACHE_DIR")
+    if not root:
+        xdg = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+        root = os.path.join(xdg, "pyutils")
+    path = os.path.join(root, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an flock on path for the duration of the block
+
+    flock is tied to the open file description, so this excludes other
+    threads in the same process as well as other processes.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+def read_json(path, default=None):
+    """Read a JSON file, returning default if it is missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def write_json(path, data):
+    """Atomically write data to path as JSON"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_pickle(path, default=None):
+    """Read a pickle file, returning default if it is missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return default
+
+def write_pickle(path, data):
+    """Atomically write data to path as a pickle"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def hash_key(*parts):
+    """Stable hex digest of the string forms of parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def package_version():
+    """Installed pyutils version (falling back to pyutils.__version__)"""
+    try:
+        return importlib.metadata.version("pyutils")
+    except importlib.metadata.PackageNotFoundError:
+        from . import __version__
+        return __version__
@@ -0,0 +1,151 @@
+# Internal helper to keep the bearer token fresh during long jobs
+#
+# Workers read the token from BEARER_TOKEN_FILE whenever they open a file, so
+# refreshing that one file (atomically) updates every thread and process.
+
+import os
+import time
+import threading
+import subprocess
+from . import _env_manager
+from .pylogger import Logger
+
+class CredentialManager:
+    """Refresh the bearer token in the background before it expires"""
+
+    def __init__(self, refresh_margin=900, check_interval=60, token_path=None, token_cmd=None, verbosity=1):
+        """Initialise the credential manager
+
+        Args:
+            refresh_margin (float, opt): Refresh once the token has fewer than this many seconds left. Defaults to 900.
+            check_interval (float, opt): Seconds between expiry checks. Defaults to 60.
+            token_path (str, opt): Token file. Defaults to the standard bearer token location.
+            token_cmd (str, opt): Command which writes a new token to $BEARER_TOKEN_FILE. Defaults to getToken.
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+        """
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.token_path = token_path or _env_manager.get_token_path()
+        self.token_cmd = token_cmd or _env_manager.TOKEN_CMD
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_env = None # Token variables from before start, restored by stop
+
+        # Start logger
+        self.logger = Logger(
+            print_prefix = "[pyutils]",
+            verbosity = verbosity
+        )
+
+    def seconds_left(self):
+        """Seconds until the token expires, or None if it cannot be read"""
+        expiry = _env_manager.get_token_expiry(self.token_path)
+        return None if expiry is None else expiry - time.time()
+
+    def refresh(self):
+        """Get a new token, swapping it into place atomically
+
+        Returns:
+            bool: Whether the token was refreshed
+        """
+        tmp_path = f"{self.token_path}.{os.getpid()}.tmp"
+        env = os.environ.copy()
+        env["BEARER_TOKEN_FILE"] = tmp_path
+        result = subprocess.run(
+            self.token_cmd,
+            shell=True,
+            capture_output=True,
+            text=True,
+            env=env
+        )
+        if result.returncode != 0:
+            self.logger.log(f"Token refresh failed: {result.stderr}", "warning")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        # Readers see either the old token or the new one, never a partial file
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, self.token_path)
+        self.logger.log(f"Refreshed token ({self.seconds_left() or 0:.0f}s left)", "info")
+        return True
+
+    def _run(self):
+        wait = self.check_interval
+        while not self._stop.wait(wait):
+            seconds_left = self.seconds_left()
+            if seconds_left is not None:
+                wait = self.check_interval
+                if seconds_left < self.refresh_margin:
+                    self.refresh()
+            else:
+                # No readable expiry (missing, or not a JWT), so refresh blind, backing off
+                # up to the refresh margin rather than calling getToken every check
+                self.refresh()
+                wait = min(2 * wait, max(self.check_interval, self.refresh_margin))
+
+    def start(self):
+        """Start refreshing in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        # Point this process (and so any worker it spawns) at the token file, until stopped
+        self._saved_env = {key: os.environ.get(key) for key in ("BEARER_TOKEN_FILE", "BEARER_TOKEN")}
+        os.environ["BEARER_TOKEN_FILE"] = self.token_path
+        os.environ.pop("BEARER_TOKEN", None) # An inline token would shadow the file
+        seconds_left = self.seconds_left()
+        if seconds_left is not None and seconds_left < self.refresh_margin:
+            self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pyutils-credentials", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread, and restore the token variables from before start"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._saved_env is not None:
+            for key, value in self._saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            self._saved_env = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def init_worker(token_path):
+    """Point a worker process at the token file the parent keeps refreshed"""
+    if token_path is not None:
+        os.environ["BEARER_TOKEN_FILE"] = token_path
+        os.environ.pop("BEARER_TOKEN", None)
+
+# Manager shared by the jobs running in this process, so that overlapping jobs do not
+# each swap the token variables in os.environ (and restore them under one another)
+_shared = None
+_shared_users = 0
+_shared_lock = threading.Lock()
+
+def acquire_shared(verbosity=1):
+    """Start the shared manager, or join it if another job already has"""
+    global _shared, _shared_users
+    with _shared_lock:
+        if _shared is None:
+            _shared = CredentialManager(verbosity=verbosity).start()
+        _shared_users += 1
+        return _shared
+
+def release_shared():
+    """Leave the shared manager, stopping it once the last job has left"""
+    global _shared, _shared_users
+    with _shared_lock:
+        _shared_users -= 1
+        if _shared_users == 0 and _shared is not None:
+            _shared.stop()
+            _shared = None
@@ -1,15 +1,152 @@
 # Sam Grant 2025 
 # Internal helper to set up the environment 
+#
+# The environment is captured once, cached on disk (keyed by the setup script
+# and the token expiry) and handed to worker processes through the pool
+# initializer, so that workers do not repeat the setup themselves.
+#
+# Only the variables the setup adds or changes are kept, together with the
+# values they had beforehand, and a cached result is only reused by a shell
+# whose values still match (so another venv or PATH never gets a stale one).
 
 import os
+import json
+import time
+import base64
+import hashlib
 import subprocess
+from . import _cache
 from .pylogger import Logger
 
 ENV_IS_SETUP = False
+CAPTURED_ENV = None # Environment from the setup, to pass on to workers
+
+TOKEN_CMD = "/cvmfs/mu2e.opensciencegrid.org/bin/getToken"
+SETUP_SCRIPT = "/cvmfs/mu2e.opensciencegrid.org/setupmu2e-art.sh"
+TOKEN_MARGIN = 600 # Seconds of validity a token needs to be reused
+SHELL_VARS = {"PWD", "OLDPWD", "SHLVL", "_"} # Belong to the setup shell, never carried over
+
+def get_token_path():
+    """Locate the bearer token file, following the WLCG token discovery convention"""
+    if os.environ.get("BEARER_TOKEN_FILE"):
+        return os.environ["BEARER_TOKEN_FILE"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
+    return os.path.join(runtime_dir, f"bt_u{os.getuid()}")
+
+def get_token_expiry(token_path=None):
+    """Return the expiry time (Unix seconds) of the bearer token, or None if unavailable"""
+    try:
+        with open(token_path or get_token_path(), "r") as f:
+            token = f.read().strip()
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4) # Restore base64 padding
+        return json.loads(base64.urlsafe_b64decode(payload))["exp"]
+    except (OSError, IndexError, KeyError, ValueError):
+        return None
+
+def _setup_script_hash():
+    """Hash of the setup script, so a changed release invalidates the cache"""
+    try:
+        with open(SETUP_SCRIPT, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return "unknown"
+
+def _cache_path(token_expiry):
+    return os.path.join(_cache.get_cache_dir("env"), f"env_{_setup_script_hash()}_{token_expiry}.json")
+
+def _environment_delta(env, base):
+    """Variables of env which are new or changed relative to base, with their base values
+
+    Returns:
+        Tuple of (changed variables, their values in base, None where unset)
+    """
+    delta = {key: value for key, value in env.items() if key not in SHELL_VARS and base.get(key) != value}
+    return delta, {key: base.get(key) for key in delta}
+
+def capture_environment(logger=None):
+    """Run getToken and the Mu2e setup once, reusing a cached result where possible
+
+    Holds a file lock, so that concurrent callers wait for one setup rather than racing.
+
+    Returns:
+        dict: The variables the setup added or changed, or None on failure
+    """
+    logger = logger or Logger(print_prefix="[pyutils]")
+    lock_path = os.path.join(_cache.get_cache_dir("env"), "setup.lock")
+
+    with _cache.file_lock(lock_path):
+        # Reuse a cached environment if the token it was made with is still good
+        expiry = get_token_expiry()
+        if expiry is not None and expiry - time.time() > TOKEN_MARGIN:
+            cached = _cache.read_json(_cache_path(expiry))
+            # Only valid on top of the same values it was captured from
+            if cached is not None and "delta" in cached and all(
+                os.environ.get(key) == value for key, value in cached["base"].items()
+            ):
+                logger.log("Using cached environment", "max")
+                return cached["delta"]
+
+        # Step 1: Get token
+        logger.log(f"Running: {TOKEN_CMD}", "max")
+        
+        # Capture both stdout and stderr for debugging
+        token_result = subprocess.run(
+            TOKEN_CMD,
+            shell=True, 
+            capture_output=True, 
+            text=True,
+            env=os.environ.copy()  # Use current environment
+        )
+        
+        if token_result.returncode != 0:
+            logger.log(f"getToken failed: {token_result.stderr}", "error")
+            return None
+        
+        # Step 2: Setup mu2e environment and get all environmentals
+        setup_cmd = f"source {SETUP_SCRIPT}; muse setup ops; env"
+        
+        base = os.environ.copy()
+        result = subprocess.check_output(
+            setup_cmd, 
+            shell=True, 
+            universal_newlines=True,
+            env=base,  # Use current environment with token
+            stderr=subprocess.DEVNULL # Suppress error messages. FIXME: use mdh directly if you can
+        )
+        
+        # Parse environment variables
+        env = {}
+        for line in result.strip().split('\n'):
+            if '=' in line:
+                key, value = line.split('=', 1)
+                env[key] = value
+        
+        delta, base_values = _environment_delta(env, base)
+
+        # Cache against the new token (mkstemp keeps the file private to the user)
+        expiry = get_token_expiry()
+        if expiry is not None:
+            _cache.write_json(_cache_path(expiry), {"delta": delta, "base": base_values})
+
+        return delta
+
+def apply_environment(env):
+    """Install the variables of a captured environment in this process"""
+    global ENV_IS_SETUP, CAPTURED_ENV
+    os.environ.update(env)
+    # Tokens, not proxies
+    os.environ.pop("X509_USER_PROXY", None)
+    CAPTURED_ENV = env
+    ENV_IS_SETUP = True
+
+def init_worker(env):
+    """Pool initializer which hands the parent's environment to a worker process"""
+    if env is not None:
+        apply_environment(env)
 
 def setup_environment():
     """Set up the environment variables once per process"""
-    global ENV_IS_SETUP
     
     logger = Logger(print_prefix="[pyutils]")
     
@@ -20,41 +157,11 @@ def setup_environment():
             if "X509_USER_PROXY" in os.environ:
                 del os.environ["X509_USER_PROXY"]
             
-            # Step 1: Get token
-            token_cmd = "/cvmfs/mu2e.opensciencegrid.org/bin/getToken"
-            logger.log(f"Running: {token_cmd}", "max")
-            
-            # Capture both stdout and stderr for debugging
-            token_result = subprocess.run(
-                token_cmd, 
-                shell=True, 
-                capture_output=True, 
-                text=True,
-                env=os.environ.copy()  # Use current environment
-            )
-            
-            if token_result.returncode != 0:
-                logger.log(f"getToken failed: {token_result.stderr}", "error")
+            env = capture_environment(logger)
+            if env is None:
                 return False
-                
-            # Step 2: Setup mu2e environment and get all environmentals
-            setup_cmd = "source /cvmfs/mu2e.opensciencegrid.org/setupmu2e-art.sh; muse setup ops; env"
-            
-            result = subprocess.check_output(
-                setup_cmd, 
-                shell=True, 
-                universal_newlines=True,
-                env=os.environ.copy(),  # Use current environment with token
-                stderr=subprocess.DEVNULL # Suppress error messages. FIXME: use mdh directly if you can
-            )
-            
-            # Parse and set environment variables
-            for line in result.strip().split('\n'):
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
             
-            ENV_IS_SETUP = True
+            apply_environment(env)
             logger.log("Ready", "success")
             return True
             
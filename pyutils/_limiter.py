@@ -0,0 +1,124 @@
+# Internal helper to cap concurrent I/O per storage endpoint
+#
+# Limits are enforced with lock files, so they are shared by every thread
+# and every process on the node that uses the same lock directory.
+
+import os
+import re
+import fcntl
+import time
+import uuid
+import random
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from . import _cache
+
+class EndpointLimiter:
+    """Cap concurrent opens and in-flight bytes per storage endpoint"""
+
+    def __init__(self, max_opens=None, max_inflight_mb=None, lock_dir=None, poll_interval=0.05):
+        """Initialise the limiter
+
+        Args:
+            max_opens (int, opt): Maximum simultaneous file opens per endpoint. None for no limit.
+            max_inflight_mb (float, opt): Maximum MB being read at once per endpoint. None for no limit.
+            lock_dir (str, opt): Directory for the lock files. Defaults to the pyutils cache.
+            poll_interval (float, opt): Seconds to wait between attempts when the endpoint is saturated
+        """
+        self.max_opens = max_opens
+        self.max_inflight_bytes = None if max_inflight_mb is None else int(max_inflight_mb * 1024**2)
+        self.lock_dir = lock_dir or _cache.get_cache_dir("locks")
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def endpoint_key(url, location=None):
+        """Build the endpoint key (host plus location) for a file URL or path"""
+        host = urlparse(url).hostname or "local"
+        key = f"{host}_{location}" if location else host
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+
+    def _endpoint_dir(self, key):
+        path = os.path.join(self.lock_dir, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _sleep(self):
+        # Jitter so that waiting workers do not retry in lockstep
+        time.sleep(self.poll_interval * (0.5 + random.random()))
+
+    @contextmanager
+    def open_slot(self, key):
+        """Hold one of the max_opens slots for this endpoint"""
+        if not self.max_opens:
+            yield
+            return
+
+        endpoint_dir = self._endpoint_dir(key)
+        slots = list(range(self.max_opens))
+        while True:
+            random.shuffle(slots) # Spread contention across the slot files
+            for i in slots:
+                fd = os.open(os.path.join(endpoint_dir, f"open_{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                return
+            self._sleep()
+
+    @contextmanager
+    def reserve_bytes(self, key, nbytes):
+        """Reserve nbytes of the in-flight budget for this endpoint
+
+        A single request larger than the whole budget is let through once
+        the endpoint is idle, rather than waiting forever.
+        """
+        if not self.max_inflight_bytes or not nbytes:
+            yield
+            return
+
+        endpoint_dir = self._endpoint_dir(key)
+        lock_path = os.path.join(endpoint_dir, "inflight.lock")
+        state_path = os.path.join(endpoint_dir, "inflight.json")
+        token = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}"
+
+        while True:
+            with _cache.file_lock(lock_path):
+                reservations = self._live_reservations(_cache.read_json(state_path, default={}))
+                in_flight = sum(reservations.values())
+                if in_flight == 0 or in_flight + nbytes <= self.max_inflight_bytes:
+                    reservations[token] = int(nbytes)
+                    _cache.write_json(state_path, reservations)
+                    break
+            self._sleep()
+
+        try:
+            yield
+        finally:
+            with _cache.file_lock(lock_path):
+                reservations = self._live_reservations(_cache.read_json(state_path, default={}))
+                reservations.pop(token, None)
+                _cache.write_json(state_path, reservations)
+
+    @staticmethod
+    def _live_reservations(reservations):
+        """Drop reservations left behind by processes that no longer exist"""
+        live = {}
+        for token, nbytes in reservations.items():
+            pid = int(token.split(":", 1)[0])
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                continue
+            except PermissionError:
+                pass
+            live[token] = nbytes
+        return live
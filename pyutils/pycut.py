@@ -1,8 +1,10 @@
 import json
+import numpy as np
 import awkward as ak
 import csv
 import pandas as pd
 from pyutils.pylogger import Logger
+from pyutils import pytrace
 
 class CutManager:
     """Class to manage analysis cuts"""
@@ -287,6 +289,7 @@ class CutManager:
             entry["group"] = group
         return entry
             
+    @pytrace.traced()
     def create_cut_flow(self, data):
         """ Utility to calculate cut flow from array and cuts object
         
@@ -453,4 +456,202 @@ class CutManager:
         
         except Exception as e:
             self.logger.log(f"Exception when combining cut flows: {e}", "error")
-            raise
\ No newline at end of file
+            raise
+
+
+class CutVariations:
+    """Evaluate many named cut configurations against the same data in one pass, e.g. for systematics
+
+    Each cut is a function of the data and some parameters which returns a mask. A variation 
+    overrides the parameters of some cuts, or drops them. Masks are cached by cut and parameters, 
+    and the running AND of the cuts by the masks it combines, so work shared between variations 
+    (including any leading run of identical cuts) is done once. Histogram values are computed once 
+    and filled for every variation.
+
+    Example:
+        variations = CutVariations()
+        variations.add_cut("trkqual", "Track quality", lambda data, value: selector.select_trkqual(data, quality=value), value=0.8)
+        variations.add_cut("nactive", "Active hits", lambda data, n: selector.has_n_hits(data, n_hits=n), n=20)
+        variations.add_variation("trkqual_tight", trkqual={"value": 0.9})
+        variations.add_variation("no_nactive", nactive=None)
+        variations.add_histogram("mom", lambda data: vector.get_mag(data["trksegs"], "mom"), bins=50, range=(95, 115))
+        results = variations.evaluate(data) # Per file, then variations.combine(list_of_results)
+    """
+
+    def __init__(self, verbosity=1):
+        """Initialise 
+        
+        Args:
+            verbosity (int, optional): Printout level (0: minimal, 1: normal, 2: detailed)
+        """
+        self.cuts = {}          # Name -> {"func", "params", "description", "group"}, in order of application
+        self.variations = {"nominal": {}} # Name -> {cut name: parameter overrides, or None to drop the cut}
+        self.histograms = {}    # Name -> {"func", "bins", "range"}
+        # Used for its cut flow formatting and combination
+        self._cut_manager = CutManager(verbosity=0)
+        # Start logger
+        self.logger = Logger( 
+            verbosity=verbosity,
+            print_prefix="[pycut]"
+        )
+
+    def add_cut(self, name, description, func, group=None, **params):
+        """Add a cut, applied in the order added
+        
+        Args:
+            name (str): Name of the cut
+            description (str): Description of what the cut does
+            func (callable): func(data, **params) returning a Boolean mask
+            group (str, optional): Group name for organizing cuts
+            **params: Nominal parameters passed to func
+        """
+        self.cuts[name] = {"func": func, "params": params, "description": description, "group": group}
+        self.logger.log("Added cut %s with parameters %s", "info", name, params)
+
+    def add_variation(self, name, **overrides):
+        """Add a named cut configuration
+        
+        Args:
+            name (str): Name of the variation
+            **overrides: Cut name -> dict of parameters to change, or None to drop the cut
+        """
+        unknown = set(overrides) - set(self.cuts)
+        if unknown:
+            self.logger.log(f"Unknown cuts in variation '{name}': {', '.join(sorted(unknown))}", "error")
+            return
+        self.variations[name] = overrides
+        self.logger.log("Added variation %s", "info", name)
+
+    def add_histogram(self, name, func, bins, range=None):
+        """Fill a histogram for every variation
+        
+        Args:
+            name (str): Name of the histogram
+            func (callable): func(data) returning the values, with the same structure as the cut masks
+            bins (int or array): Bins, as for np.histogram
+            range (tuple, optional): Range, as for np.histogram (needed with integer bins to combine files)
+        """
+        self.histograms[name] = {"func": func, "bins": bins, "range": range}
+
+    def _resolve(self, variation):
+        """Ordered (cut name, parameters) pairs for a variation"""
+        overrides = self.variations[variation]
+        resolved = []
+        for name, cut in self.cuts.items():
+            if name in overrides and overrides[name] is None:
+                continue
+            resolved.append((name, {**cut["params"], **overrides.get(name, {})}))
+        return resolved
+
+    @staticmethod
+    def _params_key(params):
+        """Hashable key for cut parameters, so that variations sharing a cut share its mask"""
+        def freeze(value):
+            if isinstance(value, dict):
+                return tuple(sorted(((key, freeze(item)) for key, item in value.items()), key=repr))
+            if isinstance(value, (list, tuple)):
+                return tuple(freeze(item) for item in value)
+            if isinstance(value, (set, frozenset)):
+                return tuple(sorted((freeze(item) for item in value), key=repr))
+            if isinstance(value, np.ndarray):
+                return (value.dtype.str, value.shape, value.tobytes())
+            try:
+                hash(value)
+                return value
+            except TypeError:
+                return repr(value)
+        return freeze(params)
+
+    @staticmethod
+    def _count_events(mask):
+        """Events with any passing element (as in CutManager.create_cut_flow)"""
+        if mask.ndim > 1:
+            mask = ak.any(mask, axis=-1)
+        return int(ak.sum(mask))
+
+    @pytrace.traced()
+    def evaluate(self, data):
+        """Evaluate every variation on one chunk of data
+        
+        Args:
+            data (awkward.Array): Input data 
+        Returns:
+            dict: Variation name -> {"cut_flow": list of cut flow entries, "histograms": name -> (counts, edges)}
+        """
+        total_events = len(data)
+        masks = {}       # (cut, parameters) -> mask
+        cumulative = {}  # Tuple of (cut, parameters) keys -> (combined mask, events passing)
+        values = {name: hist["func"](data) for name, hist in self.histograms.items()}
+
+        results = {}
+        for variation in self.variations:
+            cut_flow = [self._cut_manager._add_entry(
+                name="No cuts", 
+                group="N/A", 
+                events_passing=total_events, 
+                absolute_frac=100.00, 
+                relative_frac=100.00, 
+                description="No selection applied"
+            )]
+            prefix = ()
+            combined = None
+            for name, params in self._resolve(variation):
+                key = (name, self._params_key(params))
+                prefix += (key,)
+                if prefix not in cumulative:
+                    if key not in masks:
+                        masks[key] = self.cuts[name]["func"](data, **params)
+                    mask = masks[key] if combined is None else combined & masks[key]
+                    cumulative[prefix] = (mask, self._count_events(mask))
+                combined, events_passing = cumulative[prefix]
+                previous = cut_flow[-1]["events_passing"]
+                cut_flow.append(self._cut_manager._add_entry(
+                    name=name,
+                    events_passing=events_passing,
+                    absolute_frac=events_passing / total_events * 100 if total_events > 0 else 0,
+                    relative_frac=events_passing / previous * 100 if previous > 0 else 0,
+                    description=self.cuts[name]["description"],
+                    group=self.cuts[name]["group"]
+                ))
+
+            histograms = {}
+            for hist_name, hist in self.histograms.items():
+                selected = values[hist_name] if combined is None else values[hist_name][combined]
+                histograms[hist_name] = np.histogram(
+                    ak.to_numpy(ak.flatten(selected, axis=None)), 
+                    bins=hist["bins"], 
+                    range=hist["range"]
+                )
+            results[variation] = {"cut_flow": cut_flow, "histograms": histograms}
+
+        self.logger.log(f"Evaluated {len(self.variations)} variations with {len(masks)} distinct masks", "success")
+        return results
+
+    def combine(self, results_list, format_as_df=False):
+        """Combine the results of evaluate from many files or chunks
+        
+        Args:
+            results_list (list): Outputs of evaluate
+            format_as_df (bool, optional): Format the cut flows as pd.DataFrames. Defaults to False.
+        Returns:
+            dict: Variation name -> {"cut_flow", "histograms"}, as from evaluate
+        """
+        results_list = [results for results in results_list if results]
+        if not results_list:
+            self.logger.log("No results to combine", "error")
+            return {}
+        combined = {}
+        for variation in results_list[0]:
+            cut_flow = self._cut_manager.combine_cut_flows(
+                [results[variation]["cut_flow"] for results in results_list], 
+                format_as_df=format_as_df
+            )
+            histograms = {}
+            for hist_name, (counts, edges) in results_list[0][variation]["histograms"].items():
+                if any(not np.array_equal(results[variation]["histograms"][hist_name][1], edges) for results in results_list):
+                    raise ValueError(f"Histogram '{hist_name}' has different bin edges across results: set its range")
+                total = sum(results[variation]["histograms"][hist_name][0] for results in results_list)
+                histograms[hist_name] = (total, edges)
+            combined[variation] = {"cut_flow": cut_flow, "histograms": histograms}
+        self.logger.log(f"Combined {len(combined)} variations over {len(results_list)} results", "success")
+        return combined
@@ -1,25 +1,115 @@
+import fnmatch
+import threading
+from contextlib import contextmanager
 import uproot
+import numpy as np
 import awkward as ak
 from .pyread import Reader
 from .pylogger import Logger
+from . import pytelemetry
+from . import pytrace
+
+# Entry range for Importers created in this thread without one (see entry_range)
+_local = threading.local()
+
+@contextmanager
+def entry_range(entry_start=None, entry_stop=None):
+    """Read only entries [entry_start, entry_stop) in Importers created inside the block
+
+    This lets a sampled run reach Importers created deep inside custom worker functions
+    """
+    previous = getattr(_local, "range", (None, None))
+    _local.range = (entry_start, entry_stop)
+    try:
+        yield
+    finally:
+        _local.range = previous
+
+def current_entry_range():
+    """The (entry_start, entry_stop) set by the enclosing entry_range, or (None, None)"""
+    return getattr(_local, "range", (None, None))
+
+def tree_paths(tree_path):
+    """Normalise a tree_path to a dict of tree name -> path
+
+    A single path gives one entry, a list is named by the last component of each path,
+    and a dict is used as it is.
+    """
+    if isinstance(tree_path, dict):
+        return dict(tree_path)
+    if isinstance(tree_path, str):
+        return {tree_path.split('/')[-1]: tree_path}
+    paths = {path.split('/')[-1]: path for path in tree_path}
+    if len(paths) != len(tree_path):
+        raise ValueError(f"Tree paths {tree_path} share names, pass a dict of name -> path instead")
+    return paths
+
+def is_rntuple(obj):
+    """Whether an object read with uproot is an RNTuple (ROOT::RNTuple, or the older Experimental class) rather than a TTree"""
+    return getattr(obj, "classname", "").endswith("RNTuple")
+
+def rntuple_column_sizes(ntuple):
+    """Compressed and uncompressed bytes of each RNTuple column, from the page lists (no pages are read)
+
+    Returns:
+        dict: Dotted field path (e.g. "trk.pdg", as in ntuple.keys()) -> (compressed bytes, uncompressed bytes)
+    """
+    fields = ntuple.field_records
+    def field_path(field_id):
+        names = []
+        while True:
+            field = fields[field_id]
+            parent = fields[field.parent_field_id]
+            # Collection items are anonymous ("_0"), so leave them out of the path
+            if field.parent_field_id == field_id or getattr(parent.struct_role, "name", None) != "COLLECTION":
+                names.append(field.field_name)
+            if field.parent_field_id == field_id: # Top-level fields are their own parent
+                return ".".join(reversed(names))
+            field_id = field.parent_field_id
+
+    columns = ntuple.column_records
+    sizes = {}
+    for cluster in ntuple.page_link_list:
+        for column_id, column_pages in enumerate(cluster):
+            column = columns[column_id]
+            path = field_path(column.field_id)
+            compressed, uncompressed = sizes.get(path, (0, 0))
+            for page in column_pages.pages:
+                compressed += page.locator.num_bytes
+                uncompressed += page.num_elements * column.nbits // 8
+            sizes[path] = (compressed, uncompressed)
+    return sizes
 
 class Importer:
-    """Utility class for importing branches from ROOT TTree files
+    """Utility class for importing branches from ROOT TTree or RNTuple files
+
+    The object at tree_path is detected when read, and the same branch list and grouped dict
+    forms work for both. RNTuple fields are selected with filter_name.
+
+    Several trees in the same file (e.g. the EventNtuple and an MC or trigger tree) can be read
+    together, giving one record array with a field per tree, joined by entry index or by join_on keys.
 
     Intended to used via by the pyprocess Processor class
     """
     
-    def __init__(self, file_name, branches, tree_path="EventNtuple/ntuple", use_remote=False, location="disk", schema="root", verbosity=1):
+    def __init__(self, file_name, branches, tree_path="EventNtuple/ntuple", use_remote=False, location="disk", schema="root", verbosity=1, max_opens=None, max_inflight_mb=None, entry_start=None, entry_stop=None, join_on=None):
         """Initialise the importer
         
         Args:
             file_name: Name of the file
-            branches: Flat list or grouped dict of branches to import
-            tree_path (str, opt): Path to the Ntuple in file directory. Default is "EventNtuple/ntuple".
+            branches: Flat list or grouped dict of branches to import. With several trees, a dict of tree name -> branches.
+            tree_path (str, opt): Path to the Ntuple (TTree or RNTuple) in file directory. Default is "EventNtuple/ntuple". 
+                A list of paths, or dict of name -> path, reads several trees into one record array with a field per tree.
             use_remote: Flag for reading remote files 
             location: Remote files only. File location: tape (default), disk, scratch, nersc 
             schema: Remote files only. Schema used when writing the URL: root (default), http, path, dcap, samFile
             verbosity: Print detail level (0: minimal, 1: medium, 2: maximum) 
+            max_opens: Cap on simultaneous file opens per storage endpoint (None for no limit)
+            max_inflight_mb: Cap on MB being read at once per storage endpoint (None for no limit)
+            entry_start: First entry to read (None for the start, or the enclosing entry_range)
+            entry_stop: Entry to stop before (None for the end, or the enclosing entry_range)
+            join_on: Several trees only. Branch names, e.g. ("run", "subrun", "event"), matching entries of the other 
+                trees to the first tree when their orders differ. None to join by entry index.
             
         """
         self.file_name = file_name
@@ -29,6 +119,11 @@ class Importer:
         self.location = location
         self.schema = schema
         self.verbosity = verbosity
+        if entry_start is None and entry_stop is None:
+            entry_start, entry_stop = current_entry_range()
+        self.entry_start = entry_start
+        self.entry_stop = entry_stop
+        self.join_on = tuple(join_on) if join_on is not None else None
 
         self.logger = Logger( # Start logger
             print_prefix = "[pyimport]", 
@@ -40,9 +135,162 @@ class Importer:
             use_remote=self.use_remote,
             location=self.location,
             schema=self.schema,
-            verbosity=self.verbosity
+            verbosity=self.verbosity,
+            max_opens=max_opens,
+            max_inflight_mb=max_inflight_mb
         )
+
+    def _branch_names(self, tree, branches=None):
+        """Names of the requested branches"""
+        branches = self.branches if branches is None else branches
+        if branches == "*":
+            return tree.keys()
+        elif isinstance(branches, dict):
+            return [branch for sub_branches in branches.values() for branch in sub_branches]
+        elif isinstance(branches, list):
+            return branches
+        return []
+
+    def branch_sizes(self, tree, branches=None):
+        """Compressed and uncompressed sizes of the requested branches, from the TTree metadata 
+
+        No baskets are read or decompressed. RNTuples record sizes per page rather than per field, 
+        so each field is sized from the pages of its columns (and its subfields).
+
+        Args:
+            tree: TTree or RNTuple
+            branches (opt): Branches to size. Defaults to the importer's branches.
+
+        Returns:
+            dict: Branch name -> (compressed bytes, uncompressed bytes)
+        """
+        sizes = {}
+        if is_rntuple(tree):
+            try:
+                column_sizes = rntuple_column_sizes(tree)
+            except Exception as e:
+                self.logger.log(f"Cannot size RNTuple fields from the page list ({e})", "warning")
+                return sizes
+            for name in self._branch_names(tree, branches):
+                # Names are filter_name patterns, which select a field with all of its subfields
+                matched = [
+                    size for path, size in column_sizes.items()
+                    if fnmatch.fnmatchcase(path, name) or path.startswith(f"{name}.")
+                ]
+                if matched:
+                    sizes[name] = (sum(c for c, _ in matched), sum(u for _, u in matched))
+            return sizes
+        for name in self._branch_names(tree, branches):
+            try:
+                branch = tree[name]
+                sizes[name] = (branch.compressed_bytes, branch.uncompressed_bytes)
+            except Exception:
+                pass # Expressions or unusual names, skip rather than fail the read
+        return sizes
+
+    def _estimate_bytes(self, tree, branches=None, full=False):
+        """Estimate the compressed bytes needed to read the requested branches"""
+        nbytes = sum(compressed for compressed, _ in self.branch_sizes(tree, branches).values())
+        if not full and (self.entry_start is not None or self.entry_stop is not None) and tree.num_entries > 0:
+            start, stop, _ = slice(self.entry_start, self.entry_stop).indices(tree.num_entries)
+            nbytes = nbytes * max(0, stop - start) // tree.num_entries
+        return nbytes
+
+    def _arrays(self, tree, branches, full=False):
+        """Read a list of branches from a TTree, or fields from an RNTuple (all entries if full)"""
+        entry_start, entry_stop = (None, None) if full else (self.entry_start, self.entry_stop)
+        if is_rntuple(tree):
+            return tree.arrays(filter_name=branches, library="ak", entry_start=entry_start, entry_stop=entry_stop)
+        return tree.arrays(branches, library="ak", entry_start=entry_start, entry_stop=entry_stop)
+
+    def _read_tree(self, tree, branches, full=False):
+        """Read a flat list, grouped dict or "*" of branches from one tree"""
+        # Flat list
+        if isinstance(branches, list):
+            return self._arrays(tree, branches, full)
+
+        # Grouped dictionary
+        elif isinstance(branches, dict):
+            data = {}
+            # Get arrays per field/group
+            for group, sub_branches in branches.items():
+                data[group] = self._arrays(tree, sub_branches, full)
+            # Zip them together 
+            return ak.zip(data) 
+
+        # If using "*" get all branches
+        elif branches == "*":
+            names = [branch for branch in tree.keys()]
+            if branches is self.branches:
+                self.branches = names
+            self.logger.log("Importing all branches", "info")
+            # filter_name rather than expressions, so split branches are read once under their own names
+            entry_start, entry_stop = (None, None) if full else (self.entry_start, self.entry_stop)
+            return tree.arrays(filter_name=names, library="ak", entry_start=entry_start, entry_stop=entry_stop)
+
+        self.logger.log(f"Branches type {type(branches)} not recognised", "error")
+        return None
+
+    def _get_tree(self, file, tree_path):
+        """Navigate the file directory to the TTree or RNTuple at tree_path (None if missing)"""
+        current = file
+        for component in tree_path.split('/'):
+            if component in current:
+                current = current[component]
+            else:
+                # Handle cases where path component doesn't exist
+                self.logger.log(f"'{component}' not found in {self.file_name}", "error")
+                return None
+        self.logger.log(f"Reading {'RNTuple' if is_rntuple(current) else 'TTree'} {tree_path}", "max")
+        return current
+
+    def _join(self, arrays, keys):
+        """Join the arrays of several trees into one record array, without copying their buffers
+
+        By entry index, or when join_on is set by matching key values against the first tree, 
+        whose entries are kept in order (trees without a match for an entry give None there).
+
+        Args:
+            arrays (dict): Tree name -> awkward array, the first being the reference
+            keys (dict): Tree name -> list of key arrays (join_on only)
+        """
+        names = list(arrays)
+        if self.join_on is None:
+            lengths = {name: len(array) for name, array in arrays.items()}
+            if len(set(lengths.values())) > 1:
+                raise ValueError(f"Cannot join trees by entry index with different numbers of entries {lengths}, set join_on to match by key")
+            return ak.zip(arrays, depth_limit=1)
+
+        # Number each distinct key across all trees, so one integer compares whole keys
+        columns = [np.concatenate([np.asarray(keys[name][i]) for name in names]) for i in range(len(self.join_on))]
+        _, key_ids = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+        key_ids = key_ids.reshape(-1)
+        offsets = np.cumsum([0] + [len(arrays[name]) for name in names])
+        reference_ids = key_ids[offsets[0]:offsets[1]]
+
+        joined = {names[0]: arrays[names[0]]}
+        for i, name in enumerate(names[1:], start=1):
+            ids = key_ids[offsets[i]:offsets[i + 1]]
+            order = np.argsort(ids, kind="stable")
+            sorted_ids = ids[order]
+            if len(sorted_ids) > 1 and np.any(sorted_ids[1:] == sorted_ids[:-1]):
+                self.logger.log(f"Tree '{name}' has repeated {self.join_on} keys, using the first entry for each", "warning")
+            positions = np.searchsorted(sorted_ids, reference_ids)
+            found = positions < len(sorted_ids)
+            found[found] = sorted_ids[positions[found]] == reference_ids[found]
+            if not np.all(found):
+                self.logger.log(f"{np.count_nonzero(~found)} of {len(found)} entries have no match in tree '{name}'", "warning")
+            matched = np.full(len(found), -1, dtype=np.int64)
+            matched[found] = order[positions[found]]
+            # An index over the existing buffers rather than a copy, with -1 for no match
+            if np.all(found):
+                joined[name] = arrays[name][matched]
+            else:
+                layout = ak.contents.IndexedOptionArray(ak.index.Index64(matched), ak.to_layout(arrays[name]))
+                joined[name] = ak.Array(layout)
+        return ak.zip(joined, depth_limit=1)
         
+    @pytrace.traced()
     def import_branches(self):
         """Internal function to open ROOT file and import specified branches
             
@@ -52,52 +300,47 @@ class Importer:
         try:
             # Open file 
             file = self.reader.read_file(self.file_name) 
-            # Access the tree
-            components = self.tree_path.split('/')
-            current = file
-            # Navigate through file directory
-            for component in components:
-                if component in current:
-                    current = current[component]
-                else:
-                    # Handle cases where path component doesn't exist
-                    self.logger.log(f"'{component}' not found in {self.file_name}", "error")
+            # Access the trees
+            paths = tree_paths(self.tree_path)
+            trees = {}
+            for name, path in paths.items():
+                trees[name] = self._get_tree(file, path)
+                if trees[name] is None:
                     return None
-            # Set tree
-            tree = current 
-                
-            # Result container
-            result = {}
 
             if self.branches is None: 
                 self.logger.log("Please provide a list of branches, or self.branches='*' to import all", "error")
                 return None
-    
-            # Flat list
-            elif isinstance(self.branches, list):
-                result = tree.arrays(self.branches, library="ak")
-    
-            # Grouped dictionary
-            elif isinstance(self.branches, dict):
-                data = {}
-                # Get arrays per field/group
-                for group, sub_branches in self.branches.items():
-                    data[group] = tree.arrays(sub_branches, library="ak")
-                # Zip them together 
-                result = ak.zip(data) 
-    
-            # If using "*" get all branches
-            elif self.branches == "*":
-                self.branches = [branch for branch in tree.keys()] 
-                self.logger.log("Importing all branches", "info")
-                # Return array 
-                result = tree.arrays(filter_name=self.branches, library="ak")
-                
-            else: 
-                self.logger.log(f"Branches type {self.branches.type} not recognised", "error")
+            if len(trees) > 1 and not (isinstance(self.branches, dict) and set(self.branches) == set(trees)):
+                self.logger.log(f"With several trees, branches must be a dict of tree name -> branches for each of {list(trees)}", "error")
                 return None
+
+            # With a key join only the first tree follows the entry range, the rest are read whole to find matches
+            full = {name: self.join_on is not None and i > 0 for i, name in enumerate(trees)}
+    
+            # Hold part of the endpoint's in-flight budget while reading (no-op without limits)
+            nbytes = 0
+            if self.reader.limiter is not None or pytelemetry.active():
+                for name, tree in trees.items():
+                    nbytes += self._estimate_bytes(tree, self.branches[name] if len(trees) > 1 else None, full[name])
+            pytelemetry.add("read_bytes", nbytes)
+            with self.reader.reserve_bytes(nbytes), pytelemetry.timed("read_time"):
+                if len(trees) == 1:
+                    tree = next(iter(trees.values()))
+                    result = self._read_tree(tree, self.branches)
+                else:
+                    arrays, keys = {}, {}
+                    for name, tree in trees.items():
+                        arrays[name] = self._read_tree(tree, self.branches[name], full[name])
+                        if arrays[name] is None:
+                            return None
+                        if self.join_on is not None:
+                            key_arrays = self._arrays(tree, list(self.join_on), full[name])
+                            keys[name] = [key_arrays[key] for key in self.join_on]
+                    result = self._join(arrays, keys)
             
             if result is not None:
+                pytelemetry.add("events", len(result))
                 self.logger.log(f"Imported branches", "success")
                 self.logger.log(f"Array structure:", "max")
                 if self.verbosity > 1:
@@ -115,4 +358,4 @@ class Importer:
         finally:
             # Ensure the file is closed
             if hasattr(file, "close"):
-                file.close()
\ No newline at end of file
+                file.close()
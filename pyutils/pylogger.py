@@ -1,8 +1,71 @@
 #! /usr/bin/env python
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import functools
+import threading
+import multiprocessing
+from contextlib import contextmanager
 
 # Global settings
 USE_EMOJIS = False
 USE_COLORS = False
+USE_LOGGING = False # Route messages through the stdlib logging module (see setup_logging)
+
+# Mapping from pyutils levels to stdlib logging levels
+STDLIB_LEVELS = {
+    "error": logging.ERROR,
+    "test": logging.INFO,
+    "info": logging.INFO,
+    "success": logging.INFO,
+    "warning": logging.WARNING,
+    "max": logging.DEBUG
+}
+
+# Queue-based aggregation (see LogListener)
+_log_queue = None               # When set, Logger.log puts records here rather than printing
+_log_context = threading.local() # File being processed by the current thread
+
+def set_log_queue(log_queue):
+    """Send all Logger output in this process to log_queue (None to print directly again)"""
+    global _log_queue
+    _log_queue = log_queue
+
+def get_log_queue():
+    """The queue Logger output is currently sent to, or None"""
+    return _log_queue
+
+@contextmanager
+def log_context(file_name):
+    """Tag queued log records from this thread with the file being processed"""
+    previous = getattr(_log_context, "file", None)
+    _log_context.file = file_name if isinstance(file_name, str) else ",".join(file_name)
+    try:
+        yield
+    finally:
+        _log_context.file = previous
+
+@functools.lru_cache(maxsize=1024)
+def _detect_level(message):
+    """Keyword-based level detection, cached since hot paths repeat the same messages"""
+    # Convert message to lower case
+    message = message.lower()
+
+    if "error" in message or "fail" in message:
+        return "error"
+    elif "complete" in message or "success" in message or "done" in message:
+        return "success"
+    elif "warn" in message or "warning" in message:
+        return "warning"
+    elif "max" in message or "debug" in message:
+        return "max"
+    elif "test" in message:
+        return "test"
+    else:
+        return "info"
 
 class Logger:
     """Helper class for consistent logging with emoji indicators
@@ -27,6 +90,9 @@ class Logger:
         "max": {"emoji": "👀", "text": "[DEBUG]", "level": 2, "color": "magenta"}
     }
 
+    # Level values alone, for the cheap verbosity check
+    LEVEL_VALUES = {name: info["level"] for name, info in LOG_LEVELS.items()}
+
     def __init__(self, verbosity=1, print_prefix="[pylogger]"): 
         """Initialize the Logger
         
@@ -36,37 +102,92 @@ class Logger:
         """
         self.verbosity = verbosity
         self.print_prefix = print_prefix
+        self._stdlib_logger = None
+        
+    def is_enabled(self, level_name):
+        """Whether a message at this level would be printed, to guard expensive logging
         
+        Args:
+            level_name (str): Level name (error, info, success, warning, debug, max)
+        """
+        return self.verbosity >= self.LEVEL_VALUES.get(level_name, 1)
         
-    def log(self, message, level_name=None):
+    def log(self, message, level_name=None, *args):
         """Print a message based on verbosity level
+
+        Suppressed messages are dropped before any formatting, so in hot paths pass 
+        %-style args or a callable rather than an f-string, e.g.
+            logger.log("Created '%s' vector", "success", name)
+            logger.log(lambda: f"Array: {describe(array)}", "max")
         
         Args:
-            message (str): The message to print
+            message (str or callable): The message to print, or a function returning it
             level (str, optional): Level name (error, info, success, warning, debug, max)
+            *args: Values for %-style formatting of the message
         """
         # Determine the log level based on keywords in the message if not explicitly provided
         if level_name is None:
+            if callable(message):
+                message = message()
             level_name = self._detect_level(message)
 
+        # Drop suppressed messages before doing any formatting 
+        if self.verbosity < self.LEVEL_VALUES.get(level_name, 1):
+            return
+
+        if callable(message):
+            message = message()
+        if args:
+            message = message % args
+
+        if _log_queue is not None:
+            _log_queue.put((
+                level_name,
+                self.print_prefix,
+                message,
+                f"{os.getpid()}:{threading.current_thread().name}",
+                getattr(_log_context, "file", None)
+            ))
+            return
+
+        if USE_LOGGING:
+            self._log_stdlib(message, level_name)
+            return
+
+        print(self.format_line(self.print_prefix, level_name, message))
+
+    @classmethod
+    def format_line(cls, print_prefix, level_name, message):
+        """Format one line of output
+        
+        Args:
+            print_prefix (str): Prefix of the logger which made the message
+            level_name (str): Level name (error, info, success, warning, debug, max)
+            message (str): The message
+        """
         # Safely get level info (fallback to info)
-        level_info = self.LOG_LEVELS.get(level_name, self.LOG_LEVELS["info"])
+        level_info = cls.LOG_LEVELS.get(level_name, cls.LOG_LEVELS["info"])
         icon = level_info["emoji"] if USE_EMOJIS else level_info["text"]
 
         # Apply colours only when enabled
         if USE_COLORS:
-            color = self.COLORS.get(level_info.get("color"), "")
-            reset = self.COLORS["reset"]
+            color = cls.COLORS.get(level_info.get("color"), "")
+            reset = cls.COLORS["reset"]
         else:
             color = ""
             reset = ""
 
-        # Get level value
-        level_value = level_info["level"]
+        return f"{print_prefix} {color}{icon}{reset} {message}"
 
-        # Only print if the inherited verbosity is high enough
-        if self.verbosity >= level_value:
-            print(f"{self.print_prefix} {color}{icon}{reset} {message}")
+    def _log_stdlib(self, message, level_name):
+        """Forward a message to the stdlib logger "pyutils.<prefix>" """
+        if self._stdlib_logger is None:
+            self._stdlib_logger = logging.getLogger(f"pyutils.{self.print_prefix.strip('[] ')}")
+        self._stdlib_logger.log(
+            STDLIB_LEVELS.get(level_name, logging.INFO), 
+            message, 
+            extra={"pyutils_level": level_name}
+        )
     
     def _detect_level(self, message):
         """Automatically detect appropriate log level based on message content
@@ -77,19 +198,169 @@ class Logger:
         Returns:
             str: Detected log level name
         """
+        return _detect_level(str(message))
 
-        # Convert message to lower case
-        message = message.lower()
-
-        if "error" in message or "fail" in message:
-            return "error"
-        elif "complete" in message or "success" in message or "done" in message:
-            return "success"
-        elif "warn" in message or "warning" in message:
-            return "warning"
-        elif "max" in message or "debug" in message:
-            return "max"
-        elif "test" in message:
-            return "test"
-        else:
-            return "info"
+class JSONFormatter(logging.Formatter):
+    """Format stdlib log records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "pyutils_level": getattr(record, "pyutils_level", None),
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def setup_logging(level=logging.DEBUG, json_format=True, filename=None):
+    """Route all Logger output through the stdlib "pyutils" logger
+
+    Each Logger still applies its own verbosity first; level filters on top of that.
+
+    Args:
+        level (int, opt): Minimum stdlib level to emit. Defaults to logging.DEBUG.
+        json_format (bool, opt): Use the structured JSONFormatter. Defaults to True.
+        filename (str, opt): Write to this file rather than stderr
+
+    Returns:
+        logging.Logger: The "pyutils" logger
+    """
+    global USE_LOGGING
+    handler = logging.FileHandler(filename) if filename else logging.StreamHandler()
+    handler.setFormatter(JSONFormatter() if json_format else logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logger = logging.getLogger("pyutils")
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    USE_LOGGING = True
+    return logger
+
+
+class LogListener:
+    """Single writer for log output from worker threads and processes
+
+    While running, every Logger in this process (and in worker processes given the queue 
+    through set_log_queue) puts its records on one queue. A background thread drains it in
+    batches, so output is written in whole lines without interleaving, and:
+        - tags records made inside a task with the worker (pid:thread) and file name
+        - prints repeated warnings and errors once, with a count when the listener stops
+        - drops lines beyond max_per_second (errors are always kept), reporting how many
+    """
+
+    def __init__(self, output=None, max_per_second=50, dedup=True, flush_interval=0.5):
+        """Initialise the listener
+
+        Args:
+            output (str, opt): File to append to. Defaults to the console.
+            max_per_second (int, opt): Rate limit on written lines (None for no limit). Defaults to 50.
+            dedup (bool, opt): Print repeated warnings and errors only once. Defaults to True.
+            flush_interval (float, opt): Seconds between writes. Defaults to 0.5.
+        """
+        self.output = output
+        self.max_per_second = max_per_second
+        self.dedup = dedup
+        self.flush_interval = flush_interval
+        self.queue = multiprocessing.Queue()
+        self._thread = None
+        self._stream = None
+        self._repeats = {}    # (prefix, level, message) -> number of repeats dropped
+        self._window = 0      # Current rate limit window (whole seconds)
+        self._window_lines = 0
+        self._suppressed = 0  # Lines dropped by the rate limit in this window
+
+    def _format(self, record):
+        level_name, print_prefix, message, worker, file_name = record
+        if file_name is not None:
+            message = f"[{worker}] [{os.path.basename(file_name)}] {message}"
+        return Logger.format_line(print_prefix, level_name, message)
+
+    def _filter(self, record):
+        """Apply deduplication and the rate limit, returning the lines to write"""
+        level_name, print_prefix, message = record[:3]
+        lines = []
+        if self.dedup and level_name in ("warning", "error"):
+            key = (print_prefix, level_name, message)
+            if key in self._repeats:
+                self._repeats[key] += 1
+                return lines
+            self._repeats[key] = 0
+
+        if self.max_per_second is not None and level_name != "error":
+            window = int(time.time())
+            if window != self._window:
+                if self._suppressed:
+                    lines.append(Logger.format_line("[pylogger]", "warning", f"Rate limit dropped {self._suppressed} lines"))
+                self._window, self._window_lines, self._suppressed = window, 0, 0
+            if self._window_lines >= self.max_per_second:
+                self._suppressed += 1
+                return lines
+            self._window_lines += 1
+
+        lines.append(self._format(record))
+        return lines
+
+    def _write(self, lines):
+        if lines:
+            self._stream.write("\n".join(lines) + "\n")
+            self._stream.flush()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            lines = []
+            try:
+                records = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Drain whatever else has arrived, and write it in one go
+            while True:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in records:
+                if record is None: # Sentinel from stop()
+                    stopping = True
+                    continue
+                lines.extend(self._filter(record))
+            self._write(lines)
+
+    def start(self):
+        """Start the listener thread and route this process's output through it"""
+        if self._thread is not None:
+            return self
+        self._stream = open(self.output, "a") if self.output else sys.stdout
+        self._thread = threading.Thread(target=self._run, name="pyutils-logs", daemon=True)
+        self._thread.start()
+        set_log_queue(self.queue)
+        return self
+
+    def stop(self):
+        """Write everything still queued, with the repeat counts, and print directly again"""
+        if self._thread is None:
+            return
+        set_log_queue(None)
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+        lines = []
+        if self._suppressed:
+            lines.append(Logger.format_line("[pylogger]", "warning", f"Rate limit dropped {self._suppressed} lines"))
+        for (print_prefix, level_name, message), count in self._repeats.items():
+            if count:
+                lines.append(Logger.format_line(print_prefix, level_name, f"(repeated {count} more times) {message}"))
+        self._write(lines)
+        if self._stream is not sys.stdout:
+            self._stream.close()
+        self._stream = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,138 @@
+#! /usr/bin/env python
+import os
+import re
+import json
+import time
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . import _cache
+from .pylogger import Logger
+
+def natural_sort_key(file_name):
+    """Sort key equivalent to `sort -V`, so that run_2 comes before run_10"""
+    return [int(token) if token.isdigit() else token for token in re.split(r"(\d+)", file_name)]
+
+class Manifest:
+    """Cached view of a SAM definition: its file list and per-file metadata
+
+    File lists are cached on disk with a time-to-live, since definitions can grow.
+    Metadata for a given file never changes, so it is cached indefinitely.
+    """
+
+    def __init__(self, ttl=3600, cache_dir=None, batch_size=100, max_workers=4, samweb="samweb", verbosity=1):
+        """Initialise the manifest
+
+        Args:
+            ttl (float, opt): Seconds before a cached file list is refreshed. Defaults to 3600.
+            cache_dir (str, opt): Directory for the cache. Defaults to the pyutils cache.
+            batch_size (int, opt): Number of files per samweb metadata query. Defaults to 100.
+            max_workers (int, opt): Number of metadata queries to run at once. Defaults to 4.
+            samweb (str, opt): samweb executable. Defaults to "samweb" on the PATH.
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+        """
+        self.ttl = ttl
+        self.cache_dir = cache_dir or _cache.get_cache_dir("manifest")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.samweb = samweb
+
+        # Start logger
+        self.logger = Logger(
+            print_prefix = "[pymanifest]",
+            verbosity = verbosity
+        )
+
+    def _cache_path(self, name):
+        """Path of the cache file for a given key"""
+        digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get_file_list(self, defname, refresh=False):
+        """Get the (naturally sorted) file list for a SAM definition
+
+        Args:
+            defname (str): SAM definition name
+            refresh (bool, opt): Ignore the cache and query SAM
+
+        Returns:
+            List of file names
+        """
+        cache_path = self._cache_path(f"files:{defname}")
+
+        if not refresh:
+            cached = _cache.read_json(cache_path)
+            if cached is not None and time.time() - cached["created"] < self.ttl:
+                self.logger.log(f"Using cached file list for {defname} ({len(cached['files'])} files)", "max")
+                return cached["files"]
+
+        output = subprocess.check_output(
+            [self.samweb, "list-files", f"defname: {defname} with availability anylocation"],
+            universal_newlines=True,
+            stderr=subprocess.DEVNULL
+        )
+        file_list = sorted((line.strip() for line in output.splitlines() if line.strip()), key=natural_sort_key)
+
+        with _cache.file_lock(cache_path + ".lock"):
+            _cache.write_json(cache_path, {"defname": defname, "created": time.time(), "files": file_list})
+
+        self.logger.log(f"Queried SAM for {defname} ({len(file_list)} files)", "info")
+        return file_list
+
+    def _query_metadata(self, file_batch):
+        """Query samweb for the metadata of a batch of files"""
+        output = subprocess.check_output(
+            [self.samweb, "get-metadata", "--json", *file_batch],
+            universal_newlines=True,
+            stderr=subprocess.DEVNULL
+        )
+        # samweb prints a single object for one file, otherwise a list (or a stream of objects)
+        records = []
+        decoder = json.JSONDecoder()
+        output = output.strip()
+        while output:
+            record, end = decoder.raw_decode(output)
+            records.extend(record if isinstance(record, list) else [record])
+            output = output[end:].strip()
+
+        return {
+            record["file_name"]: {
+                "size": record.get("file_size"),
+                "entries": record.get("event_count")
+            }
+            for record in records
+        }
+
+    def get_metadata(self, file_list, refresh=False):
+        """Get the size (bytes) and event count of each file, in parallel batches
+
+        Args:
+            file_list (list): File names
+            refresh (bool, opt): Ignore the cache and query SAM
+
+        Returns:
+            dict: File name -> {"size": bytes, "entries": count}
+        """
+        cache_path = self._cache_path("metadata")
+        cached = {} if refresh else _cache.read_json(cache_path, default={})
+
+        missing = [file_name for file_name in file_list if file_name not in cached]
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            self.logger.log(f"Querying metadata for {len(missing)} files in {len(batches)} batches", "info")
+
+            fetched = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for batch_metadata in executor.map(self._query_metadata, batches):
+                    fetched.update(batch_metadata)
+
+            # Merge with anything other processes have written in the meantime
+            with _cache.file_lock(cache_path + ".lock"):
+                on_disk = _cache.read_json(cache_path, default={})
+                on_disk.update(fetched)
+                _cache.write_json(cache_path, on_disk)
+            cached.update(fetched)
+
+        return {file_name: cached[file_name] for file_name in file_list if file_name in cached}
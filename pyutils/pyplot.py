@@ -9,6 +9,7 @@ from matplotlib.ticker import ScalarFormatter
 import matplotlib.colors as colors
 
 from .pylogger import Logger
+from . import pytrace
 
 class Plot:
     """ 
@@ -128,6 +129,7 @@ class Plot:
                 cbar.ax.yaxis.set_major_formatter(ScalarFormatter(useMathText=True))
                 cbar.ax.ticklabel_format(style="sci", axis="y", scilimits=scilimits)
 
+    @pytrace.traced()
     def plot_1D(        
         self,
         array,
@@ -314,6 +316,7 @@ class Plot:
         if show: 
             plt.show()
         
+    @pytrace.traced()
     def plot_1D_overlay(
         self,
         hists_dict, 
@@ -467,6 +470,7 @@ class Plot:
         if show: 
             plt.show()
         
+    @pytrace.traced()
     def plot_2D(
         self,
         x,
@@ -606,6 +610,7 @@ class Plot:
         if show:
             plt.show()
 
+    @pytrace.traced()
     def plot_2D_overlay(
         self,
         x1, y1, x2, y2,
@@ -802,6 +807,7 @@ class Plot:
         if show:
             plt.show()
             
+    @pytrace.traced()
     def plot_graph(
         self,
         x,
@@ -910,6 +916,7 @@ class Plot:
         if show:
             plt.show()
   
+    @pytrace.traced()
     def plot_graph_overlay(
         self,
         graphs,
@@ -1,18 +1,38 @@
 #! /usr/bin/env python
 import os
-import subprocess
+import re
 import gc
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import json
+import time
+import queue
+import asyncio
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import awkward as ak
 import inspect
 import tqdm
 import functools 
+import random
+import shutil
+import pickle
+import tempfile
+import multiprocessing
+from contextlib import nullcontext
 
 from . import _env_manager
-from .pyimport import Importer
+from . import _credentials
+from . import _cache
+from .pyimport import Importer, entry_range, current_entry_range, tree_paths
+from .pyread import Reader
+from .pymanifest import Manifest
+from . import pytelemetry
+from . import pyprofile
+from . import pytrace
+from . import pylogger
 from .pylogger import Logger
 
-def _worker_func(file_name, branches, tree_path, use_remote, location, schema, verbosity):
+def _worker_func(file_name, branches, tree_path, use_remote, location, schema, verbosity, max_opens=None, max_inflight_mb=None, join_on=None):
     """Module-level worker function for processing files"""
     importer = Importer(
         file_name=file_name,
@@ -21,23 +41,327 @@ def _worker_func(file_name, branches, tree_path, use_remote, location, schema, v
         use_remote=use_remote,
         location=location,
         schema=schema,
-        verbosity=verbosity
+        verbosity=verbosity,
+        max_opens=max_opens,
+        max_inflight_mb=max_inflight_mb,
+        join_on=join_on
     )
     return importer.import_branches()
+
+def _batch_worker_func(file_batch, worker_func, concatenate):
+    """Module-level worker function for processing a batch of small files in one task
+
+    Args:
+        file_batch: Tuple of file names
+        worker_func: Function to call for each file 
+        concatenate: Concatenate the (awkward array) results into one array, rather than returning a list
+
+    Returns:
+        Tuple of (results, number of files which failed), so that the parent can count failures per file
+    """
+    results = []
+    for file_name in file_batch:
+        with pylogger.log_context(file_name):
+            results.append(worker_func(file_name))
+    results = [result for result in results if result is not None]
+    n_failed = len(file_batch) - len(results)
+    if not concatenate:
+        return results, n_failed
+    if not results:
+        return None, n_failed
+    with pytrace.span("ak.concatenate", n_arrays=len(results)):
+        return ak.concatenate(results), n_failed
+
+def _task_result(task, result):
+    """Split a task's output into (result, number of its files which failed)
+
+    Args:
+        task: File name, or tuple of file names for a batch (whose output says how many failed)
+        result: Output of the task's worker function
+    """
+    if isinstance(task, tuple):
+        return result
+    return result, 0 if result is not None else 1
+
+def _sample_worker_func(file_name, worker_func, ranges):
+    """Module-level worker function reading only the sampled entry range of each file
+
+    Args:
+        file_name: File name
+        worker_func: Function to call for the file
+        ranges: Dict of file name -> (entry_start, entry_stop)
+    """
+    with entry_range(*ranges.get(file_name, (None, None))):
+        return worker_func(file_name)
+
+def _stable_repr(value):
+    """Representation of a configuration value which is the same from run to run, for cache keys
+
+    Primitives and containers are represented by value (sets and dicts sorted), and other objects 
+    by their own repr where it has no memory address in it, else by their type alone.
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{', '.join(_stable_repr(item) for item in value)}]"
+    if isinstance(value, (set, frozenset)):
+        return f"{type(value).__name__}{{{', '.join(sorted(_stable_repr(item) for item in value))}}}"
+    if isinstance(value, dict):
+        items = sorted(f"{_stable_repr(key)}: {_stable_repr(item)}" for key, item in value.items())
+        return f"{type(value).__name__}{{{', '.join(items)}}}"
+    if isinstance(value, type) or callable(value) and hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    if type(value).__repr__ is not object.__repr__:
+        text = repr(value)
+        if not re.search(r" at 0x[0-9a-fA-F]+", text):
+            return text
+    return f"<{type(value).__module__}.{type(value).__qualname__}>"
+
+def _cached_worker_func(file_name, worker_func, cache_dir, analysis_key):
+    """Module-level worker function serving results from an on-disk cache, running worker_func on a miss
+
+    Args:
+        file_name: File name
+        worker_func: Function to call for the file
+        cache_dir: Directory of cached results for this analysis
+        analysis_key: Hash identifying the analysis code, configuration and pyutils version
+    """
+    # Local files are identified by their size and modification time, remote (SAM) files by name 
+    identity = file_name
+    if "://" not in file_name and os.path.exists(file_name):
+        stat = os.stat(file_name)
+        identity = f"{os.path.abspath(file_name)}|{stat.st_size}|{stat.st_mtime_ns}"
+    path = os.path.join(cache_dir, f"{_cache.hash_key(analysis_key, identity, current_entry_range())}.pkl")
+
+    result = _cache.read_pickle(path)
+    if result is not None:
+        return result
+    result = worker_func(file_name)
+    if result is not None: # Failures are retried next time
+        _cache.write_pickle(path, result)
+    return result
+
+def _tagged_worker_func(file_name, worker_func):
+    """Module-level worker function returning (file_name, result), so the parent knows which files succeeded"""
+    return file_name, worker_func(file_name)
+
+def _is_cut_flow(value):
+    """Whether value looks like a pycut cut flow (a list of dicts with names and event counts)"""
+    return (
+        isinstance(value, list) and len(value) > 0 
+        and all(isinstance(row, dict) and "name" in row and "events_passing" in row for row in value)
+    )
+
+def merge_results(accumulated, new):
+    """Merge two analysis results, as used by incremental Skeleton runs
+
+    Handles common accumulators: numbers and numpy arrays (summed), np.histogram (counts, edges) 
+    tuples, pycut cut flows, dicts (merged key by key), lists and awkward arrays (concatenated), 
+    and any object supporting + (e.g. hist.Hist, collections.Counter). Override Skeleton.merge 
+    for anything else.
+
+    Args:
+        accumulated: Result so far (None if empty)
+        new: Result to merge in
+    Returns:
+        The merged result
+    """
+    if accumulated is None:
+        return new
+    if new is None:
+        return accumulated
+    if isinstance(accumulated, dict) and isinstance(new, dict):
+        merged = dict(accumulated)
+        for key, value in new.items():
+            merged[key] = merge_results(merged.get(key), value)
+        return merged
+    if _is_cut_flow(accumulated) and _is_cut_flow(new):
+        from .pycut import CutManager # Deferred, pycut pulls in pandas
+        return CutManager(verbosity=0).combine_cut_flows([accumulated, new], format_as_df=False)
+    if isinstance(accumulated, ak.Array):
+        return ak.concatenate([accumulated, new])
+    if isinstance(accumulated, tuple) and len(accumulated) == 2 and hasattr(accumulated[1], "shape"):
+        # np.histogram output: sum the counts, which must share their bin edges 
+        counts, edges = accumulated
+        if not (len(edges) == len(new[1]) and (edges == new[1]).all()):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        return counts + new[0], edges
+    if isinstance(accumulated, list):
+        return accumulated + list(new)
+    try:
+        return accumulated + new
+    except TypeError:
+        raise TypeError(f"Cannot merge results of type {type(accumulated).__name__}: override Skeleton.merge")
+
+def _spread_order(n):
+    """Order the indices 0..n-1 so that every leading slice is spread evenly across the range
+
+    Uses the base-2 van der Corput sequence: 0, n/2, n/4, 3n/4, ...
+    """
+    order, seen = [], set()
+    k = 0
+    while len(order) < n:
+        value, denominator, i = 0.0, 1.0, k
+        while i:
+            denominator *= 2
+            value += (i % 2) / denominator
+            i //= 2
+        index = int(value * n)
+        if index not in seen:
+            seen.add(index)
+            order.append(index)
+        k += 1
+    return order
+
+def _validate_func(file_name, tree_path, use_remote, location, schema):
+    """Module-level worker function for pre-flight file checks
+
+    Returns:
+        Tuple of (reason, entries), where reason is None if the file is good
+    """
+    if not use_remote and "://" not in file_name and not os.path.exists(file_name):
+        return "file does not exist", None
+    try:
+        reader = Reader(use_remote=use_remote, location=location, schema=schema, verbosity=0)
+        file = reader.read_file(file_name)
+    except Exception as e:
+        return f"cannot open: {e}", None
+    try:
+        # Walking the key list reads the directory records, which catches most truncation
+        for i, path in enumerate(tree_paths(tree_path).values()):
+            current = file
+            for component in path.split('/'):
+                if component not in current.keys(recursive=False, cycle=False):
+                    return f"'{component}' not found", None
+                current = current[component]
+            if i == 0: # Entries of the first (reference) tree
+                entries = current.num_entries
+        if entries == 0:
+            return "tree has no entries", 0
+        return None, entries
+    except Exception as e:
+        return f"unreadable: {e}", None
+    finally:
+        file.close()
+
+def _plan_func(file_name, branches, tree_path, use_remote, location, schema):
+    """Module-level worker function reading a file's branch sizes from its metadata, for Processor.plan
+
+    Returns:
+        Tuple of (reason, sizes), where reason is None if the file was read. Sizes is a dict with the 
+        number of entries, and branch name -> (compressed, uncompressed) bytes
+    """
+    importer = Importer(
+        file_name=file_name,
+        branches=branches,
+        tree_path=tree_path,
+        use_remote=use_remote,
+        location=location,
+        schema=schema,
+        verbosity=0
+    )
+    try:
+        file = importer.reader.read_file(file_name)
+    except Exception as e:
+        return f"cannot open: {e}", None
+    try:
+        # Sizes of the first (reference) tree only, when reading several
+        name, path = next(iter(tree_paths(tree_path).items()))
+        tree = file[path]
+        sub_branches = branches[name] if isinstance(tree_path, (list, dict)) else None
+        return None, {"entries": tree.num_entries, "branches": importer.branch_sizes(tree, sub_branches)}
+    except Exception as e:
+        return f"unreadable: {e}", None
+    finally:
+        file.close()
+
+def _available_memory():
+    """Memory available to new work in bytes (None if unknown)"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError):
+        return None
+
+# Worker processes only: queue on which tasks report when they start (see _run_task)
+_task_starts = None
+
+# Held by the process_data run using trace, aggregate_logs or profile, which switch process-wide 
+# state (the trace directory, the log queue and the profiler), so only one run can use them at once
+_PROCESS_STATE_LOCK = threading.Lock()
+
+def _init_worker(env, token_path, log_queue=None, task_starts=None):
+    """Module-level initializer for worker processes
+
+    Args:
+        env: Environment captured by the parent (None for local processing)
+        token_path: Bearer token file kept fresh by the parent (None for local processing)
+        log_queue: Queue of the parent's LogListener (None to print directly)
+        task_starts: Queue for reporting task start times to the parent (None if tasks are not watched)
+    """
+    global _task_starts
+    _env_manager.init_worker(env)
+    _credentials.init_worker(token_path)
+    pylogger.set_log_queue(log_queue)
+    _task_starts = task_starts
+
+def _run_task(file_name, worker_func, telemetry=False, profile=False, task_id=None, task_starts=None, rss=False):
+    """Module-level wrapper which times worker_func for the parent's task monitoring
+
+    Args:
+        file_name: File name (or batch of file names) 
+        worker_func: Function to call
+        telemetry: Collect a pytelemetry record for the task
+        profile: Run the task under cProfile and return the stats
+        task_id: Identifier to report the start time under, for the parent's timeouts
+        task_starts: Queue to report the start time on. Defaults to the one given to the worker process.
+        rss: Include the change in resident memory in the telemetry record (process workers only)
+    """
+    outcome = {}
+    with (pytelemetry.task(file_name, rss=rss) if telemetry else nullcontext()) as record, \
+         pytrace.span("task", file=file_name), \
+         pylogger.log_context(file_name):
+        outcome["start"] = time.time()
+        # A future counts as running while it waits in the process pool's call queue, so
+        # timeouts are measured from when the task reports that it has really started
+        task_starts = task_starts if task_starts is not None else _task_starts
+        if task_id is not None and task_starts is not None:
+            task_starts.put((task_id, outcome["start"]))
+        if profile:
+            outcome["result"], outcome["profile"] = pyprofile.profile_call(worker_func, file_name)
+        else:
+            outcome["result"] = worker_func(file_name)
+        outcome["end"] = time.time()
+    if record is not None:
+        outcome["telemetry"] = record
+    pytrace.flush()
+    return outcome
     
 class Processor:
     """Interface for processing files or datasets"""
     
-    def __init__(self, tree_path="EventNtuple/ntuple", use_remote=False, location="tape", schema="root", verbosity=1, worker_verbosity=0):
+    def __init__(self, tree_path="EventNtuple/ntuple", use_remote=False, location="tape", schema="root", verbosity=1, worker_verbosity=0, max_opens=None, max_inflight_mb=None, manifest_ttl=3600, refresh_credentials=True, join_on=None):
         """Initialise the processor
 
         Args:
-            tree_path (str, opt): Path to the Ntuple in file directory. Defaults to "EventNtuple/ntuple"
+            tree_path (str, opt): Path to the Ntuple in file directory. Defaults to "EventNtuple/ntuple". A list of paths, or dict of
+                name -> path, joins several trees from each file into one record array (see pyimport.Importer).
             use_remote (bool, opt): If not using local files. Defaults to False. 
             location (str, opt): Remote file location. Options are tape (default), disk, scratch, or nersc. 
             schema (str, opt): Remote file XRootD schema. Options are root (default), http, path, dcap, or samFile.
             verbosity (int, opt): Level of output detail (0: errors only, 1: info, warnings, 2: max). Defaults to 1.
             worker_verbosity (int, opt): Verbosity for work processes. Defaults to 0. Level of output detail (0: errors only, 1: info, warnings, 2: max)
+            max_opens (int, opt): Cap on simultaneous file opens per storage endpoint, shared by all workers. Defaults to None (no limit).
+            max_inflight_mb (float, opt): Cap on MB being read at once per storage endpoint, shared by all workers. Defaults to None (no limit).
+            manifest_ttl (float, opt): Seconds to cache SAM definition file lists on disk. Defaults to 3600.
+            refresh_credentials (bool, opt): Remote files only. Refresh the bearer token in the background during multi-file jobs. Defaults to True.
+            join_on (tuple, opt): Several trees only. Key branches, e.g. ("run", "subrun", "event"), to join on. Defaults to None (by entry index).
         """
         self.tree_path = tree_path
         self.use_remote = use_remote
@@ -45,6 +369,16 @@ class Processor:
         self.schema = schema
         self.verbosity = verbosity
         self.worker_verbosity = worker_verbosity
+        self.max_opens = max_opens
+        self.max_inflight_mb = max_inflight_mb
+        self.join_on = join_on
+        self.file_metadata = {} # File name -> {"size": bytes, "entries": count}, where known
+        self.manifest_ttl = manifest_ttl
+        self.refresh_credentials = refresh_credentials
+        self.telemetry = None # pytelemetry.Telemetry from the last run, if requested
+        self.profile_report = None # pyprofile.ProfileReport from the last run, if requested
+        self.calibration = None # Executor choice from the last use_processes="auto" run
+        self.sample_estimate = None # Scale estimate from the last sampled run
 
         self.logger = Logger( # Start logger
             print_prefix = "[pyprocess]", 
@@ -58,16 +392,20 @@ class Processor:
         confirm_str = f"Initialised Processor:\n\tpath = '{self.tree_path}'\n\tuse_remote = {self.use_remote}"
         if use_remote:
             confirm_str += f"\n\tlocation = {self.location}\n\tschema = {self.schema}"
+        if max_opens is not None or max_inflight_mb is not None:
+            confirm_str += f"\n\tmax_opens = {self.max_opens}\n\tmax_inflight_mb = {self.max_inflight_mb}"
         confirm_str += f"\n\tverbosity={self.verbosity}"
 
         self.logger.log(confirm_str, "info")
 
-    def get_file_list(self, defname=None, file_list_path=None):
+    def get_file_list(self, defname=None, file_list_path=None, fetch_metadata=False, refresh=False):
         """Utility to get a list of files from a SAM definition OR a text file
         
         Args:
             defname: SAM definition name 
             file_list_path: Path to a plain text file containing file paths
+            fetch_metadata: SAM definitions only. Also fetch file sizes and event counts into self.file_metadata
+            refresh: SAM definitions only. Query SAM rather than use a file list cached within manifest_ttl
             
         Returns:
             List of file paths
@@ -114,12 +452,16 @@ class Processor:
             self.logger.log(f"Loading file list for SAM definition: {defname}", "max")
             
             try:
-                # Setup commands for SAM query
-                commands = f"samweb list-files 'defname: {defname} with availability anylocation' | sort -V 2>/dev/null"
-                
-                # Execute commands
-                file_list_output = subprocess.check_output(commands, shell=True, universal_newlines=True, stderr=subprocess.DEVNULL) 
-                file_list = [line for line in file_list_output.splitlines() if line]
+                # Query SAM (or the on-disk cache)
+                manifest = Manifest(ttl=self.manifest_ttl, verbosity=self.verbosity)
+                file_list = manifest.get_file_list(defname, refresh=refresh)
+
+                # File sizes and event counts are used to plan the processing
+                if fetch_metadata and file_list:
+                    try:
+                        self.file_metadata.update(manifest.get_metadata(file_list))
+                    except Exception as e:
+                        self.logger.log(f"Could not fetch file metadata for {defname}: {e}", "warning")
 
                 if (len(file_list) > 0):
                     self.logger.log(f"Successfully loaded file list\n\tSAM definition: {defname}\n\tCount: {len(file_list)} files", "success")
@@ -137,16 +479,544 @@ class Processor:
             self.logger.log("Error: Either 'defname' or 'file_list_path' must be provide", "error")
             return []  
 
-    def _process_files_parallel(self, file_list, worker_func, max_workers=None, use_processes=False):
+    def _validation_key(self, file_name):
+        """Cache key for a validation verdict: local files are keyed by their size and modification time"""
+        key = f"{file_name}|{self.tree_path}"
+        if not self.use_remote and os.path.exists(file_name):
+            stat = os.stat(file_name)
+            key += f"|{stat.st_size}|{stat.st_mtime_ns}"
+        elif self.use_remote:
+            key += f"|{self.location}|{self.schema}"
+        return key
+
+    def validate_files(self, file_list, max_workers=None, use_cache=True, report_path=None):
+        """Check files in parallel before scheduling, so that corrupt inputs are skipped up front
+        
+        Each file must exist, have a readable header and key list, contain tree_path, and have 
+        a non-zero number of entries. Good verdicts are cached on disk, as are failures for 
+        local files (which are keyed by size and modification time). Remote failures are always 
+        rechecked, since they may be transient. 
+        
+        Args:
+            file_list: List of files to check
+            max_workers: Maximum number of parallel checks. Defaults to min(32, files).
+            use_cache: Use cached verdicts from previous checks
+            report_path: Optional path to write the rejection report as JSON
+            
+        Returns:
+            Tuple of (list of good files, dict of rejected file -> reason)
+        """
+        cache_path = os.path.join(_cache.get_cache_dir("validation"), "verdicts.json")
+        cached = _cache.read_json(cache_path, default={}) if use_cache else {}
+        keys = {file_name: self._validation_key(file_name) for file_name in file_list}
+        to_check = [file_name for file_name in file_list if keys[file_name] not in cached]
+
+        verdicts = {}
+        if to_check:
+            self.logger.log(f"Validating {len(to_check)} files ({len(file_list) - len(to_check)} cached)", "info")
+            check_func = functools.partial(
+                _validate_func,  # Module-level function
+                tree_path=self.tree_path,
+                use_remote=self.use_remote,
+                location=self.location,
+                schema=self.schema
+            )
+            # Opening files is I/O bound, so threads are enough
+            with ThreadPoolExecutor(max_workers=max_workers or min(32, len(to_check))) as executor:
+                for file_name, (reason, entries) in zip(to_check, executor.map(check_func, to_check)):
+                    verdicts[keys[file_name]] = {"reason": reason, "entries": entries}
+
+            # Keep good verdicts, and failures of existing local files (a fixed file gets a new key)
+            keep = {
+                keys[file_name]: verdicts[keys[file_name]] for file_name in to_check
+                if verdicts[keys[file_name]]["reason"] is None or (not self.use_remote and os.path.exists(file_name))
+            }
+            if keep:
+                with _cache.file_lock(cache_path + ".lock"):
+                    on_disk = _cache.read_json(cache_path, default={})
+                    on_disk.update(keep)
+                    _cache.write_json(cache_path, on_disk)
+
+        good_files = []
+        rejected = {}
+        for file_name in file_list:
+            verdict = verdicts.get(keys[file_name]) or cached[keys[file_name]]
+            if verdict["reason"] is None:
+                good_files.append(file_name)
+                self.file_metadata.setdefault(file_name, {})["entries"] = verdict["entries"]
+            else:
+                rejected[file_name] = verdict["reason"]
+
+        if rejected:
+            report = "\n".join(f"\t{file_name}: {reason}" for file_name, reason in rejected.items())
+            self.logger.log(f"Rejected {len(rejected)} of {len(file_list)} files:\n{report}", "warning")
+        else:
+            self.logger.log(f"All {len(file_list)} files passed validation", "success")
+
+        if report_path is not None:
+            with open(report_path, "w") as f:
+                json.dump({"good": good_files, "rejected": rejected}, f, indent=2)
+
+        return good_files, rejected
+
+    def _make_batches(self, file_list, batch_size_mb=None, batch_entries=None):
+        """Internal function to pack small files into batches up to a target size
+
+        Files with an unknown size (or entry count) are given a batch of their own.
+        
+        Args:
+            file_list: List of files 
+            batch_size_mb: Target batch size in MB
+            batch_entries: Target number of entries per batch
+        Returns:
+            List of tuples of file names 
+        """
+        batches = []
+        current, current_mb, current_entries = [], 0, 0
+        for file_name in file_list:
+            metadata = self.file_metadata.get(file_name, {})
+            size = metadata.get("size", None)
+            if size is None and os.path.exists(file_name):
+                size = os.path.getsize(file_name)
+            size_mb = None if size is None else size / 1024**2
+            entries = metadata.get("entries", None)
+            
+            # Check we know enough to pack this file
+            if (batch_size_mb is not None and size_mb is None) or (batch_entries is not None and entries is None):
+                batches.append((file_name,))
+                continue
+
+            # Close the current batch if this file would overflow it
+            full = (
+                (batch_size_mb is not None and current_mb + size_mb > batch_size_mb) or 
+                (batch_entries is not None and current_entries + entries > batch_entries)
+            )
+            if current and full:
+                batches.append(tuple(current))
+                current, current_mb, current_entries = [], 0, 0
+
+            current.append(file_name)
+            current_mb += size_mb or 0
+            current_entries += entries or 0
+
+        if current:
+            batches.append(tuple(current))
+
+        self.logger.log(f"Packed {len(file_list)} files into {len(batches)} batches", "info")
+        return batches
+
+    def plan(self, file_list_path=None, defname=None, branches=None, n_sample=5, measure=False, throughput_mb_s=None, memory_overhead=2.0, target_task_mb=50):
+        """Estimate the cost of a process_data run before submitting it, without reading any events
+        
+        Entries come from the SAM metadata where available. Per-event branch sizes come from the 
+        TTree metadata of a few sampled files, which is read without decompressing any baskets. 
+        The throughput used for the wall time is, in order of preference: throughput_mb_s, a 
+        measured import of one sampled file (measure=True), or the telemetry of the last run.
+
+        Args:
+            file_list_path: Path to file list 
+            defname: SAM definition name
+            branches: Flat list or grouped dict of branches to import
+            n_sample: Number of files to read branch sizes from. Defaults to 5.
+            measure: Time a full import of the smallest sampled file to measure throughput
+            throughput_mb_s: Compressed MB/s read by one worker, if already known
+            memory_overhead: Peak worker memory as a multiple of the decompressed task size. Defaults to 2.
+            target_task_mb: Compressed MB each task should read at least, to amortise per-task overhead. Defaults to 50.
+            
+        Returns:
+            Dict of estimates (sizes in MB, times in seconds) and recommended process_data arguments
+        """
+        file_list = self.get_file_list(file_list_path=file_list_path, defname=defname, fetch_metadata=defname is not None)
+        if not file_list:
+            self.logger.log("No files to plan for", "error")
+            return None
+
+        # Read branch sizes from evenly spaced files 
+        step = max(1, len(file_list) // n_sample)
+        sample = file_list[::step][:n_sample]
+        plan_func = functools.partial(
+            _plan_func, # Module-level function
+            branches=branches,
+            tree_path=self.tree_path,
+            use_remote=self.use_remote,
+            location=self.location,
+            schema=self.schema
+        )
+        with ThreadPoolExecutor(max_workers=len(sample)) as executor:
+            outcomes = dict(zip(sample, executor.map(plan_func, sample)))
+
+        # Estimate from the files which could be read, as process_data would skip the others
+        reasons, warnings = [], []
+        failed = {file_name: reason for file_name, (reason, _) in outcomes.items() if reason is not None}
+        sizes = {file_name: size for file_name, (reason, size) in outcomes.items() if reason is None}
+        sample = list(sizes)
+        if failed:
+            report = "\n".join(f"\t{file_name}: {reason}" for file_name, reason in failed.items())
+            self.logger.log(f"Could not read {len(failed)} of {len(outcomes)} sampled files:\n{report}", "warning")
+            warnings.append(f"{len(failed)} of {len(outcomes)} sampled files could not be read (see validate_files)")
+        if not sizes:
+            self.logger.log("None of the sampled files could be read", "error")
+            return None
+        unsized = [file_name for file_name, size in sizes.items() if not size["branches"]]
+        if unsized:
+            warnings.append(f"None of the requested branches could be sized in {len(unsized)} of {len(sizes)} sampled files, "
+                "so the read and memory estimates leave them out")
+
+        sampled_entries = sum(size["entries"] for size in sizes.values())
+        if sampled_entries == 0:
+            self.logger.log("Sampled files have no entries", "error")
+            return None
+        compressed_per_event = sum(c for size in sizes.values() for c, _ in size["branches"].values()) / sampled_entries
+        uncompressed_per_event = sum(u for size in sizes.values() for _, u in size["branches"].values()) / sampled_entries
+
+        # Scale up with the known entries, or the mean of the sample
+        entries = [self.file_metadata.get(f, {}).get("entries") for f in file_list]
+        entries_known = all(n is not None for n in entries)
+        if not entries_known:
+            entries = [sizes[f]["entries"] if f in sizes else sampled_entries / len(sample) for f in file_list]
+        total_entries = sum(entries)
+        read_mb = compressed_per_event * total_entries / 1024**2
+        final_mb = uncompressed_per_event * total_entries / 1024**2
+
+        # Throughput of one worker
+        cpu_fraction = None
+        if throughput_mb_s is None and measure:
+            smallest = min(sample, key=lambda f: sizes[f]["entries"])
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            _worker_func(smallest, branches, self.tree_path, self.use_remote, self.location, self.schema, 0, join_on=self.join_on)
+            wall_time = time.perf_counter() - wall_start
+            cpu_fraction = (time.thread_time() - cpu_start) / wall_time if wall_time > 0 else None
+            smallest_mb = sum(c for c, _ in sizes[smallest]["branches"].values()) / 1024**2
+            throughput_mb_s = smallest_mb / wall_time if wall_time > 0 else None
+        elif throughput_mb_s is None and self.telemetry is not None and self.telemetry.records:
+            records = self.telemetry.records
+            task_time = sum(record.get("wall_time", 0) for record in records)
+            if task_time > 0:
+                throughput_mb_s = sum(record.get("read_bytes", 0) for record in records) / 1024**2 / task_time
+            cpu_fraction = self.telemetry.summary()["cpu_fraction"]
+
+        # Threads or processes 
+        if cpu_fraction is not None:
+            use_processes = cpu_fraction > 0.5
+            reasons.append(f"measured CPU fraction {cpu_fraction:.2f}, so reads are {'CPU' if use_processes else 'I/O'} bound")
+        else:
+            use_processes = not self.use_remote
+            reasons.append("remote reads are usually network bound" if self.use_remote else "local reads are usually decompression (CPU) bound")
+
+        # Batch small files, so that each task reads a worthwhile amount
+        median_entries = statistics.median(entries)
+        batch_entries = None
+        task_entries = max(entries)
+        if compressed_per_event * median_entries / 1024**2 < target_task_mb:
+            if entries_known:
+                batch_entries = int(target_task_mb * 1024**2 / compressed_per_event)
+                task_entries = max(task_entries, batch_entries)
+                reasons.append(f"median file reads under {target_task_mb} MB, so batch files")
+            else:
+                warnings.append(f"Median file reads under {target_task_mb} MB; consider batch_size_mb")
+
+        # Workers are limited by cores, files and the memory left once the final array is held
+        n_tasks = len(file_list) if batch_entries is None else max(1, int(total_entries // batch_entries))
+        worker_mb = memory_overhead * uncompressed_per_event * task_entries / 1024**2
+        available = _available_memory()
+        # (threads waiting on I/O can usefully outnumber the cores)
+        cores = os.cpu_count() or 1
+        max_workers = min(cores if use_processes else 4 * cores, n_tasks)
+        available_mb = None
+        if available is not None:
+            available_mb = available / 1024**2
+            budget_mb = 0.8 * available_mb - final_mb
+            if budget_mb < worker_mb:
+                warnings.append(f"Final array ({final_mb:.0f} MB) and one worker ({worker_mb:.0f} MB) exceed 80% of available memory "
+                    f"({available_mb:.0f} MB): select fewer branches, or reduce each file in a custom_worker_func")
+                max_workers = 1
+            elif worker_mb > 0 and budget_mb // worker_mb < max_workers:
+                max_workers = max(1, int(budget_mb // worker_mb))
+                reasons.append(f"workers limited to {max_workers} by memory")
+        
+        wall_time = read_mb / (throughput_mb_s * max_workers) if throughput_mb_s else None
+
+        plan = {
+            "files": len(file_list),
+            "sampled_files": len(sample),
+            "entries": total_entries,
+            "entries_known": entries_known,
+            "read_mb": read_mb,
+            "final_array_mb": final_mb,
+            "memory_per_worker_mb": worker_mb,
+            "available_memory_mb": available_mb,
+            "throughput_mb_s": throughput_mb_s,
+            "cpu_fraction": cpu_fraction,
+            "wall_time": wall_time,
+            "max_workers": max_workers,
+            "use_processes": use_processes,
+            "batch_entries": batch_entries,
+            "reasons": reasons,
+            "warnings": warnings
+        }
+
+        self.logger.log(
+            f"Plan for {len(file_list)} files ({total_entries:.0f} {'known' if entries_known else 'estimated'} entries):"
+            f"\n\tread {read_mb:.0f} MB compressed, final array {final_mb:.0f} MB, {worker_mb:.0f} MB per worker"
+            f"\n\testimated wall time {'unknown (pass measure=True)' if wall_time is None else f'{wall_time:.0f}s'}"
+            f"\n\trecommend max_workers={max_workers}, use_processes={use_processes}, batch_entries={batch_entries}"
+            f"\n\t({'; '.join(reasons)})",
+            "info"
+        )
+        for warning in warnings:
+            self.logger.log(warning, "warning")
+
+        return plan
+
+    def _calibrate(self, file_list, worker_func, max_workers=None, telemetry=None, profile_report=None):
+        """Internal function to choose between threads and processes by timing the first few tasks
+
+        One task is run alone to measure how much of its time is spent on the CPU rather than
+        waiting on I/O. If it is mostly CPU, a few more run concurrently in threads: if they
+        do not speed up, the GIL is serialising them and processes are chosen. 
+
+        Args:
+            file_list: List of files (or batches) to process
+            worker_func: Function to call for each file
+            max_workers: Maximum number of workers, if set by the user
+            telemetry (pytelemetry.Telemetry, optional): Collect records of the calibration tasks into this object
+            profile_report (pyprofile.ProfileReport, optional): Merge profiles of the calibration tasks into this report
+        Returns:
+            Tuple of (use_processes, max_workers, results of the calibration tasks, remaining file list)
+        """
+        cores = os.cpu_count() or 1
+        n_concurrent = min(cores, 4, len(file_list) - 1)
+        if n_concurrent < 1:
+            self.logger.log("Too few files to calibrate, using threads", "info")
+            return False, max_workers, [], file_list
+
+        record_lock = threading.Lock()
+        def timed_task(file_name):
+            # Through _run_task like any other task, so calibration shows in the telemetry, profile and trace
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            outcome = _run_task(file_name, worker_func, telemetry=telemetry is not None, profile=profile_report is not None)
+            wall_time, cpu_time = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            with record_lock:
+                if telemetry is not None:
+                    outcome["telemetry"]["queue_wait"] = 0.0
+                    telemetry.add_record(outcome["telemetry"])
+                if profile_report is not None:
+                    profile_report.add(outcome.get("profile"))
+            return _task_result(file_name, outcome["result"])[0], wall_time, cpu_time
+
+        # A task on its own
+        result, serial_wall, serial_cpu = timed_task(file_list[0])
+        results = [result]
+        cpu_fraction = serial_cpu / serial_wall if serial_wall > 0 else 0.0
+
+        if cpu_fraction < 0.5:
+            use_processes = False
+            n_workers = min(4 * cores, len(file_list))
+            reason = f"tasks spend {1 - cpu_fraction:.0%} of their time waiting on I/O"
+            calibrated = file_list[:1]
+        elif n_concurrent < 2:
+            use_processes = False
+            n_workers = 1
+            reason = f"tasks are {cpu_fraction:.0%} CPU but only one core (or two files) is available"
+            calibrated = file_list[:1]
+        else:
+            # The next few concurrently, in threads
+            calibrated = file_list[:1 + n_concurrent]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=n_concurrent) as executor:
+                outcomes = list(executor.map(timed_task, calibrated[1:]))
+            elapsed = time.perf_counter() - start
+            results.extend(outcome[0] for outcome in outcomes)
+            # How many tasks' worth of serial work got done at once
+            speedup = n_concurrent * serial_wall / elapsed if elapsed > 0 else float(n_concurrent)
+            use_processes = speedup < 0.6 * n_concurrent
+            n_workers = min(cores, len(file_list))
+            reason = (
+                f"tasks are {cpu_fraction:.0%} CPU and {n_concurrent} threads ran "
+                f"{speedup:.1f}x the throughput of one ({'GIL bound' if use_processes else 'the GIL is released'})"
+            )
+
+        if use_processes:
+            try:
+                pickle.dumps(worker_func)
+            except Exception as e:
+                use_processes = False
+                reason += f", but the worker function cannot be sent to processes ({e})"
+
+        max_workers = max_workers or n_workers
+        self.calibration = {
+            "use_processes": use_processes,
+            "max_workers": max_workers,
+            "cpu_fraction": cpu_fraction,
+            "reason": reason
+        }
+        self.logger.log(f"Calibrated on {len(calibrated)} tasks: using {max_workers} {'processes' if use_processes else 'threads'}, as {reason}", "info")
+        return use_processes, max_workers, [result for result in results if result is not None], file_list[len(calibrated):]
+
+    def _parse_sample(self, sample):
+        """Internal function to normalise the sample argument of process_data to a dict (or None)"""
+        if sample is None or sample is False:
+            return None
+        if isinstance(sample, dict):
+            unknown = set(sample) - {"fraction", "events", "seconds"}
+            if unknown:
+                raise ValueError(f"Unknown sample keys: {', '.join(sorted(unknown))}")
+            return sample
+        if isinstance(sample, float) and 0 < sample <= 1:
+            return {"fraction": sample}
+        if isinstance(sample, int) and not isinstance(sample, bool) and sample > 0:
+            return {"events": sample}
+        if isinstance(sample, str) and sample.endswith("s"):
+            return {"seconds": float(sample[:-1])}
+        raise ValueError(f"Cannot interpret sample={sample!r}: use a fraction of files, events per file, or a time budget like '30s'")
+
+    def _read_entries(self, file_list, max_workers=None):
+        """Internal function to read the entry counts missing from self.file_metadata, from the file headers only"""
+        missing = [f for f in file_list if self.file_metadata.get(f, {}).get("entries") is None]
+        if not missing:
+            return
+        self.logger.log(f"Reading entry counts of {len(missing)} files", "info")
+        check_func = functools.partial(
+            _validate_func,  # Module-level function
+            tree_path=self.tree_path,
+            use_remote=self.use_remote,
+            location=self.location,
+            schema=self.schema
+        )
+        # Opening files is I/O bound, so threads are enough
+        with ThreadPoolExecutor(max_workers=max_workers or min(32, len(missing))) as executor:
+            for file_name, (_, entries) in zip(missing, executor.map(check_func, missing)):
+                if entries is not None:
+                    self.file_metadata.setdefault(file_name, {})["entries"] = entries
+
+    def _draw_sample(self, file_list, sample):
+        """Internal function to draw a stratified sample of files and entry ranges
+
+        Files are taken evenly across the dataset (which is in natural, i.e. run, order), so that any 
+        leading slice is representative. Entry ranges start at a random, but reproducible, offset in each file,
+        with entry counts read from the file headers where the metadata does not have them.
+        
+        Returns:
+            Tuple of (sampled file list, dict of file name -> (entry_start, entry_stop))
+        """
+        order = _spread_order(len(file_list))
+        if sample.get("fraction") is not None:
+            order = order[:max(1, round(sample["fraction"] * len(file_list)))]
+            if not sample.get("seconds"):
+                order = sorted(order) # Only the time budget needs the spread order
+        sampled = [file_list[i] for i in order]
+
+        ranges = {}
+        events = sample.get("events")
+        if events:
+            # Counts for every file, to place the ranges and to scale the result up to the dataset
+            self._read_entries(file_list)
+            for file_name in sampled:
+                entries = self.file_metadata.get(file_name, {}).get("entries")
+                start = 0
+                if entries is not None and entries > events:
+                    start = random.Random(file_name).randrange(entries - events + 1) # Seeded by the name
+                ranges[file_name] = (start, start + events)
+        return sampled, ranges
+
+    def _sample_estimate(self, full_list, sampled, ranges, elapsed, n_events=None):
+        """Internal function to scale a sampled run up to the full dataset
+        
+        Args:
+            full_list: The full file list
+            sampled: The files which were processed
+            ranges: Entry ranges read from each sampled file
+            elapsed: Wall time of the sampled run
+            n_events: Number of events returned, where known
+        Returns:
+            Dict with the sampled and total files and entries, the scale factor, and the estimated full wall time
+        """
+        entries = {f: self.file_metadata.get(f, {}).get("entries") for f in full_list}
+        total_entries = sum(entries.values()) if all(n is not None for n in entries.values()) else None
+
+        # Entries read, from the returned array or else the ranges and metadata
+        sampled_entries = n_events
+        if sampled_entries is None:
+            counts = []
+            for file_name in sampled:
+                count = entries.get(file_name)
+                if file_name in ranges:
+                    start, stop = ranges[file_name]
+                    count = None if count is None else max(0, min(stop, count) - start)
+                counts.append(count)
+            sampled_entries = sum(counts) if all(n is not None for n in counts) else None
+
+        if total_entries and sampled_entries:
+            scale = total_entries / sampled_entries
+        elif not ranges and sampled:
+            scale = len(full_list) / len(sampled) # Whole files, so scale by file count
+        else:
+            scale = None
+
+        estimate = {
+            "files": len(sampled),
+            "total_files": len(full_list),
+            "entries": sampled_entries,
+            "total_entries": total_entries,
+            "scale": scale,
+            "wall_time": elapsed,
+            "estimated_wall_time": None if scale is None else elapsed * scale
+        }
+        if scale is not None:
+            self.logger.log(
+                f"Sampled {len(sampled)}/{len(full_list)} files{'' if sampled_entries is None else f' ({sampled_entries} entries)'} in {elapsed:.1f}s:"
+                f"\n\tscale results by {scale:.1f} for the full dataset, estimated wall time {elapsed * scale:.0f}s",
+                "info"
+            )
+        else:
+            self.logger.log(f"Sampled {len(sampled)}/{len(full_list)} files in {elapsed:.1f}s (entry counts unknown, so no scale estimate)", "info")
+        return estimate
+
+    def _process_within_budget(self, file_list, worker_func, seconds, max_workers=None, **kwargs):
+        """Internal function to process leading tasks of file_list until a time budget is spent
+
+        A first round of one task per worker measures the rate, and the next round is sized to fill
+        the remaining time.
+        
+        Returns:
+            Tuple of (list of results, number of tasks processed)
+        """
+        start = time.time()
+        results = []
+        done = 0
+        round_size = max_workers or min(len(file_list), os.cpu_count() or 1)
+        while done < len(file_list) and round_size > 0:
+            results += self._process_files_parallel(file_list[done:done + round_size], worker_func, max_workers=max_workers, **kwargs)
+            done += round_size
+            elapsed = time.time() - start
+            round_size = int((seconds - elapsed) * done / elapsed) if elapsed > 0 else len(file_list)
+        return results, min(done, len(file_list))
+
+    def _process_files_parallel(self, file_list, worker_func, max_workers=None, use_processes=False, task_timeout=None, straggler_factor=None, speculative=False, heartbeat=1.0, telemetry=None, profile_report=None, profile_every=1, on_result=None, cancel_event=None):
         """Internal function to parallelise file operations with given a process function
         
         Args:
-            file_list: List of files to process
+            file_list: List of files (or tuples of files from _make_batches) to process
             worker_func: Function to call for each file (must accept file name as first argument)
             max_workers: Maximum number of worker threads
             use_processes (bool, optional): Use process pool rather than thread pool 
+            task_timeout (float, optional): Wall-clock seconds after which a running task is abandoned and counted as failed
+            straggler_factor (float, optional): Flag running tasks slower than this multiple of the median completed task time
+            speculative (bool, optional): Launch a duplicate of each straggler, keeping whichever copy finishes first
+            heartbeat (float, optional): Seconds between checks on running tasks
+            telemetry (pytelemetry.Telemetry, optional): Collect per-task records into this object
+            profile_report (pyprofile.ProfileReport, optional): Profile tasks and merge their stats into this object
+            profile_every (int, optional): Profile one in this many tasks
+            on_result (callable, optional): Called with each result as it arrives
+            cancel_event (threading.Event, optional): When set, stop and return the results so far
         Returns:
             List of results from each processed file
+
+        Note: 
+            Timeouts and straggler checks run from when a task starts in its worker, not from when 
+            it is queued. Threads cannot be killed, so a task which times out in thread mode keeps 
+            its thread, and the interpreter waits for it at exit: use processes for task_timeout to 
+            guard against hung reads, since a process pool is terminated once the other tasks finish.
         """
         
         if not file_list:
@@ -160,16 +1030,50 @@ class Processor:
         ExecutorClass = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
         executor_type = "processes" if use_processes else "threads"
         
-        self.logger.log(f"Starting processing on {len(file_list)} files with {max_workers} {executor_type}", "info")
+        # Batches count towards progress by their number of files
+        weights = [len(item) if isinstance(item, tuple) else 1 for item in file_list]
+        if len(weights) < sum(weights):
+            self.logger.log(f"Starting processing on {sum(weights)} files in {len(file_list)} batches with {max_workers} {executor_type}", "info")
+        else:
+            self.logger.log(f"Starting processing on {len(file_list)} files with {max_workers} {executor_type}", "info")
+
+        # Only poll running tasks if we need to watch them (or check for cancellation)
+        watch_tasks = task_timeout is not None or straggler_factor is not None
+        poll = watch_tasks or cancel_event is not None
+
+        # Watched tasks report when they start, in the worker, on this queue
+        task_starts = None
+        if watch_tasks:
+            task_starts = multiprocessing.Queue() if use_processes else queue.Queue()
+        if task_timeout is not None and not use_processes:
+            self.logger.log("Threads cannot be stopped, so a task which times out keeps running and delays exit until it returns: use processes to terminate hung tasks", "warning")
+
+        task_func = functools.partial(
+            _run_task, 
+            worker_func=worker_func, 
+            telemetry=telemetry is not None,
+            task_starts=None if use_processes else task_starts, # Worker processes are given it by the initializer
+            rss=use_processes # Memory is shared by threads, so a task's own change is unknown
+        )
 
         # Store results in a list
         results = []  
 
         # For tracking progress
-        total_files = len(file_list)
+        total_files = sum(weights)
         completed_files = 0 
         failed_files = 0
 
+        # For tracking running tasks
+        durations = []         # Wall time of completed tasks 
+        submitted = {}         # Future -> time it was submitted
+        started = {}           # Future -> time its task started in the worker (watched tasks only)
+        task_ids = {}          # Start report id -> future
+        copies = {}            # Task index -> futures running it (more than one if speculated)
+        finished_tasks = set() # Tasks with a result (or given up on)
+        speculated = set()     # Tasks which already have a duplicate 
+        abandoned = False      # Whether any task was left hanging
+
         # Set up tqdm format and styling
         bar_format = "{desc}: {percentage:3.0f}%|{bar:30}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]"
 
@@ -182,52 +1086,175 @@ class Processor:
             ncols=150 
         ) as pbar:
             
-            # Start thread pool executor
-            with ExecutorClass(max_workers=max_workers) as executor:
+            # Keep the token fresh, so that long remote jobs finish in one pass (shared by concurrent jobs)
+            credentials = None
+            if self.use_remote and self.refresh_credentials:
+                credentials = _credentials.acquire_shared(verbosity=self.verbosity)
+
+            # Start executor (shut down by hand so hung tasks can be abandoned)
+            if use_processes:
+                # Hand workers the parent's environment, rather than each repeating the setup
+                executor = ExecutorClass(
+                    max_workers=max_workers,
+                    initializer=_init_worker,
+                    initargs=(
+                        _env_manager.CAPTURED_ENV if self.use_remote else None,
+                        credentials.token_path if credentials is not None else None,
+                        pylogger.get_log_queue(),
+                        task_starts
+                    )
+                )
+            else:
+                executor = ExecutorClass(max_workers=max_workers)
+            try:
+                futures = {} # Future -> task index
+
+                def submit(task, profile=False):
+                    """Submit one copy of a task"""
+                    task_id = len(task_ids)
+                    future = executor.submit(task_func, file_list[task], profile=profile, task_id=task_id if watch_tasks else None)
+                    task_ids[task_id] = future
+                    futures[future] = task
+                    copies.setdefault(task, []).append(future)
+                    submitted[future] = time.time()
+                    return future
+
                 # Create futures for each file processing task
-                futures = {executor.submit(worker_func, file_name): file_name for file_name in file_list}
-                
-                # Process results as they complete
-                for future in as_completed(futures):
-                    file_name = futures[future]
-                    try:
-                        result = future.result()
-                        if result is not None:
-                            results.append(result)
-                            completed_files += 1
-                        else: 
-                            failed_files += 1
-                        
-                        # Extract just the base filename for cleaner output
-                        base_file_name = file_name.split('/')[-1]
-                        
-                    except Exception as e:
-                        self.logger.log(f"Error processing {file_name}:\n{e}", "error")
-                        # Increment failed files on exception
-                        failed_files += 1
-                        # Redraw progress bar
-                        pbar.refresh()
-                        # Propagete
-                        raise e
-
-                    finally:
-                        # Always update the progress bar, regardless of success or failure
-                        pbar.update(1)
-                        # Update postfix with stats
-                        pbar.set_postfix({
-                            "successful": completed_files, 
-                            "failed": failed_files 
-                        })
-                        # Safety cleanup
-                        gc.collect()
+                for i in range(len(file_list)):
+                    submit(i, profile=profile_report is not None and i % profile_every == 0)
+                pending = set(futures)
+
+                while pending:
+                    if cancel_event is not None and cancel_event.is_set():
+                        unfinished = len(set(futures.values()) - finished_tasks)
+                        self.logger.log(f"Cancelled with {unfinished} tasks unfinished, returning partial results", "warning")
+                        abandoned = any(future.running() for future in pending)
+                        break
+
+                    done, pending = wait(
+                        pending,
+                        timeout=heartbeat if poll else None,
+                        return_when=FIRST_COMPLETED
+                    )
+
+                    # Process results as they complete
+                    for future in done:
+                        task = futures[future]
+                        file_name = file_list[task]
+                        if task in finished_tasks or future.cancelled():
+                            continue # Lost a speculative race, or timed out already
+                        finished_tasks.add(task)
+                        try:
+                            outcome = future.result()
+                            durations.append(outcome["end"] - outcome["start"])
+                            if telemetry is not None:
+                                outcome["telemetry"]["queue_wait"] = max(0.0, outcome["start"] - submitted[future])
+                                telemetry.add_record(outcome["telemetry"])
+                            if profile_report is not None:
+                                profile_report.add(outcome.get("profile"))
+                            result, n_failed = _task_result(file_list[task], outcome["result"])
+                            if result is not None:
+                                results.append(result)
+                                if on_result is not None:
+                                    on_result(result)
+                            completed_files += weights[task] - n_failed
+                            failed_files += n_failed
+
+                            # Drop any duplicate of this task still queued or running
+                            for other in copies[task]:
+                                if other is not future:
+                                    if not other.cancel():
+                                        abandoned = True # Already running, leave it behind
+                                    pending.discard(other)
+                            
+                        except Exception as e:
+                            self.logger.log(f"Error processing {file_name}:\n{e}", "error")
+                            # Increment failed files on exception
+                            failed_files += weights[task]
+                            # Redraw progress bar
+                            pbar.refresh()
+                            # Propagete
+                            raise e
+
+                        finally:
+                            # Always update the progress bar, regardless of success or failure
+                            pbar.update(weights[task])
+                            # Update postfix with stats
+                            postfix = {
+                                "successful": completed_files, 
+                                "failed": failed_files 
+                            }
+                            if telemetry is not None:
+                                summary = telemetry.summary()
+                                postfix["events/s"] = f"{summary['events_per_s']:.0f}"
+                                postfix["MB/s"] = f"{summary['mb_per_s']:.1f}"
+                            pbar.set_postfix(postfix)
+                            # Safety cleanup
+                            gc.collect()
+
+                    if not watch_tasks:
+                        continue
+
+                    # Heartbeat: check on the tasks which have started
+                    while True:
+                        try:
+                            task_id, start_time = task_starts.get_nowait()
+                        except queue.Empty:
+                            break
+                        started[task_ids[task_id]] = start_time
+                    now = time.time()
+                    median = statistics.median(durations) if len(durations) >= 3 else None
+                    for future in list(pending):
+                        if future not in started:
+                            continue
+                        task = futures[future]
+                        if task in finished_tasks:
+                            continue
+                        file_name = file_list[task]
+                        elapsed = now - started[future]
+
+                        if task_timeout is not None and elapsed > task_timeout:
+                            self.logger.log(f"Timed out after {elapsed:.0f}s processing {file_name}", "error")
+                            abandoned = True
+                            finished_tasks.add(task)
+                            failed_files += weights[task]
+                            for other in copies[task]:
+                                other.cancel()
+                                pending.discard(other)
+                            pbar.update(weights[task])
+                            pbar.set_postfix({
+                                "successful": completed_files, 
+                                "failed": failed_files 
+                            })
+
+                        elif (straggler_factor is not None and median is not None 
+                              and elapsed > straggler_factor * median and task not in speculated):
+                            speculated.add(task)
+                            self.logger.log(f"Straggler: {file_name} running for {elapsed:.0f}s (median {median:.0f}s)", "warning")
+                            if speculative:
+                                pending.add(submit(task))
+
+                if failed_files:
+                    self.logger.log(f"{failed_files} of {total_files} files failed", "warning")
 
                 # More safety cleanup
-                del futures
+                futures.clear()
+
+            finally:
+                # Hung workers would otherwise block interpreter exit (the executor forgets them on shutdown)
+                hung_processes = list((getattr(executor, "_processes", None) or {}).values()) if abandoned and use_processes else []
+                executor.shutdown(wait=not abandoned, cancel_futures=True)
+                for process in hung_processes:
+                    process.terminate()
+                if abandoned and not use_processes:
+                    self.logger.log("Abandoned tasks are still running in threads, and will delay exit until they return", "warning")
+                if credentials is not None:
+                    _credentials.release_shared()
         
         # Return the results
         return results
             
-    def process_data(self, file_name=None, file_list_path=None, defname=None, branches=None, max_workers=None, custom_worker_func=None, use_processes=False):
+    def process_data(self, file_name=None, file_list_path=None, defname=None, branches=None, max_workers=None, custom_worker_func=None, use_processes=False, task_timeout=None, straggler_factor=None, speculative=False, batch_size_mb=None, batch_entries=None, validate=False, telemetry=False, profile=None, trace=None, aggregate_logs=None, sample=None, file_list=None, on_result=None, cancel_event=None):
         """Process the data 
         
         Args:
@@ -237,17 +1264,43 @@ class Processor:
             branches: Flat list or grouped dict of branches to import
             max_workers: Maximum number of parallel workers
             custom_worker_func: Optional custom processing function for each file 
-            use_processes: Whether to use processes rather than threads
+            use_processes: Whether to use processes rather than threads, or "auto" to choose (and the number
+                of workers, unless given) by timing the first few files. Their results are kept.
+            task_timeout: Wall-clock seconds after which a file's task is abandoned and counted as failed (None for no limit). 
+                Best used with processes, whose hung workers are terminated: a thread cannot be stopped, so keeps running.
+            straggler_factor: Flag tasks running longer than this multiple of the median task time, e.g. 3 (None to disable)
+            speculative: Re-launch stragglers as duplicate tasks, keeping the first result to finish
+            batch_size_mb: Pack small files into tasks of up to this many MB, processed together in one worker (None for one file per task)
+            batch_entries: Pack small files into tasks of up to this many entries, where entry counts are known from file metadata (None for one file per task)
+            validate: Check all files in parallel before processing and skip corrupt or empty ones (see validate_files)
+            telemetry: Collect per-task throughput records into self.telemetry. If a string, also export them 
+                to "<telemetry>.jsonl" and a Prometheus textfile "<telemetry>.prom"
+            profile: Run cProfile in the workers on one in every `profile` tasks (True for all), merging 
+                the stats into self.profile_report. None to disable.
+            trace: Path to write a Chrome trace-event timeline of the pipeline stages in all workers
+                (open with chrome://tracing or ui.perfetto.dev). None to disable.
+            aggregate_logs: Send all log output through one pylogger.LogListener, which writes whole lines 
+                tagged with the worker and file, deduplicates repeated warnings and rate-limits. True to 
+                write to the console, or a path to append to a file. None to disable.
+                Profile, trace and aggregate_logs switch process-wide state, so a run using any of them raises 
+                RuntimeError if another run in the process (e.g. a concurrent AsyncJob) is already using them.
+            sample: Run on a representative sample, spread evenly across the dataset, for quick iteration. One of:
+                a fraction of files (float, e.g. 0.05), events per file (int, e.g. 1000), a time budget (str, e.g. "30s"), 
+                or a dict combining "fraction", "events" and "seconds". None to process everything.
+            file_list: List of files to process, e.g. a subset from get_file_list
+            on_result: Called with each file's result (array, or custom output) as it arrives, from the calling thread 
+            cancel_event: threading.Event which stops the run when set, returning the results so far (see submit_async)
             
         Returns:
             - If custom_worker_func is None: a concatenated awkward array with imported data from all files
             - If custom_worker_func is not None: a list of outputs from the custom process
+            - If sampling: a tuple of the above and a dict estimating how to scale it to the full dataset
         """
 
         # Check that we have one type of file argument 
-        file_sources = sum(x is not None for x in [file_name, defname, file_list_path])
+        file_sources = sum(x is not None for x in [file_name, defname, file_list_path, file_list])
         if file_sources != 1: 
-            self.logger.log(f"Please provide exactly one of 'file_name', 'file_list_path', or defname'", "error")
+            self.logger.log(f"Please provide exactly one of 'file_name', 'file_list_path', 'defname', or 'file_list'", "error")
             return None
 
         # Validate custom_worker_func if provided
@@ -257,9 +1310,13 @@ class Processor:
                 self.logger.log(f"custom_worker_func is not callable", "error")
                 return None
                 
-            # Check function signature
+            # Check function signature (extra arguments must have defaults, e.g. from functools.partial)
             sig = inspect.signature(custom_worker_func)
-            if len(sig.parameters) != 1:
+            required = [
+                parameter for parameter in sig.parameters.values() 
+                if parameter.default is parameter.empty and parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+            ]
+            if len(required) != 1:
                 self.logger.log(f"custom_worker_func must take exactly one argument (file_name)", "error")
                 return None
             
@@ -272,7 +1329,10 @@ class Processor:
                 use_remote=self.use_remote,
                 location=self.location,
                 schema=self.schema,
-                verbosity=0 if file_name is None else self.worker_verbosity # multifile only
+                verbosity=0 if file_name is None else self.worker_verbosity, # multifile only
+                max_opens=self.max_opens,
+                max_inflight_mb=self.max_inflight_mb,
+                join_on=self.join_on
             )
         else: # Use the custom process function  
             worker_func = custom_worker_func
@@ -284,34 +1344,264 @@ class Processor:
             return result 
 
         # Prepare file list
-        file_list = self.get_file_list(file_list_path=file_list_path, defname=defname)
-
-        # Get list of results 
-        results = self._process_files_parallel(
-            file_list,
-            worker_func,
-            max_workers=max_workers,
-            use_processes=use_processes
+        if file_list is None:
+            file_list = self.get_file_list(file_list_path=file_list_path, defname=defname, fetch_metadata=defname is not None)
+
+        # Drop bad inputs before any work is scheduled
+        if validate and file_list:
+            file_list, _ = self.validate_files(file_list)
+
+        # Draw a representative sample (the Importers read just the sampled entry ranges) 
+        sample = self._parse_sample(sample)
+        full_list, ranges = file_list, {}
+        if sample is not None and file_list:
+            file_list, ranges = self._draw_sample(file_list, sample)
+            if ranges:
+                worker_func = functools.partial(
+                    _sample_worker_func, # Module-level function
+                    worker_func=worker_func,
+                    ranges=ranges
+                )
+
+        # Start the largest files first, so that they are not left running at the end
+        # (unless working to a time budget, which needs the sample's spread order)
+        if file_list and not (sample and sample.get("seconds")) and all(self.file_metadata.get(f, {}).get("size") is not None for f in file_list):
+            file_list = sorted(file_list, key=lambda f: self.file_metadata[f]["size"], reverse=True)
+
+        # Pack small files into batch tasks, so per-task overhead is paid once per batch
+        batched = batch_size_mb is not None or batch_entries is not None
+        if batched and file_list:
+            file_list = self._make_batches(file_list, batch_size_mb=batch_size_mb, batch_entries=batch_entries)
+            worker_func = functools.partial(
+                _batch_worker_func, # Module-level function
+                worker_func=worker_func,
+                concatenate=custom_worker_func is None
+            )
+
+        # Collect per-task records 
+        self.telemetry = pytelemetry.Telemetry(verbosity=self.verbosity) if telemetry else None
+        self.profile_report = pyprofile.ProfileReport(verbosity=self.verbosity) if profile else None
+
+        # Refuse to overlap another run (e.g. a concurrent AsyncJob) which switched on the same process-wide state
+        exclusive = [name for name, value in (("trace", trace), ("aggregate_logs", aggregate_logs), ("profile", profile)) if value]
+        if exclusive and not _PROCESS_STATE_LOCK.acquire(blocking=False):
+            raise RuntimeError(
+                f"Another process_data run in this process is using trace, aggregate_logs or profile, which are process-wide: "
+                f"wait for it to finish before running with {', '.join(exclusive)}"
+            )
+
+        trace_dir, log_listener = None, None
+        try:
+            # Switch on tracing before the pool starts, so that the workers inherit it
+            if trace:
+                trace_dir = tempfile.mkdtemp(prefix="pyutils_trace_")
+                pytrace.enable(trace_dir)
+
+            # Likewise, start the listener first so that the workers are handed its queue
+            if aggregate_logs and pylogger.get_log_queue() is None:
+                log_listener = pylogger.LogListener(
+                    output=aggregate_logs if isinstance(aggregate_logs, str) else None
+                ).start()
+
+            start = time.time()
+            tasks = file_list
+
+            # Choose the executor on the first few tasks, keeping their results 
+            results = []
+            if use_processes == "auto" and file_list:
+                use_processes, max_workers, results, file_list = self._calibrate(
+                    file_list, worker_func, max_workers=max_workers, telemetry=self.telemetry, profile_report=self.profile_report
+                )
+
+            # Report batches file by file 
+            if on_result is not None and batched and custom_worker_func is not None:
+                report = on_result
+                on_result = lambda batch: [report(result) for result in batch]
+            if on_result is not None:
+                for result in results:
+                    on_result(result)
+
+            run_kwargs = dict(
+                max_workers=max_workers,
+                use_processes=use_processes,
+                task_timeout=task_timeout,
+                straggler_factor=straggler_factor,
+                speculative=speculative,
+                telemetry=self.telemetry,
+                profile_report=self.profile_report,
+                profile_every=1 if profile is True else (profile or 1),
+                on_result=on_result,
+                cancel_event=cancel_event
+            )
+
+            # Get list of results 
+            if sample and sample.get("seconds") and file_list:
+                remaining = sample["seconds"] - (time.time() - start)
+                budget_results, n_done = self._process_within_budget(file_list, worker_func, remaining, **run_kwargs) if remaining > 0 else ([], 0)
+                results += budget_results
+                tasks = tasks[:len(tasks) - len(file_list) + n_done]
+            elif file_list:
+                results += self._process_files_parallel(file_list, worker_func, **run_kwargs)
+
+            if self.profile_report is not None:
+                self.profile_report.print_report()
+
+            if self.telemetry is not None:
+                self.telemetry.log_summary()
+                if isinstance(telemetry, str):
+                    self.telemetry.write_jsonl(f"{telemetry}.jsonl")
+                    self.telemetry.write_prometheus(f"{telemetry}.prom")
+
+            if batched and custom_worker_func is not None:
+                # Unpack the per-file outputs from each batch
+                results = [result for batch in results for result in batch]
+
+            if len(results) == 0:
+                self.logger.log(f"Results list has length zero", "warning")
+
+            if custom_worker_func is None:
+                # Concatenate the arrays
+                with pytrace.span("ak.concatenate", n_arrays=len(results)):
+                    results = ak.concatenate(results)
+                if results is not None:
+                    self.logger.log(f"Returning concatenated array containing {len(results)} events", "success")
+                    self.logger.log(f"Array structure:", "max")
+                    if self.verbosity > 1:
+                        results.type.show()
+                else:
+                    self.logger.log(f"Concatenated array is None (failed to import branches)", "error")
+                    return None
+            else: 
+                self.logger.log(f"Returning {len(results)} results", "info")
+
+            if sample is not None:
+                sampled = [f for task in tasks for f in (task if isinstance(task, tuple) else (task,))]
+                self.sample_estimate = self._sample_estimate(
+                    full_list, 
+                    sampled, 
+                    ranges, 
+                    time.time() - start, 
+                    n_events=len(results) if custom_worker_func is None else None
+                )
+                return results, self.sample_estimate
+
+            return results
+
+        finally:
+            try:
+                if log_listener is not None:
+                    log_listener.stop()
+                if trace_dir is not None:
+                    pytrace.write_chrome_trace(trace, verbosity=self.verbosity)
+                    pytrace.disable()
+                    shutil.rmtree(trace_dir, ignore_errors=True)
+            finally:
+                if exclusive:
+                    _PROCESS_STATE_LOCK.release()
+
+    def submit_async(self, **kwargs):
+        """Start process_data in the background of the running asyncio event loop
+
+        Must be called from a coroutine (e.g. a notebook cell or a request handler). Use a 
+        separate Processor for each concurrent job, since results like telemetry are kept on it. 
+        Concurrent jobs share one token refresher, but only one at a time can use profile, trace 
+        or aggregate_logs, which are process-wide (an overlapping job using them raises RuntimeError).
+
+        Args:
+            **kwargs: Arguments for process_data
+
+        Returns:
+            AsyncJob: Await it for the final result, or iterate over it with async for
+        """
+        return AsyncJob(self, **kwargs)
+
+    async def process_data_async(self, **kwargs):
+        """Awaitable process_data, which leaves the event loop free while it runs
+
+        Cancelling the awaiting task stops the run (tasks already running are abandoned).
+
+        Args:
+            **kwargs: Arguments for process_data
+
+        Returns:
+            The result of process_data
+        """
+        job = self.submit_async(**kwargs)
+        try:
+            return await job
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+
+class AsyncJob:
+    """Handle on a process_data run started by Processor.submit_async
+
+    Example:
+        job = processor.submit_async(file_list_path="files.txt", branches=["event"])
+        async for array in job:  # Each file's result as it arrives
+            ...
+        job.results              # The results so far, at any time
+        job.cancel()             # Stop early, keeping the results so far 
+        result = await job       # The usual process_data result
+    """
+
+    _DONE = object() # Marks the end of the results
+
+    def __init__(self, processor, **kwargs):
+        """Start the job
+        
+        Args:
+            processor (Processor): Processor to run
+            **kwargs: Arguments for process_data
+        """
+        if "on_result" in kwargs or "cancel_event" in kwargs:
+            raise ValueError("AsyncJob sets on_result and cancel_event itself")
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._cancel_event = threading.Event()
+        self.results = [] # Results received so far
+        self._future = self._loop.run_in_executor(
+            None, 
+            functools.partial(
+                processor.process_data, 
+                on_result=self._on_result, 
+                cancel_event=self._cancel_event, 
+                **kwargs
+            )
         )
+        # Scheduled after every result, since both go through the loop in order
+        self._future.add_done_callback(lambda _: self._queue.put_nowait(self._DONE))
 
-        if len(results) == 0:
-            self.logger.log(f"Results list has length zero", "warning")
-
-        if custom_worker_func is None:
-            # Concatenate the arrays
-            results = ak.concatenate(results)
-            if results is not None:
-                self.logger.log(f"Returning concatenated array containing {len(results)} events", "success")
-                self.logger.log(f"Array structure:", "max")
-                if self.verbosity > 1:
-                    results.type.show()
-            else:
-                self.logger.log(f"Concatenated array is None (failed to import branches)", "error")
-                return None
-        else: 
-            self.logger.log(f"Returning {len(results)} results", "info")
+    def _on_result(self, result):
+        """Called from the processing thread"""
+        self._loop.call_soon_threadsafe(self._deliver, result)
 
-        return results
+    def _deliver(self, result):
+        self.results.append(result)
+        self._queue.put_nowait(result)
+
+    def cancel(self):
+        """Stop the job: no new tasks start, and awaiting it returns the results so far"""
+        self._cancel_event.set()
+
+    def cancelled(self):
+        """Whether cancel was called"""
+        return self._cancel_event.is_set()
+
+    def done(self):
+        """Whether the job has finished"""
+        return self._future.done()
+
+    def __await__(self):
+        return self._future.__await__()
+
+    async def __aiter__(self):
+        """Yield each result as it arrives (one consumer per job)"""
+        while True:
+            result = await self._queue.get()
+            if result is self._DONE:
+                return
+            yield result
 
 # -----------------------------------------------------------------------
 # Template for creating a custom processors with the Processor framework
@@ -350,13 +1640,32 @@ class Skeleton:
         # Data import configuration
         self.branches = []          # List of branches to import
         self.tree_path = "EventNtuple/ntuple"  # Path to tree name in file directory
+        self.join_on = None         # Key branches joining a list of tree_paths, e.g. ("run", "subrun", "event") (None=by entry index)
         self.use_remote = False     # Whether to use remote file access
         self.location = "tape"      # File location (tape, disk, scratch, nersc)
         self.schema = "root"        # URL schema for remote files
+        self.max_opens = None       # Cap on simultaneous opens per storage endpoint (None=no limit)
+        self.max_inflight_mb = None # Cap on MB being read at once per storage endpoint (None=no limit)
         
         # Processing configuration
         self.max_workers = None     # Number of parallel workers (None=auto)
-        self.use_processes = False  # Whether to use processes rather than threads 
+        self.use_processes = False  # Whether to use processes rather than threads ("auto" to calibrate)
+        self.task_timeout = None    # Seconds before a hung file is abandoned (None=no limit)
+        self.straggler_factor = None # Flag files slower than this multiple of the median (None=off)
+        self.speculative = False    # Re-launch stragglers, keeping the first result
+        self.batch_size_mb = None   # Pack small files into tasks of up to this many MB (None=one file per task)
+        self.batch_entries = None   # Pack small files into tasks of up to this many entries (None=one file per task)
+        self.validate = False       # Check files before processing and skip bad ones
+        self.telemetry = False      # Collect throughput records (a string also exports them to <telemetry>.jsonl/.prom)
+        self.profile = None         # Profile one in every N tasks in the workers (True=all, None=off)
+        self.aggregate_logs = None  # Write worker logs through one listener (True=console, or a file path)
+        self.sample = None          # Quick run on a sample: fraction of files, events per file, or time budget like "30s" (None=all)
+        self.sample_estimate = None # Scale estimate from the last sampled run
+        self.cache_results = False  # Serve process_file results for unchanged files and analysis code from disk
+        self.cache_dir = None       # Directory for cached results (None=pyutils cache directory)
+        self.state_path = None      # Incremental mode: keep the merged result here and process only new files on later runs (None=off)
+        self.rebuild_on_removal = True # Incremental mode: rebuild from scratch when files have left the dataset
+        self.removed_files = []     # Incremental mode: files which left the dataset since the last run
         self.verbosity = verbosity
         self.worker_verbosity = 0   # Verbosity of worker function
         # Analysis-specific configuration
@@ -373,11 +1682,56 @@ class Skeleton:
         self.logger.log("Skeleton init", "info")
         
         
+    # Methods and attributes which do not change the output of process_file, so are left out of the cache key
+    CACHE_IGNORE = {
+        "CACHE_IGNORE", "postprocess", "execute", "clear_cache", "logger", "verbosity", "worker_verbosity", 
+        "file_list_path", "defname", "file_name", "max_workers", "use_processes", "task_timeout", 
+        "straggler_factor", "speculative", "batch_size_mb", "batch_entries", "validate", "telemetry", 
+        "profile", "aggregate_logs", "max_opens", "max_inflight_mb", "sample", "sample_estimate", 
+        "cache_results", "cache_dir", "merge", "state_path", "rebuild_on_removal", "removed_files"
+    }
+
+    def _analysis_key(self):
+        """Hash of the analysis code and configuration, and the pyutils version
+
+        Each method is hashed separately, so that editing postprocess (or other ignored members) 
+        keeps the cached results.
+        """
+        sources = []
+        for cls in type(self).__mro__[:-1]: # All but object
+            for name, value in sorted(vars(cls).items()):
+                if name in self.CACHE_IGNORE or name.startswith("__") and name != "__init__":
+                    continue
+                if hasattr(value, "__code__"):
+                    try:
+                        sources.append(f"{cls.__qualname__}.{name}:{inspect.getsource(value)}")
+                    except (OSError, TypeError): # No source file (e.g. defined interactively), so use the bytecode
+                        sources.append(f"{cls.__qualname__}.{name}:{value.__code__.co_code.hex()}:{value.__code__.co_consts}")
+                else:
+                    sources.append(f"{cls.__qualname__}.{name}:{_stable_repr(value)}")
+        # Objects such as a CutManager are keyed by type, since their default repr changes every run
+        config = {key: _stable_repr(value) for key, value in sorted(vars(self).items()) if key not in self.CACHE_IGNORE}
+        return _cache.hash_key(_cache.package_version(), *sources, json.dumps(config, sort_keys=True))
+
+    def _results_cache_dir(self):
+        """Directory holding this analysis's cached results"""
+        root = self.cache_dir or _cache.get_cache_dir("results")
+        path = os.path.join(root, self._analysis_key()[:16])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def clear_cache(self):
+        """Delete the cached results of this analysis"""
+        shutil.rmtree(self._results_cache_dir(), ignore_errors=True)
+        self.logger.log("Cleared cached results", "info")
+        
     def process_file(self, file_name):
         """Process a single file
         
         This is the core method that will be called for each file.
-        Implement your file processing logic here.
+        By default it imports self.branches and hands the array to process_array, so 
+        implement your logic in process_array (which lets the analysis share a 
+        Multiplexer pass), or override this method entirely.
         
         Args:
             file_name: Name of the file to process
@@ -392,7 +1746,10 @@ class Skeleton:
                 use_remote=self.use_remote,
                 location=self.location,
                 schema=self.schema,
-                verbosity=self.worker_verbosity 
+                verbosity=self.worker_verbosity,
+                max_opens=self.max_opens,
+                max_inflight_mb=self.max_inflight_mb,
+                join_on=self.join_on
             )
             
             # Import the data
@@ -406,18 +1763,30 @@ class Skeleton:
                 self.logger.log(f"Failed to import data from {file_name}", "error")
                 return None
                 
-            # Example processing - REPLACE WITH YOUR OWN LOGIC
-            # This is just a placeholder that returns the file name and a count
-            result = {
-                "file_name": file_name,
-                "event_count": len(data[self.branches[0]]) if self.branches else 0
-            }
-
-            return result
+            return self.process_array(data, file_name)
             
         except Exception as e:
             self.logger.log(f"Error processing {file_name}: {e}", "error")
             raise e # propagate exception
+
+    def process_array(self, data, file_name):
+        """Process the array imported from a single file
+
+        Args:
+            data: Awkward array of self.branches from the file
+            file_name: Name of the file it came from
+
+        Returns:
+            Any data structure representing the processed result
+        """
+        # Example processing - REPLACE WITH YOUR OWN LOGIC
+        # This is just a placeholder that returns the file name and a count
+        result = {
+            "file_name": file_name,
+            "event_count": len(data[self.branches[0]]) if self.branches else 0
+        }
+
+        return result
             
     def execute(self):
         """Run the processor on the configured files
@@ -440,19 +1809,53 @@ class Skeleton:
             use_remote=self.use_remote,
             location=self.location,
             schema=self.schema,
-            verbosity=self.verbosity
+            verbosity=self.verbosity,
+            max_opens=self.max_opens,
+            max_inflight_mb=self.max_inflight_mb,
+            join_on=self.join_on
         )
         
+        # Serve unchanged (file, analysis) pairs from the cache 
+        worker_func = self.process_file
+        if self.cache_results:
+            cache_dir = self._results_cache_dir()
+            self.logger.log(f"Caching results in {cache_dir}", "info")
+            worker_func = functools.partial(
+                _cached_worker_func, # Module-level function
+                worker_func=self.process_file,
+                cache_dir=cache_dir,
+                analysis_key=self._analysis_key()
+            )
+
+        process_kwargs = dict(
+            branches=self.branches,
+            max_workers=self.max_workers,
+            custom_worker_func=worker_func,
+            use_processes=self.use_processes,
+            task_timeout=self.task_timeout,
+            straggler_factor=self.straggler_factor,
+            speculative=self.speculative,
+            batch_size_mb=self.batch_size_mb,
+            batch_entries=self.batch_entries,
+            validate=self.validate,
+            telemetry=self.telemetry,
+            profile=self.profile,
+            aggregate_logs=self.aggregate_logs
+        )
+
+        if self.state_path is not None and self.file_name is None:
+            return self._execute_incremental(processor, process_kwargs)
+
         # Process the data
         results = processor.process_data(
             file_name=self.file_name, # If it's just one file it will skip the process function
             file_list_path=self.file_list_path,
             defname=self.defname,
-            branches=self.branches,
-            max_workers=self.max_workers,
-            custom_worker_func=self.process_file,
-            use_processes=self.use_processes 
+            sample=self.sample,
+            **process_kwargs
         )
+        if self.sample is not None and results is not None:
+            results, self.sample_estimate = results
 
         # Postprocess
         results = self.postprocess(results)
@@ -461,6 +1864,88 @@ class Skeleton:
             
         return results
 
+    def _incremental_key(self):
+        """Hash identifying the accumulated result: the analysis, plus the code which builds the accumulator"""
+        sources = [self._analysis_key()]
+        for name in ("postprocess", "merge"):
+            method = getattr(type(self), name)
+            try:
+                sources.append(inspect.getsource(method))
+            except (OSError, TypeError):
+                sources.append(method.__code__.co_code.hex())
+        return _cache.hash_key(*sources)
+
+    def _execute_incremental(self, processor, process_kwargs):
+        """Process only the files not already merged into the state at self.state_path
+
+        Returns:
+            The merged (postprocessed) result over all files
+        """
+        with _cache.file_lock(f"{self.state_path}.lock"): # One refresh at a time
+            # Always query SAM, since a cached file list would hide files added to the definition
+            file_list = processor.get_file_list(
+                defname=self.defname, 
+                file_list_path=self.file_list_path, 
+                fetch_metadata=self.defname is not None,
+                refresh=True
+            )
+            key = self._incremental_key()
+            state = _cache.read_pickle(self.state_path)
+            if state is not None and state["key"] != key:
+                self.logger.log("Analysis code or configuration changed since the last run, rebuilding", "warning")
+                state = None
+
+            done = set(state["files"]) if state is not None else set()
+            self.removed_files = sorted(done - set(file_list))
+            if self.removed_files:
+                removed = "\n".join(f"\t{file_name}" for file_name in self.removed_files)
+                if self.rebuild_on_removal:
+                    self.logger.log(f"{len(self.removed_files)} files left the dataset, rebuilding:\n{removed}", "warning")
+                    state, done = None, set()
+                else:
+                    self.logger.log(f"{len(self.removed_files)} files left the dataset but are still in the result "
+                        f"(set rebuild_on_removal to rebuild):\n{removed}", "warning")
+
+            new_files = [file_name for file_name in file_list if file_name not in done]
+            if not new_files:
+                self.logger.log(f"No new files, returning the result for {len(done)} files", "success")
+                return state["accumulator"] if state is not None else None
+            self.logger.log(f"Processing {len(new_files)} new files ({len(done)} already merged)", "info")
+
+            # Tag results with their file, so that failed files are retried next time
+            process_kwargs = dict(process_kwargs)
+            process_kwargs["custom_worker_func"] = functools.partial(
+                _tagged_worker_func, # Module-level function
+                worker_func=process_kwargs["custom_worker_func"]
+            )
+            tagged = processor.process_data(file_list=new_files, **process_kwargs) or []
+            succeeded = [file_name for file_name, result in tagged if result is not None]
+            results = [result for _, result in tagged if result is not None]
+            if len(succeeded) < len(new_files):
+                self.logger.log(f"{len(new_files) - len(succeeded)} files failed and will be retried on the next run", "warning")
+
+            accumulator = self.postprocess(results)
+            if state is not None:
+                accumulator = self.merge(state["accumulator"], accumulator)
+
+            _cache.write_pickle(self.state_path, {
+                "key": key,
+                "files": (state["files"] if state is not None else []) + succeeded,
+                "removed": self.removed_files,
+                "accumulator": accumulator,
+                "updated": time.time()
+            })
+
+        self.logger.log(f"Analysis complete, merged {len(succeeded)} new files", "success")
+        return accumulator
+
+    def merge(self, accumulated, new):
+        """Merge the postprocessed result of new files into the accumulated result (incremental mode)
+
+        Uses merge_results by default. Override it for accumulators which that cannot handle.
+        """
+        return merge_results(accumulated, new)
+
     def postprocess(self, results): 
         """Run post processing on the results list 
         Placeholder method! You can override it
@@ -468,4 +1953,124 @@ class Skeleton:
         return results
 
         # Such as combination 
-        
\ No newline at end of file
+        
+
+class Multiplexer(Skeleton):
+    """Run several Skeleton analyses in a single pass over the data
+
+    The union of the analyses' branches is imported once per file, and each analysis's 
+    process_array is handed its own view of the same in-memory array. The files, tree and 
+    processing configuration are taken from the first analysis.
+
+    Analyses which override process_file rather than process_array cannot share the array, 
+    so their process_file is called as usual (reading the file again).
+
+    Example:
+        multiplexer = Multiplexer({"signal": SignalAnalysis(), "background": BackgroundAnalysis()})
+        results = multiplexer.execute() # {"signal": ..., "background": ...}
+    """
+
+    def __init__(self, analyses, verbosity=1):
+        """Initialise the multiplexer
+
+        Args:
+            analyses: Dict of name -> Skeleton instance, or a list (named by class)
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info, 2: debug, 3: max)
+        """
+        super().__init__(verbosity=verbosity)
+        self.logger = Logger( 
+            print_prefix = "[Multiplexer]", 
+            verbosity = verbosity
+        )
+
+        if not isinstance(analyses, dict):
+            named = {}
+            for analysis in analyses:
+                name = type(analysis).__name__
+                named[name if name not in named else f"{name}_{len(named)}"] = analysis
+            analyses = named
+        if not analyses:
+            raise ValueError("Multiplexer needs at least one analysis")
+        self.analyses = analyses
+
+        # Files, tree and processing configuration come from the first analysis
+        first = next(iter(analyses.values()))
+        for key, value in vars(first).items():
+            if key not in ("logger", "verbosity", "branches", "state_path", "removed_files", "sample_estimate", "cache_results", "cache_dir"):
+                setattr(self, key, value)
+        for name, analysis in analyses.items():
+            for key in ("file_list_path", "defname", "file_name", "tree_path"):
+                if getattr(analysis, key) != getattr(first, key):
+                    self.logger.log(f"Analysis '{name}' has a different {key} ({getattr(analysis, key)!r}), using {getattr(first, key)!r}", "warning")
+
+        # Analyses which can share the imported array
+        self.shared = [
+            name for name, analysis in analyses.items() 
+            if type(analysis).process_file is Skeleton.process_file
+        ]
+        for name in analyses:
+            if name not in self.shared:
+                self.logger.log(f"Analysis '{name}' overrides process_file, so it reads its own data", "warning")
+        self.branches = self._union_branches([analyses[name].branches for name in self.shared])
+        self.logger.log(f"Multiplexing {len(analyses)} analyses ({len(self.shared)} sharing one import of {'all' if self.branches == '*' else len(self.branches)} branches)", "info")
+
+    # The analyses' keys stand in for their (unstable) repr
+    CACHE_IGNORE = Skeleton.CACHE_IGNORE | {"analyses", "shared"}
+
+    def _analysis_key(self):
+        """Hash of the multiplexer and every analysis"""
+        return _cache.hash_key(super()._analysis_key(), *(f"{name}:{analysis._analysis_key()}" for name, analysis in self.analyses.items()))
+
+    @staticmethod
+    def _leaf_branches(branches):
+        """Flat list of branch names from a list or grouped dict"""
+        if isinstance(branches, dict):
+            return [branch for sub_branches in branches.values() for branch in sub_branches]
+        return list(branches)
+
+    def _union_branches(self, branch_specs):
+        """Flat, ordered union of the branches the analyses need ("*" if any needs all)"""
+        if any(branches == "*" for branches in branch_specs):
+            return "*"
+        union = []
+        for branches in branch_specs:
+            for branch in self._leaf_branches(branches):
+                if branch not in union:
+                    union.append(branch)
+        return union
+
+    def _view(self, data, branches):
+        """The array an analysis would have imported itself, built from the shared one without copies"""
+        if branches == "*" or branches == self.branches:
+            return data
+        if isinstance(branches, dict):
+            return ak.zip({group: data[list(sub_branches)] for group, sub_branches in branches.items()})
+        return data[list(branches)]
+
+    def process_array(self, data, file_name):
+        """Hand each sharing analysis its view of the array
+
+        Returns:
+            Dict of analysis name -> result
+        """
+        results = {}
+        for name, analysis in self.analyses.items():
+            if name in self.shared:
+                results[name] = analysis.process_array(self._view(data, analysis.branches), file_name)
+            else:
+                results[name] = analysis.process_file(file_name)
+        return results
+
+    def postprocess(self, results):
+        """Split the per-file results by analysis and run each analysis's postprocess
+
+        Returns:
+            Dict of analysis name -> postprocessed result
+        """
+        if isinstance(results, dict): # Single file (file_name set), so one result per analysis
+            return {name: analysis.postprocess(results.get(name)) for name, analysis in self.analyses.items()}
+        results = [result for result in (results or []) if result is not None]
+        return {
+            name: analysis.postprocess([result[name] for result in results if result.get(name) is not None])
+            for name, analysis in self.analyses.items()
+        }
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+import io
+import os
+import pstats
+import cProfile
+import threading
+
+from .pylogger import Logger
+
+# Modules broken out in the per-module summary, matched against source file paths
+MODULES = {
+    "pyselect": f"pyutils{os.sep}pyselect",
+    "pyvector": f"pyutils{os.sep}pyvector",
+    "pycut": f"pyutils{os.sep}pycut",
+    "pyimport": f"pyutils{os.sep}pyimport",
+    "pyread": f"pyutils{os.sep}pyread",
+    "uproot": f"{os.sep}uproot{os.sep}",
+    "awkward": f"{os.sep}awkward{os.sep}",
+    "numpy": f"{os.sep}numpy{os.sep}"
+}
+
+# Only one profiler can be active at a time in a process (and cProfile on Python 3.12+
+# refuses a second), so concurrent thread workers take turns and skip when busy
+_PROFILE_LOCK = threading.Lock()
+
+class _StatsHolder:
+    """Wraps a raw stats dict so that pstats.Stats can load it"""
+    def __init__(self, stats):
+        self.stats = stats
+    def create_stats(self):
+        pass
+
+def profile_call(func, *args, **kwargs):
+    """Run func under cProfile
+
+    Returns:
+        Tuple of (result, raw stats dict), where the stats are None if another
+        thread in this process was already profiling
+    """
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        return func(*args, **kwargs), None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return result, profiler.stats # Plain dict of tuples, so it pickles back from processes
+    finally:
+        _PROFILE_LOCK.release()
+
+def classify(file_name):
+    """Map a source file path to one of MODULES, or "other" """
+    for module, pattern in MODULES.items():
+        if pattern in file_name:
+            return module
+    return "other"
+
+class ProfileReport:
+    """Merges cProfile stats from many worker tasks into one report"""
+
+    def __init__(self, verbosity=1):
+        """Initialise the report
+
+        Args:
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+        """
+        self.n_tasks = 0
+        self._stats = None
+
+        # Start logger
+        self.logger = Logger(
+            print_prefix = "[pyprofile]",
+            verbosity = verbosity
+        )
+
+    def add(self, raw_stats):
+        """Merge the raw stats dict from one task"""
+        if raw_stats is None:
+            return
+        if self._stats is None:
+            self._stats = pstats.Stats(_StatsHolder(raw_stats), stream=io.StringIO())
+        else:
+            self._stats.add(_StatsHolder(raw_stats))
+        self.n_tasks += 1
+
+    @property
+    def stats(self):
+        """Merged pstats.Stats (None until stats are added)"""
+        return self._stats
+
+    def module_breakdown(self):
+        """Total self time (seconds) spent in each module of interest
+
+        Self time is used, rather than cumulative time, so that the modules add up.
+
+        Returns:
+            dict: Module name -> seconds, in descending order
+        """
+        if self._stats is None:
+            return {}
+        breakdown = {}
+        for (file_name, _, _), (_, _, self_time, _, _) in self._stats.stats.items():
+            module = classify(file_name)
+            breakdown[module] = breakdown.get(module, 0.0) + self_time
+        return dict(sorted(breakdown.items(), key=lambda item: item[1], reverse=True))
+
+    def format_report(self, n_lines=30, sort="cumulative"):
+        """Format the merged report as text
+
+        Args:
+            n_lines (int, opt): Number of functions to show. Defaults to 30.
+            sort (str, opt): pstats sort key. Defaults to "cumulative".
+        """
+        if self._stats is None:
+            return "No profiles collected"
+        stream = io.StringIO()
+        self._stats.stream = stream
+        self._stats.sort_stats(sort).print_stats(n_lines)
+        breakdown = "\n".join(f"\t{module:<10} {seconds:10.3f}s" for module, seconds in self.module_breakdown().items())
+        return f"Merged profile of {self.n_tasks} tasks\n{stream.getvalue()}\nSelf time by module:\n{breakdown}"
+
+    def print_report(self, n_lines=30, sort="cumulative"):
+        """Log the merged report"""
+        self.logger.log(self.format_report(n_lines=n_lines, sort=sort), "info")
+
+    def dump(self, path):
+        """Write the merged stats to a file readable by pstats (or snakeviz)"""
+        if self._stats is not None:
+            self._stats.dump_stats(path)
+            self.logger.log(f"Wrote merged profile to {path}", "success")
@@ -2,13 +2,17 @@
 import uproot
 import os
 import subprocess
+from contextlib import nullcontext
 from . import _env_manager
+from . import pytelemetry
+from . import pytrace
+from ._limiter import EndpointLimiter
 from .pylogger import Logger
 
 class Reader:
     """Unified interface for reading files, either locally or remotely"""
     
-    def __init__(self, use_remote=False, location="tape", schema="root", verbosity=1):
+    def __init__(self, use_remote=False, location="tape", schema="root", verbosity=1, max_opens=None, max_inflight_mb=None):
         """Initialise the reader
         
         Args:
@@ -16,10 +20,18 @@ class Reader:
             location (str, opt): File location for remote files: 'tape' (default), 'disk', 'scratch', 'nersc' 
             schema (str, opt): Schema for remote file path: 'root' (default), 'http', 'path', 'dcap', 'sam'
             verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+            max_opens (int, opt): Cap on simultaneous file opens per storage endpoint, shared across threads and processes. None for no limit.
+            max_inflight_mb (float, opt): Cap on MB being read at once per storage endpoint, shared across threads and processes. None for no limit.
         """
         self.use_remote = use_remote # access files on /pnfs from EAF
         self.location = location
         self.schema = schema
+        self.endpoint = None # storage endpoint of the last opened file
+
+        # Only build a limiter if asked, so unthrottled reads take no locks
+        self.limiter = None
+        if max_opens is not None or max_inflight_mb is not None:
+            self.limiter = EndpointLimiter(max_opens=max_opens, max_inflight_mb=max_inflight_mb)
 
         # Start logger 
         self.logger = Logger( 
@@ -39,6 +51,7 @@ class Reader:
             if self.schema not in self.valid_schemas:
                 self.logger.log(f"Schema '{schema}' may not be valid. Expected one of {self.valid_schemas}", "warning")
 
+    @pytrace.traced()
     def read_file(self, file_path):
         """Read a file using the appropriate method
         
@@ -53,10 +66,29 @@ class Reader:
         else:
             return self._read_file(file_path)
     
+    def reserve_bytes(self, nbytes):
+        """Reserve part of the in-flight byte budget for the endpoint of the last opened file
+
+        Args:
+            nbytes (int): Number of (compressed) bytes about to be read
+
+        Returns:
+            Context manager to hold for the duration of the read
+        """
+        if self.limiter is None or self.endpoint is None:
+            return nullcontext()
+        return self.limiter.reserve_bytes(self.endpoint, nbytes)
+
     def _read_file(self, file_path):
         """Open file with uproot"""
         try: 
-            file = uproot.open(file_path)
+            self.endpoint = EndpointLimiter.endpoint_key(file_path, self.location if self.use_remote else None)
+            with pytelemetry.timed("open_time"):
+                if self.limiter is None:
+                    file = uproot.open(file_path)
+                else:
+                    with self.limiter.open_slot(self.endpoint):
+                        file = uproot.open(file_path)
             self.logger.log(f"Opened {file_path}", "success")
             return file
         except Exception as e:
@@ -73,13 +105,14 @@ class Reader:
         """Attempt to read remote file with specific location"""
         commands = f"mdh print-url {file_path} -l {location} -s {self.schema}"
         
-        this_file_path = subprocess.check_output(
-            commands,
-            shell=True,
-            universal_newlines=True, 
-            stderr=subprocess.DEVNULL,
-            timeout=30
-        ).strip()
+        with pytelemetry.timed("resolve_time"):
+            this_file_path = subprocess.check_output(
+                commands,
+                shell=True,
+                universal_newlines=True, 
+                stderr=subprocess.DEVNULL,
+                timeout=30
+            ).strip()
         
         self.logger.log(f"Created file path: {this_file_path}", "info")
         
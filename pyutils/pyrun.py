@@ -0,0 +1,236 @@
+#! /usr/bin/env python
+"""Run a Skeleton analysis from the command line
+
+Usage:
+    pyutils-run mypackage.analysis:MyAnalysis --config job.toml --output results/
+    pyutils-run path/to/analysis.py:MyAnalysis --set defname=nts.mu2e... --set max_workers=8
+
+The config (TOML, or YAML if PyYAML is installed) sets attributes of the analysis, e.g.
+
+    analysis = "mypackage.analysis:MyAnalysis"
+    defname = "nts.mu2e.ensembleMDS3aOnSpillTriggered.MDC2025-001.root"
+    branches = ["event", "trk.pdg"]
+    max_workers = 8
+    use_processes = "auto"
+    cache_results = true             # Serve unchanged files from the result cache
+    state_path = "state.pkl"         # Incremental checkpoint of the merged result
+    telemetry = true                 # Written to the output directory
+
+    [analysis_args]                  # Keyword arguments for the analysis constructor
+    verbosity = 1
+
+Results are written to the output directory in columnar form where possible (see write_results),
+together with run metadata.
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import importlib
+
+from .pylogger import Logger
+
+# Config keys which are not analysis attributes
+RESERVED_KEYS = {"analysis", "analysis_args", "output"}
+
+def load_config(path):
+    """Read a TOML or YAML config file into a dict
+
+    Args:
+        path (str): Config file (.toml, .yaml or .yml)
+    """
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML configs needs PyYAML (pip install pyyaml), or use TOML")
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    try:
+        import tomllib # Python 3.11+
+    except ImportError:
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def load_analysis(spec):
+    """Import an analysis class from "package.module:Class" or "path/to/file.py:Class"
+
+    Args:
+        spec (str): Import path of the class
+    """
+    module_name, _, class_name = spec.rpartition(":")
+    if not module_name:
+        module_name, _, class_name = spec.rpartition(".")
+    if module_name.endswith(".py"):
+        # Register the module so that worker processes can unpickle its classes
+        name = os.path.splitext(os.path.basename(module_name))[0]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(module_name)))
+        module = importlib.import_module(name)
+    else:
+        sys.path.insert(0, os.getcwd())
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+def _accepts_keyword(func, name):
+    """Whether func can be called with the keyword argument name"""
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters or any(parameter.kind is parameter.VAR_KEYWORD for parameter in parameters.values())
+
+def _parse_value(value):
+    """Interpret a --set value as JSON where possible, else as a string"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def write_results(results, output_dir, name="results"):
+    """Write results to output_dir, in columnar form where possible
+
+    - Awkward arrays, and lists of arrays or records, are written to Parquet
+    - numpy arrays to .npy, and np.histogram (counts, edges) tuples to .npz
+    - pandas DataFrames (e.g. cut flows) to CSV
+    - dicts are written entry by entry
+    - anything else to JSON if it can be, or else to a pickle
+
+    Args:
+        results: Output of the analysis
+        output_dir (str): Output directory
+        name (str, opt): Base file name. Defaults to "results".
+
+    Returns:
+        list: Paths written
+    """
+    import numpy as np
+    import awkward as ak
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, name)
+
+    if isinstance(results, dict) and results and all(isinstance(key, str) for key in results):
+        written = []
+        for key, value in results.items():
+            written.extend(write_results(value, output_dir, name=f"{name}.{key}" if name != "results" else key))
+        return written
+    if isinstance(results, ak.Array):
+        ak.to_parquet(results, f"{path}.parquet")
+        return [f"{path}.parquet"]
+    if isinstance(results, list) and results and all(isinstance(item, ak.Array) for item in results):
+        ak.to_parquet(ak.concatenate(results), f"{path}.parquet")
+        return [f"{path}.parquet"]
+    if isinstance(results, list) and results and all(isinstance(item, dict) for item in results):
+        try: # Records with consistent fields make columns
+            ak.to_parquet(ak.Array(results), f"{path}.parquet")
+            return [f"{path}.parquet"]
+        except Exception:
+            pass
+    if isinstance(results, np.ndarray):
+        np.save(f"{path}.npy", results)
+        return [f"{path}.npy"]
+    if isinstance(results, tuple) and len(results) == 2 and all(isinstance(item, np.ndarray) for item in results):
+        np.savez(f"{path}.npz", counts=results[0], edges=results[1])
+        return [f"{path}.npz"]
+    if type(results).__name__ == "DataFrame":
+        results.to_csv(f"{path}.csv", index=False)
+        return [f"{path}.csv"]
+    try:
+        with open(f"{path}.json", "w") as f:
+            json.dump(results, f, indent=2)
+        return [f"{path}.json"]
+    except TypeError:
+        os.remove(f"{path}.json")
+    import pickle
+    with open(f"{path}.pkl", "wb") as f:
+        pickle.dump(results, f)
+    return [f"{path}.pkl"]
+
+def main(argv=None):
+    """Entry point for pyutils-run
+
+    Returns:
+        int: Exit code (0 on success, 1 if the analysis failed, 2 for a bad configuration)
+    """
+    parser = argparse.ArgumentParser(prog="pyutils-run", description="Run a pyutils Skeleton analysis")
+    parser.add_argument("analysis", nargs="?", help="Analysis class, as package.module:Class or path/to/file.py:Class")
+    parser.add_argument("-c", "--config", help="TOML or YAML config setting analysis attributes")
+    parser.add_argument("-o", "--output", help="Output directory (default: the config's output, or ./pyutils_output)")
+    parser.add_argument("-s", "--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="Set an analysis attribute, overriding the config (VALUE is parsed as JSON where possible)")
+    parser.add_argument("-v", "--verbosity", type=int, default=1, help="Level of output detail (0: errors only, 1: info, 2: max)")
+    args = parser.parse_args(argv)
+
+    logger = Logger(print_prefix="[pyrun]", verbosity=args.verbosity)
+
+    # Configuration
+    try:
+        config = load_config(args.config) if args.config else {}
+        for override in args.overrides:
+            key, sep, value = override.partition("=")
+            if not sep:
+                raise ValueError(f"Expected KEY=VALUE, got '{override}'")
+            config[key.strip()] = _parse_value(value)
+        spec = args.analysis or config.get("analysis")
+        if not spec:
+            raise ValueError("No analysis given, on the command line or as 'analysis' in the config")
+        analysis_class = load_analysis(spec)
+        analysis_args = dict(config.get("analysis_args", {}))
+        # Subclasses often define __init__(self) without a verbosity argument
+        pass_verbosity = _accepts_keyword(analysis_class, "verbosity")
+        if pass_verbosity:
+            analysis_args.setdefault("verbosity", args.verbosity)
+        analysis = analysis_class(**analysis_args)
+        if not pass_verbosity:
+            analysis.verbosity = args.verbosity
+            if hasattr(analysis, "logger"):
+                analysis.logger.verbosity = args.verbosity
+    except Exception as e:
+        logger.log(f"Bad configuration: {e}", "error")
+        return 2
+
+    output_dir = args.output or config.get("output") or "pyutils_output"
+    os.makedirs(output_dir, exist_ok=True)
+    for key, value in config.items():
+        if key in RESERVED_KEYS:
+            continue
+        if not hasattr(analysis, key):
+            logger.log(f"Bad configuration: {analysis_class.__name__} has no attribute '{key}'", "error")
+            return 2
+        if key == "telemetry" and value is True:
+            value = os.path.join(output_dir, "telemetry") # Export next to the results
+        setattr(analysis, key, value)
+
+    # Run
+    logger.log(f"Running {analysis_class.__name__}, writing to {output_dir}", "info")
+    start = time.time()
+    results = analysis.execute()
+    wall_time = time.time() - start
+    if results is None:
+        logger.log("Analysis returned no results", "error")
+        return 1
+
+    written = write_results(results, output_dir)
+
+    from ._cache import package_version
+    metadata = {
+        "analysis": f"{analysis_class.__module__}:{analysis_class.__qualname__}",
+        "config": {key: value for key, value in config.items() if key != "analysis"},
+        "pyutils_version": package_version(),
+        "wall_time": wall_time,
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "outputs": [os.path.basename(path) for path in written]
+    }
+    if getattr(analysis, "sample_estimate", None) is not None:
+        metadata["sample_estimate"] = analysis.sample_estimate
+    with open(os.path.join(output_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    logger.log(f"Wrote {len(written)} outputs to {output_dir} in {wall_time:.1f}s", "success")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import uproot
 import awkward as ak
 import numpy as np
 from .pylogger import Logger
+from . import pytrace
 
 class Select:
     """
@@ -56,6 +57,7 @@ class Select:
         """       
         return self.surface_id_map.get(sid)
         
+    @pytrace.traced()
     def is_electron(self, data):
         """ Return boolean array for electron tracks which can be used as a mask 
 
@@ -65,12 +67,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.pdg"] == self.particles["e-"])
-            self.logger.log(f"Returning mask for e- tracks", "success")
+            self.logger.log("Returning mask for e- tracks", "success")
             return mask
         except Exception as e:
             self.logger.log(f"Exception in is_electron(): {e}", "error")
             return None
             
+    @pytrace.traced()
     def is_positron(self, data):
         """ Return boolean array for positron tracks which can be used as a mask 
 
@@ -80,12 +83,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.pdg"] == self.particles["e+"])
-            self.logger.log(f"Returning mask for e+ tracks", "success")
+            self.logger.log("Returning mask for e+ tracks", "success")
             return mask
         except Exception as e:
             self.logger.log(f"Exception in is_positron(): {e}", "error")
             return None
             
+    @pytrace.traced()
     def is_mu_minus(self, data):
         """ Return boolean array for negative muon tracks which can be used as a mask 
 
@@ -95,12 +99,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.pdg"] == self.particles["mu-"]) 
-            self.logger.log(f"Returning mask for mu- tracks", "success")
+            self.logger.log("Returning mask for mu- tracks", "success")
             return mask
         except Exception as e:
             self.logger.log(f"Exception in is_mu_minus(): {e}", "error")
             return None
 
+    @pytrace.traced()
     def is_mu_plus(self, data):
         """ Return boolean array for positive muon tracks which can be used as a mask 
 
@@ -110,13 +115,14 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.pdg"] == self.particles["mu+"])
-            self.logger.log(f"Returning mask for mu+ tracks", "success")
+            self.logger.log("Returning mask for mu+ tracks", "success")
             return mask 
         except Exception as e:
             self.logger.log(f"Exception in is_mu_plus(): {e}", "error")
             return None
 
     # More general function for particle selection
+    @pytrace.traced()
     def is_particle(self, data, particle):
         """ Return boolean array for tracks of a specific particle type which can be used as a mask 
 
@@ -128,12 +134,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.pdg"] == self.particles[particle])
-            self.logger.log(f"Returning mask for {particle} tracks", "success")
+            self.logger.log("Returning mask for %s tracks", "success", particle)
             return mask
         except Exception as e:
             self.logger.log(f"Exception in is_particle(): {e}", "error")
             return None
             
+    @pytrace.traced()
     def is_downstream(self, data, branch_name="trksegs"):
         """ Return boolean array for upstream track segments
 
@@ -144,12 +151,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data[branch_name]["mom"]["fCoordinates"]["fZ"] > 0)
-            self.logger.log(f"Returning mask for downstream track segments (p_z > 0)", "success")
+            self.logger.log("Returning mask for downstream track segments (p_z > 0)", "success")
             return mask
         except Exception as e:
             self.logger.log(f"Exception in is_downstream(): {e}", "error")
             return None
 
+    @pytrace.traced()
     def is_upstream(self, data, branch_name="trksegs"):
         """ Return boolean array for downstream track segments 
 
@@ -160,12 +168,13 @@ class Select:
         try:
             # Construct & return mask
              mask = (data["trksegs"]["mom"]["fCoordinates"]["fZ"] < 0)
-             self.logger.log(f"Returning mask for upstream track segments (p_z < 0)", "success")
+             self.logger.log("Returning mask for upstream track segments (p_z < 0)", "success")
              return mask
         except Exception as e:
             self.logger.log(f"Exception in is_upstream(): {e}", "error")
             return None
 
+    @pytrace.traced()
     def select_surface(self, data, surface_name="TT_Front", sindex=0, branch_name="trksegs"):
         """ Return boolean array for track segments intersecting a specific surface 
         
@@ -184,12 +193,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data[branch_name]['sid']==sid)# & (data[branch_name]['sindex']==sindex)
-            self.logger.log(f"Returning mask for {branch_name} with sid = {sid}", "success") #and sindex = {sindex}"
+            self.logger.log("Returning mask for %s with sid = %s", "success", branch_name, sid) #and sindex = {sindex}"
             return mask
         except Exception as e:
             self.logger.log(f"Exception in select_surface(): {e}", "error")
             return None
 
+    @pytrace.traced()
     def has_ST(self, data):
       """returns mask True if the event has at least 1 ST viable extrapolation
       """
@@ -202,6 +212,7 @@ class Select:
         self.logger.log(f"Exception in has_ST(): {e}", "error")
         return None
             
+    @pytrace.traced()
     def has_OPA(self, data):
       """returns mask True if the event has at no OPA viable extrapolation
       """
@@ -214,6 +225,7 @@ class Select:
         self.logger.log(f"Exception in has_OPA(): {e}", "error")
         return None
   
+    @pytrace.traced()
     def is_reflected(self, data, branch_name="trksegs"):
         """ Return boolean array for reflected tracks  
         
@@ -232,12 +244,13 @@ class Select:
             # Does the track have any segments with p_z > 0 at the tracker entrance 
             # AND at any segments with p_z < 0 at the tracker entrance?
             reflected = (ak.any((upstream & trkent), axis=-1) & ak.any((downstream & trkent), axis=-1))
-            self.logger.log(f"Returning mask for reflected tracks", "success")
+            self.logger.log("Returning mask for reflected tracks", "success")
             return reflected
         except Exception as e:
             self.logger.log(f"Exception in is_reflected(): {e}", "error")
             return None
             
+    @pytrace.traced()
     def select_trkqual(self, data, quality):
         """ Return boolean array for tracks above a specified quality   
 
@@ -249,12 +262,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trkqual.result"] > quality)
-            self.logger.log(f"Returning mask for trkqual > {quality}", "success")
+            self.logger.log("Returning mask for trkqual > %s", "success", quality)
             return mask
         except Exception as e:
             self.logger.log(f"Exception in select_trkqual(): {e}", "error")
             return None
      
+    @pytrace.traced()
     def select_trkpid(self, data, value):
         """ Return boolean array for tracks above a specified PID score (range 0 - 1, -1=No score)   
 
@@ -266,12 +280,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trkpid.result"] > value)
-            self.logger.log(f"Returning mask for trkqual > {value}", "success")
+            self.logger.log("Returning mask for trkqual > %s", "success", value)
             return mask
         except Exception as e:
             self.logger.log(f"Exception in select_trkpid(): {e}", "error")
             return None
      
+    @pytrace.traced()
     def get_trigger(self, data, name):
         """ Return boolean array for the chosen trigger name 
         Args: 
@@ -282,12 +297,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data[str(name)] == 1)
-            self.logger.log(f"Returning mask for trigger == {name}", "success")
+            self.logger.log("Returning mask for trigger == %s", "success", name)
             return mask
         except Exception as e:
             self.logger.log(f"Exception in select_trigger(): {e}", "error")
             return None
             
+    @pytrace.traced()
     def get_triggers(self, data, names):
         """ 
         Return a single boolean array (mask) for events where ALL specified triggers are true (== 1).
@@ -316,11 +332,12 @@ class Select:
         for name in names:
             current_trigger_mask = (data[str(name)] == 1)
             combined_mask = combined_mask & current_trigger_mask
-            self.logger.log(f"Applied mask for trigger: {name}", "success")
+            self.logger.log("Applied mask for trigger: %s", "success", name)
 
         self.logger.log(f"Returning final combined mask for all {len(names)} triggers.", "success")
         return combined_mask
     
+    @pytrace.traced()
     def has_n_hits(self, data, n_hits):
         """ Return boolean array for tracks with hits above a specified value 
 
@@ -334,12 +351,13 @@ class Select:
         try:
             # Construct & return mask
             mask = (data["trk.nactive"] >= n_hits)
-            self.logger.log(f"Returning mask for nactive > {n_hits}", "success")
+            self.logger.log("Returning mask for nactive > %s", "success", n_hits)
             return mask
         except Exception as e:
             self.logger.log(f"Exception in has_n_hits(): {e}", "error")
             return None
     
+    @pytrace.traced()
     def hasTrkCrvCoincs(self, data, dt_threshold=150):
         """ simple version of the crv coincidence checker """
 
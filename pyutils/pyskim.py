@@ -0,0 +1,273 @@
+#! /usr/bin/env python
+import os
+import json
+import time
+import socket
+import threading
+
+import awkward as ak
+
+from . import _cache
+from .pylogger import Logger
+from .pyimport import Importer, current_entry_range
+
+# Key of the provenance record in Parquet schema metadata, and object name in ROOT files
+PROVENANCE_KEY = "pyutils_provenance"
+
+# Default compression levels for ROOT output, as ROOT itself uses
+ROOT_LEVELS = {"ZLIB": 1, "LZ4": 4, "ZSTD": 5, "LZMA": 8}
+
+def _output_name(file_name):
+    """Base name of the skim for an input file (or local path)"""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+def read_provenance(path):
+    """Read the provenance record written with a skim file
+
+    Args:
+        path (str): Skim file (.parquet or .root)
+
+    Returns:
+        dict: Provenance record, or None if the file has none
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path).metadata or {}
+        value = metadata.get(PROVENANCE_KEY.encode())
+        return json.loads(value) if value is not None else None
+    import uproot
+    with uproot.open(path) as file:
+        if PROVENANCE_KEY not in file:
+            return None
+        return json.loads(str(file[PROVENANCE_KEY]))
+
+class Skimmer:
+    """Writes the events passing a selection, with a subset of branches, to one compressed file per input file
+
+    Each output carries a provenance record (input file, entry range, cuts, event counts, branches,
+    pyutils version), in the Parquet schema metadata or as a string object in the ROOT file. Outputs are
+    written atomically, so existing skims are complete and are skipped on a rerun unless overwrite=True.
+    Outputs are named by the input's base name, and writing over the skim of a different input raises ValueError.
+
+    Use it in a Skeleton's process_array, with the mask from a CutManager:
+
+        self.skimmer.write(data, file_name, cut_manager=cut_manager)
+
+    or as the worker function of a Processor, importing and selecting each file itself:
+
+        skimmer = Skimmer("skims/", branches=["evt", "trk"], read_branches=[...], selection=my_selection)
+        processor.process_data(file_list_path=..., custom_worker_func=skimmer)
+
+    where my_selection(data) returns a boolean mask or a CutManager (a module-level function, if using processes).
+    """
+
+    def __init__(self, output_dir, branches=None, output_format="parquet", compression="zstd", compression_level=None,
+                 selection=None, read_branches=None, tree_path="EventNtuple/ntuple", use_remote=False, location="disk",
+                 schema="root", overwrite=False, verbosity=1):
+        """Initialise the skimmer
+
+        Args:
+            output_dir (str): Directory for the skim files
+            branches (list, opt): Top-level fields to keep. None to keep all.
+            output_format (str, opt): "parquet" (ak.to_parquet via pyarrow) or "root" (uproot). Defaults to "parquet".
+            compression (str, opt): Codec: "zstd", "lz4", "zlib"/"gzip", "lzma" or None. Defaults to "zstd".
+            compression_level (int, opt): Codec level. None for the codec default.
+            selection (callable, opt): Worker use only. Function of the imported data returning a mask or CutManager.
+            read_branches (list or dict, opt): Worker use only. Branches to import. Defaults to branches.
+            tree_path (str, opt): Worker use only. Path of the tree to import, and of the tree written to ROOT skims.
+            use_remote (bool, opt): Worker use only. Read remote files.
+            location (str, opt): Worker use only. Remote file location.
+            schema (str, opt): Worker use only. Remote file URL schema.
+            overwrite (bool, opt): Rewrite skims which already exist. Defaults to False.
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+        """
+        if output_format not in ("parquet", "root"):
+            raise ValueError(f"output_format must be 'parquet' or 'root', got '{output_format}'")
+        self.output_dir = output_dir
+        self.branches = branches
+        self.output_format = output_format
+        self.compression = compression
+        self.compression_level = compression_level
+        self.selection = selection
+        self.read_branches = read_branches if read_branches is not None else branches
+        self.tree_path = tree_path
+        self.use_remote = use_remote
+        self.location = location
+        self.schema = schema
+        self.overwrite = overwrite
+        self.verbosity = verbosity
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Start logger
+        self.logger = Logger(
+            print_prefix = "[pyskim]",
+            verbosity = verbosity
+        )
+
+    def output_path(self, file_name):
+        """Path of the skim for an input file"""
+        suffix = "parquet" if self.output_format == "parquet" else "root"
+        start, stop = current_entry_range()
+        part = f".{start}-{stop}" if start is not None or stop is not None else "" # Chunks of one file
+        return os.path.join(self.output_dir, f"{_output_name(file_name)}{part}.skim.{suffix}")
+
+    def _check_collision(self, path, file_name):
+        """Raise if path holds the skim of another input file with the same base name"""
+        if not os.path.exists(path):
+            return
+        try:
+            existing = read_provenance(path)
+        except Exception:
+            return # Unreadable, so there is nothing to protect
+        if existing is not None and existing.get("input_file") != file_name:
+            raise ValueError(
+                f"Skim {path} is of {existing.get('input_file')}, which has the same base name as {file_name}: "
+                f"skim inputs with the same names to separate output directories"
+            )
+
+    def _provenance(self, file_name, n_in, n_out, cut_manager, extra):
+        """Provenance record for one skim"""
+        start, stop = current_entry_range()
+        record = {
+            "input_file": file_name,
+            "entry_start": start,
+            "entry_stop": stop,
+            "events_in": int(n_in),
+            "events_out": int(n_out),
+            "branches": list(self.branches) if self.branches is not None else None,
+            "pyutils_version": _cache.package_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": socket.gethostname()
+        }
+        if cut_manager is not None:
+            record["cuts"] = [
+                {"name": name, "description": cut["description"], "group": cut["group"]}
+                for name, cut in cut_manager.get_active_cuts().items()
+            ]
+        if extra:
+            record.update(extra)
+        return record
+
+    def _write_parquet(self, data, path, provenance):
+        """Write data to Parquet, with the provenance in the schema metadata"""
+        import pyarrow.parquet as pq
+        table = ak.to_arrow_table(data, extensionarray=True)
+        metadata = dict(table.schema.metadata or {}) # Keeps awkward's own metadata
+        metadata[PROVENANCE_KEY.encode()] = json.dumps(provenance).encode()
+        table = table.replace_schema_metadata(metadata)
+        pq.write_table(table, path, compression=self.compression or "none", compression_level=self.compression_level)
+
+    def _write_root(self, data, path, provenance):
+        """Write data to a ROOT TTree, with the provenance as a string object"""
+        import uproot
+        compression = None
+        if self.compression is not None:
+            codec = {"gzip": "ZLIB"}.get(self.compression.lower(), self.compression.upper())
+            level = self.compression_level if self.compression_level is not None else ROOT_LEVELS[codec]
+            compression = getattr(uproot, codec)(level)
+        branches = {field: data[field] for field in data.fields}
+        with uproot.recreate(path, compression=compression) as file:
+            # mktree rather than assignment, which newer uproot writes as an RNTuple
+            tree = file.mktree(self.tree_path, {name: str(array.type.content) for name, array in branches.items()})
+            tree.extend(branches)
+            file[PROVENANCE_KEY] = json.dumps(provenance)
+
+    def write(self, data, file_name, mask=None, cut_manager=None, provenance=None):
+        """Write the selected events of one input file
+
+        Args:
+            data (awkward.Array): Events imported from file_name
+            file_name (str): Input file, used to name the output and in the provenance
+            mask (awkward.Array, opt): Boolean mask. Defaults to the active cuts of cut_manager, or all events. A jagged
+                (e.g. per-track) mask keeps the whole of each event with any passing element, as CutManager.create_cut_flow counts them.
+            cut_manager (CutManager, opt): Cuts applied, recorded in the provenance
+            provenance (dict, opt): Extra provenance entries
+
+        Returns:
+            dict: Summary with the output path and event counts
+        """
+        path = self.output_path(file_name)
+        if mask is None and cut_manager is not None:
+            mask = cut_manager.combine_cuts()
+        n_in = len(data)
+        if mask is not None:
+            # Skims select whole events (as in CutManager.create_cut_flow)
+            while mask.ndim > 1:
+                mask = ak.any(mask, axis=-1)
+            data = data[mask]
+        if self.branches is not None:
+            data = data[list(self.branches)]
+        n_out = len(data)
+
+        record = self._provenance(file_name, n_in, n_out, cut_manager, provenance)
+        # Write then rename, so an existing skim is always complete
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if self.output_format == "parquet":
+                self._write_parquet(data, tmp_path, record)
+            else:
+                self._write_root(data, tmp_path, record)
+            # Outputs are named by base name, so refuse to replace the skim of a different input
+            lock_path = os.path.join(_cache.get_cache_dir("locks"), f"skim_{_cache.hash_key(os.path.abspath(path))}.lock")
+            with _cache.file_lock(lock_path):
+                self._check_collision(path, file_name)
+                os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.logger.log("Skimmed %d/%d events from %s to %s", "info", n_out, n_in, file_name, path)
+        return {"file": file_name, "output": path, "events_in": n_in, "events_out": n_out}
+
+    def __call__(self, file_name):
+        """Import, select and skim one file, for use as a Processor worker function
+
+        Returns:
+            dict: Summary with the output path and event counts (None if the import failed)
+        """
+        path = self.output_path(file_name)
+        if not self.overwrite and os.path.exists(path):
+            self._check_collision(path, file_name) # Not a skim of this file, despite the name
+            self.logger.log(f"Skim exists for {file_name}, skipping", "max")
+            return {"file": file_name, "output": path, "events_in": None, "events_out": None}
+
+        importer = Importer(
+            file_name=file_name,
+            branches=self.read_branches,
+            tree_path=self.tree_path,
+            use_remote=self.use_remote,
+            location=self.location,
+            schema=self.schema,
+            verbosity=self.verbosity
+        )
+        data = importer.import_branches()
+        if data is None:
+            return None
+
+        mask, cut_manager = None, None
+        if self.selection is not None:
+            selected = self.selection(data)
+            if hasattr(selected, "combine_cuts"):
+                cut_manager = selected
+            else:
+                mask = selected
+        return self.write(data, file_name, mask=mask, cut_manager=cut_manager)
+
+    def write_manifest(self, summaries, path=None):
+        """Write a JSON manifest of a skim run, from the summaries returned by write or the worker
+
+        Args:
+            summaries (list): Summaries (None entries, from failed files, are skipped)
+            path (str, opt): Output path. Defaults to "manifest.json" in the output directory.
+        """
+        path = path or os.path.join(self.output_dir, "manifest.json")
+        summaries = [summary for summary in summaries if summary is not None]
+        _cache.write_json(path, {
+            "format": self.output_format,
+            "branches": list(self.branches) if self.branches is not None else None,
+            "events_in": sum(s["events_in"] or 0 for s in summaries),
+            "events_out": sum(s["events_out"] or 0 for s in summaries),
+            "files": summaries
+        })
+        self.logger.log(f"Wrote manifest of {len(summaries)} skims to {path}", "success")
+        return path
@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+import os
+import shutil
+
+import numpy as np
+import awkward as ak
+
+from . import _cache
+from .pylogger import Logger
+
+# Store layout version, bumped if the on-disk format changes
+STORE_VERSION = 1
+METADATA_FILE = "metadata.json"
+
+def _buffer_path(path, key):
+    """Raw file holding one buffer"""
+    return os.path.join(path, f"{key}.bin")
+
+def save(array, path, overwrite=True, verbosity=1):
+    """Save an awkward array as its form plus one raw file per buffer, for memory-mapped loading
+
+    Args:
+        array (awkward.Array or list): Array to save. A list of arrays (e.g. per-file results) is concatenated.
+        path (str): Store directory
+        overwrite (bool, opt): Replace an existing store. Defaults to True.
+        verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+
+    Returns:
+        str: The store directory
+    """
+    logger = Logger(print_prefix="[pystore]", verbosity=verbosity)
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError(f"Store {path} already exists")
+    if isinstance(array, list):
+        array = ak.concatenate(array)
+
+    # Packing drops unreachable data left by slicing, so only live buffers are written
+    form, length, container = ak.to_buffers(ak.to_packed(array), byteorder="<")
+
+    # Write into a temporary directory then swap it in, so a store is always complete
+    tmp_path = f"{path.rstrip(os.sep)}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path)
+    try:
+        buffers = {}
+        for key, buffer in container.items():
+            buffer = np.ascontiguousarray(buffer)
+            buffer.tofile(_buffer_path(tmp_path, key))
+            buffers[key] = {"dtype": buffer.dtype.str, "size": int(buffer.size)}
+        _cache.write_json(os.path.join(tmp_path, METADATA_FILE), {
+            "version": STORE_VERSION,
+            "form": form.to_dict(),
+            "length": int(length),
+            "buffers": buffers,
+            "pyutils_version": _cache.package_version()
+        })
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+
+    nbytes = sum(os.path.getsize(_buffer_path(path, key)) for key in buffers)
+    logger.log(f"Saved {length} entries ({nbytes / 1024**2:.1f} MB in {len(buffers)} buffers) to {path}", "success")
+    return path
+
+def load(path, verbosity=1):
+    """Load an array saved with save, memory-mapping its buffers
+
+    Nothing is read up front: pages of a buffer are read from disk when the fields
+    using it are first touched, and stay shared with the page cache.
+
+    Args:
+        path (str): Store directory
+        verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+
+    Returns:
+        awkward.Array: Read-only array backed by the store files
+    """
+    logger = Logger(print_prefix="[pystore]", verbosity=verbosity)
+    metadata = _cache.read_json(os.path.join(path, METADATA_FILE))
+    if metadata is None:
+        raise FileNotFoundError(f"No store found at {path}")
+    if metadata["version"] != STORE_VERSION:
+        raise ValueError(f"Store {path} has version {metadata['version']}, expected {STORE_VERSION}")
+
+    container = {}
+    for key, info in metadata["buffers"].items():
+        dtype = np.dtype(info["dtype"])
+        if info["size"] == 0: # Empty files cannot be mapped
+            container[key] = np.empty(0, dtype=dtype)
+        else:
+            container[key] = np.memmap(_buffer_path(path, key), dtype=dtype, mode="r", shape=(info["size"],))
+
+    form = ak.forms.from_dict(metadata["form"])
+    array = ak.from_buffers(form, metadata["length"], container, byteorder="<")
+    logger.log(f"Mapped {metadata['length']} entries from {path}", "info")
+    return array
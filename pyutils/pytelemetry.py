@@ -0,0 +1,180 @@
+#! /usr/bin/env python
+import os
+import json
+import time
+import socket
+import threading
+import statistics
+from contextlib import contextmanager
+
+from .pylogger import Logger
+
+# Record for the task running in this thread (None outside of a telemetry task)
+_local = threading.local()
+
+def active():
+    """Whether the current thread is running a task with telemetry enabled"""
+    return getattr(_local, "record", None) is not None
+
+def add(key, value):
+    """Add value to a numeric field of the current task record (no-op without telemetry)"""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record[key] = record.get(key, 0) + value
+
+@contextmanager
+def timed(key):
+    """Add the time spent in the block to a field of the current task record"""
+    if getattr(_local, "record", None) is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(key, time.perf_counter() - start)
+
+def get_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource # Peak rather than current RSS, but better than nothing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+@contextmanager
+def task(file_name, rss=True):
+    """Collect a record for one task, running in this thread
+
+    Args:
+        file_name: File name (or batch of file names)
+        rss (bool, opt): Record the change in resident memory. RSS is process-wide, so this is
+            only meaningful where the process runs one task at a time (i.e. process workers).
+
+    Yields:
+        dict: The record, completed when the block exits
+    """
+    record = {
+        "file": file_name if isinstance(file_name, str) else ",".join(file_name),
+        "worker": f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}",
+        "start": time.time(),
+        "resolve_time": 0.0,
+        "open_time": 0.0,
+        "read_time": 0.0,
+        "read_bytes": 0,
+        "events": 0
+    }
+    rss_start = get_rss() if rss else None
+    cpu_start = time.thread_time()
+    _local.record = record
+    try:
+        yield record
+    finally:
+        _local.record = None
+        record["end"] = time.time()
+        record["wall_time"] = record["end"] - record["start"]
+        record["cpu_time"] = time.thread_time() - cpu_start
+        record["rss_delta"] = get_rss() - rss_start if rss else None
+
+class Telemetry:
+    """Collects per-task records from a Processor run, with aggregate throughput and export
+
+    Record fields:
+        file, worker: The file (or batch) and the host:pid:thread which processed it
+        queue_wait: Seconds between submission and the task starting
+        resolve_time: Seconds spent resolving remote URLs (mdh)
+        open_time: Seconds spent opening files
+        read_time: Seconds spent in tree.arrays, which fetches, decompresses and interprets baskets
+        read_bytes: Compressed bytes of the branches read
+        events: Number of events imported
+        wall_time, cpu_time: Task wall time, and CPU time of the worker thread
+        rss_delta: Change in worker resident memory over the task (bytes). Process workers only: None 
+            for threads, which share the process memory with the other tasks running at the same time.
+    """
+
+    def __init__(self, verbosity=1):
+        """Initialise the telemetry
+
+        Args:
+            verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+        """
+        self.records = []
+        self.start = time.time()
+        self.end = None
+
+        # Start logger
+        self.logger = Logger(
+            print_prefix = "[pytelemetry]",
+            verbosity = verbosity
+        )
+
+    def add_record(self, record):
+        """Add a completed task record"""
+        self.records.append(record)
+        self.end = time.time()
+
+    def summary(self):
+        """Aggregate the records
+
+        Returns:
+            dict: Totals, throughput (events/s, MB/s over the run wall time) and mean per-task timings
+        """
+        wall_time = (self.end or time.time()) - self.start
+        n_tasks = len(self.records)
+        events = sum(record.get("events", 0) for record in self.records)
+        read_bytes = sum(record.get("read_bytes", 0) for record in self.records)
+        task_time = sum(record.get("wall_time", 0) for record in self.records)
+        cpu_time = sum(record.get("cpu_time", 0) for record in self.records)
+
+        def mean(key):
+            return statistics.fmean(record.get(key, 0) for record in self.records) if n_tasks else 0.0
+
+        return {
+            "tasks": n_tasks,
+            "wall_time": wall_time,
+            "events": events,
+            "read_mb": read_bytes / 1024**2,
+            "events_per_s": events / wall_time if wall_time > 0 else 0.0,
+            "mb_per_s": read_bytes / 1024**2 / wall_time if wall_time > 0 else 0.0,
+            "mean_queue_wait": mean("queue_wait"),
+            "mean_resolve_time": mean("resolve_time"),
+            "mean_open_time": mean("open_time"),
+            "mean_read_time": mean("read_time"),
+            "mean_task_time": mean("wall_time"),
+            # Near 1 when tasks are compute bound, near 0 when they wait on I/O
+            "cpu_fraction": cpu_time / task_time if task_time > 0 else 0.0
+        }
+
+    def log_summary(self):
+        """Print a short summary of the run"""
+        summary = self.summary()
+        self.logger.log(
+            f"Processed {summary['tasks']} tasks in {summary['wall_time']:.1f}s:"
+            f"\n\t{summary['events_per_s']:.0f} events/s, {summary['mb_per_s']:.1f} MB/s"
+            f"\n\tmean open {summary['mean_open_time']:.2f}s, read {summary['mean_read_time']:.2f}s, queue wait {summary['mean_queue_wait']:.2f}s"
+            f"\n\tCPU fraction {summary['cpu_fraction']:.2f} ({'CPU' if summary['cpu_fraction'] > 0.5 else 'I/O'} bound)",
+            "info"
+        )
+
+    def write_jsonl(self, path):
+        """Write one JSON line per task record"""
+        with open(path, "w") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+        self.logger.log(f"Wrote {len(self.records)} task records to {path}", "success")
+
+    def write_prometheus(self, path, job="pyutils"):
+        """Write the summary in the Prometheus textfile collector format"""
+        summary = self.summary()
+        lines = []
+        for key, value in summary.items():
+            name = f"pyutils_processor_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f'{name}{{job="{job}"}} {value}')
+        # Write then rename, so the collector never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        self.logger.log(f"Wrote Prometheus metrics to {path}", "success")
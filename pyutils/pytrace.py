@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+import os
+import json
+import glob
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+from .pylogger import Logger
+
+# Tracing is switched on through the environment, so spawned worker processes inherit it
+TRACE_DIR_VAR = "PYUTILS_TRACE_DIR"
+
+_trace_dir = os.environ.get(TRACE_DIR_VAR)
+_events = [] # Buffered events for this process
+_events_lock = threading.Lock()
+_named_threads = set()
+
+def enabled():
+    """Whether tracing is switched on in this process"""
+    return _trace_dir is not None
+
+def enable(trace_dir):
+    """Switch on tracing, in this process and any worker processes started afterwards
+
+    Args:
+        trace_dir (str): Directory collecting the per-process event files
+    """
+    global _trace_dir
+    os.makedirs(trace_dir, exist_ok=True)
+    os.environ[TRACE_DIR_VAR] = trace_dir
+    _trace_dir = trace_dir
+
+def disable():
+    """Switch off tracing, flushing anything buffered first"""
+    global _trace_dir
+    flush()
+    os.environ.pop(TRACE_DIR_VAR, None)
+    _trace_dir = None
+
+@contextmanager
+def span(name, category="pyutils", **args):
+    """Record the block as a span on the timeline
+
+    Args:
+        name (str): Span name, e.g. "Reader.read_file"
+        category (str, opt): Trace category. Defaults to "pyutils".
+        **args: Extra values shown with the span
+    """
+    if _trace_dir is None:
+        yield
+        return
+    thread = threading.current_thread()
+    tid = threading.get_ident()
+    if tid not in _named_threads:
+        _named_threads.add(tid)
+        with _events_lock:
+            _events.append({"ph": "M", "name": "thread_name", "pid": os.getpid(), "tid": tid, "args": {"name": thread.name}})
+    start = time.time()
+    try:
+        yield
+    finally:
+        end = time.time()
+        event = {
+            "ph": "X",
+            "name": name,
+            "cat": category,
+            "ts": start * 1e6, # Wall clock microseconds, comparable across processes
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": {key: str(value) for key, value in args.items()}
+        }
+        with _events_lock:
+            _events.append(event)
+
+def traced(name=None, category="pyutils"):
+    """Decorator recording each call as a span, costing one check when tracing is off
+
+    Args:
+        name (str, opt): Span name. Defaults to the function's qualified name.
+        category (str, opt): Trace category. Defaults to "pyutils".
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace_dir is None:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def flush():
+    """Append this process's buffered events to its file in the trace directory"""
+    global _events
+    if _trace_dir is None or not _events:
+        return
+    # Written under the lock, so that threads flushing at once do not interleave their lines
+    with _events_lock:
+        events, _events = _events, []
+        with open(os.path.join(_trace_dir, f"trace_{os.getpid()}.jsonl"), "a") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+def write_chrome_trace(output_path, trace_dir=None, verbosity=1):
+    """Merge the per-process event files into one Chrome trace-event JSON file
+
+    Open the result in chrome://tracing or https://ui.perfetto.dev
+
+    Args:
+        output_path (str): Output JSON file
+        trace_dir (str, opt): Trace directory. Defaults to the active one.
+        verbosity (int, opt): Level of output detail (0: errors only, 1: info & warnings, 2: max)
+    """
+    logger = Logger(print_prefix="[pytrace]", verbosity=verbosity)
+    flush()
+    trace_dir = trace_dir or _trace_dir
+    events = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, "trace_*.jsonl"))):
+        with open(path, "r") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    with open(output_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    logger.log(f"Wrote {len(events)} trace events to {output_path}", "success")
+    return output_path
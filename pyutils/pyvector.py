@@ -58,7 +58,7 @@ class Vector:
                 self.logger.log(f"Failed to create 3D vector: {e}", "error")
                 return None
 
-        self.logger.log(f"Created 3D '{vector_name}' vector", "success")
+        self.logger.log("Created 3D '%s' vector", "success", vector_name)
         if self.verbosity > 1:
             vector.type.show()
             
@@ -81,7 +81,7 @@ class Vector:
             self.logger.log(f"Failed to get vector magnitude: {e}", "error")
             return None
         
-        self.logger.log(f"Got '{vector_name}' magnitude", "success")
+        self.logger.log("Got '%s' magnitude", "success", vector_name)
         if self.verbosity > 1:
             mag.type.show()
         
@@ -104,7 +104,7 @@ class Vector:
             self.logger.log(f"Failed to get vector rho: {e}", "error")
             return None
         
-        self.logger.log(f"Got '{vector_name}' rho", "success")
+        self.logger.log("Got '%s' rho", "success", vector_name)
         if self.verbosity > 1:
             r.type.show()
         
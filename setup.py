@@ -9,4 +9,7 @@ setup(
     packages=["pyutils"],
     package_data={"pyutils": ["mu2e.mplstyle"]},  
     include_package_data=True,
+    entry_points={
+        "console_scripts": ["pyutils-run=pyutils.pyrun:main"],
+    },
 )
@@ -7,11 +7,15 @@ mp.set_start_method("spawn", force=True)
 
 # pyutils classes
 from pyutils.pyread import Reader                  # Data reading 
-from pyutils.pyprocess import Processor, Skeleton  # Data processing
+from pyutils.pyprocess import Processor, Skeleton, Multiplexer # Data processing
+from pyutils.pymanifest import Manifest            # SAM file lists and metadata
+from pyutils.pyskim import Skimmer, read_provenance # Skims of selected events
+from pyutils import pystore                         # Memory-mapped array storage
 from pyutils.pyimport import Importer              # TTree (EventNtuple) importing 
 from pyutils.pyplot import Plot                    # Plotting and visualisation 
 from pyutils.pyprint import Print                  # Array visualisation 
 from pyutils.pyselect import Select                # Data selection and cut management 
+from pyutils.pycut import CutManager, CutVariations # Cut management and variations
 from pyutils.pyvector import Vector                # Element wise vector operations
 from pyutils.pylogger import Logger                # Printout manager
 
@@ -25,6 +29,56 @@ class MyProcessor(Skeleton):
         self.use_processes=True
     def process_file(self, file_name):
         return file_name 
+
+def log_from_worker(file_name):
+    from pyutils.pylogger import log_context
+    with log_context(file_name):
+        for _ in range(3):
+            Logger(print_prefix="[worker]", verbosity=1).log("Same warning every time", "warning")
+    return file_name
+
+def slow_worker(file_name):
+    import time
+    time.sleep(0.2)
+    return file_name
+
+def sleepy_worker(file_name):
+    import time
+    time.sleep(float(file_name.split("s_")[0])) # e.g. "0.5s_1.root" sleeps for 0.5s
+    return file_name
+
+def straggling_worker(file_name, marker_dir):
+    import os, time
+    marker = os.path.join(marker_dir, os.path.basename(file_name))
+    if "straggler" in file_name and not os.path.exists(marker):
+        open(marker, "w").close()
+        time.sleep(30) # Only the first attempt hangs
+    else:
+        time.sleep(0.1)
+    return file_name
+
+def failing_worker(file_name):
+    import os
+    return None if "bad" in file_name else os.path.basename(file_name)
+
+def numpy_worker(file_name):
+    import numpy as np
+    return float(np.sort(np.random.default_rng(0).random(10000)).sum())
+
+def spinning_worker(file_name):
+    import time
+    end = time.thread_time() + 0.2 # CPU time, holding the GIL throughout
+    while time.thread_time() < end:
+        pass
+    return file_name
+
+class MyArrayProcessor(Skeleton):
+    def __init__(self, file_list_path, branches):
+        super().__init__()
+        self.file_list_path=file_list_path
+        self.branches=branches
+    def process_array(self, data, file_name):
+        return len(data)
             
 class Tester:
     """ Tests for pyutils """
@@ -44,6 +98,8 @@ class Tester:
         self.local_file_list = "tests/MDS_local.txt"
         self.bad_local_file_list = "tests/MDS_local_corrupted.txt"
         self.remote_file_list = "tests/MDS_remote.txt"
+        self.fake_samweb = "tests/bin/samweb"
+        self.fake_get_token = "tests/bin/getToken"
         self.defname = "nts.mu2e.ensembleMDS3aOnSpillTriggered.MDC2025-001.root"
         
         # Setup logger 
@@ -56,6 +112,7 @@ class Tester:
     def _safe_test(self, test_name, test_function, *args, expect_return=True, **kwargs):
         """Wrapper to safely run tests and count errors"""
         self.test_count += 1
+        result = None
         try:
             self.logger.log(f"Running test: {test_name}", "test")
             result = test_function(*args, **kwargs)            
@@ -96,7 +153,73 @@ class Tester:
         # Read
         return reader.read_file(file_path=self.remote_file_name)  
     
-    def _test_reader(self, local_read=True, remote_read=True): 
+    def _hold_concurrently(self, hold, n_threads=6):
+        """Run hold() from several threads at once, returning the most that were inside it together"""
+        import time, threading
+        lock = threading.Lock()
+        state = {"inside": 0, "peak": 0}
+        def work():
+            with hold():
+                with lock:
+                    state["inside"] += 1
+                    state["peak"] = max(state["peak"], state["inside"])
+                time.sleep(0.1)
+                with lock:
+                    state["inside"] -= 1
+        threads = [threading.Thread(target=work) for _ in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return state["peak"]
+
+    def _limiter_open_slots(self):
+        import tempfile
+        from pyutils._limiter import EndpointLimiter
+        limiter = EndpointLimiter(max_opens=2, lock_dir=tempfile.mkdtemp(), poll_interval=0.01)
+        # Never more than max_opens at once, and the cap is reached
+        peak = self._hold_concurrently(lambda: limiter.open_slot("local"))
+        assert peak == 2, f"{peak} opens at once"
+        return peak
+
+    def _limiter_inflight_budget(self):
+        import tempfile
+        from pyutils._limiter import EndpointLimiter
+        limiter = EndpointLimiter(max_inflight_mb=1, lock_dir=tempfile.mkdtemp(), poll_interval=0.01)
+        # Two 0.4 MB reads fit in the 1 MB budget, a third waits
+        peak = self._hold_concurrently(lambda: limiter.reserve_bytes("local", 0.4 * 1024**2))
+        assert peak == 2, f"{peak} reads in flight at once"
+        # A read larger than the whole budget still goes through on an idle endpoint
+        with limiter.reserve_bytes("local", 5 * 1024**2):
+            pass
+        return peak
+
+    def _limiter_stale_reservation(self):
+        import os, json, tempfile, threading, subprocess
+        from pyutils._limiter import EndpointLimiter
+        lock_dir = tempfile.mkdtemp()
+        limiter = EndpointLimiter(max_inflight_mb=1, lock_dir=lock_dir, poll_interval=0.01)
+        # A reservation filling the budget, left by a process which has exited
+        dead = subprocess.Popen(["true"])
+        dead.wait()
+        state_path = os.path.join(lock_dir, "local", "inflight.json")
+        os.makedirs(os.path.dirname(state_path))
+        with open(state_path, "w") as f:
+            json.dump({f"{dead.pid}:0:stale": 1024**2}, f)
+        reservations = {}
+        def reserve():
+            with limiter.reserve_bytes("local", 0.5 * 1024**2):
+                with open(state_path, "r") as f:
+                    reservations.update(json.load(f))
+        thread = threading.Thread(target=reserve, daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        # The stale entry was dropped rather than blocking the read
+        assert not thread.is_alive(), "Blocked by a reservation from a dead process"
+        assert list(reservations) and not any(token.startswith(f"{dead.pid}:") for token in reservations)
+        return reservations
+
+    def _test_reader(self, local_read=True, remote_read=True, limiter=True): 
         """Test pyread:Reader module"""
         self.logger.log("Testing pyread:Reader", "test")  
         
@@ -106,6 +229,11 @@ class Tester:
         if remote_read: 
             self._safe_test("pyread:Reader::read_file (remote)", self._remote_read)
 
+        if limiter:
+            self._safe_test("pyread:EndpointLimiter:open_slot (max_opens cap)", self._limiter_open_slots)
+            self._safe_test("pyread:EndpointLimiter:reserve_bytes (max_inflight_mb budget)", self._limiter_inflight_budget)
+            self._safe_test("pyread:EndpointLimiter:reserve_bytes (stale reservation cleanup)", self._limiter_stale_reservation)
+
     ###### pyimport ######
 
     def _local_import_branch(self):
@@ -141,7 +269,7 @@ class Tester:
     
     def _remote_import_branch(self):
         importer = Importer(
-            file_name =,
+            file_name = self.remote_file_name,
             branches = ["event"],
             use_remote=True,
             location="tape",
@@ -172,6 +300,96 @@ class Tester:
         )
 
         return importer.import_branches()
+
+    def _local_import_all_split_branches(self):
+        result = self._local_import_all_branches()
+        # Split branches come back once, under their own names rather than "parent/leaf" paths
+        assert not any("/" in field for field in result.fields)
+        assert len(result.fields) == len(set(result.fields))
+        return result
+
+    def _local_import_joined_trees(self):
+        importer = Importer(
+            file_name = self.local_file_path,
+            branches = {
+                "nt" : ["event"],
+                "crv" : {"evt" : ["event"], "crv" : ["crvcoincs.nHits"]}
+            },
+            tree_path = {"nt" : "EventNtuple/ntuple", "crv" : "EventNtuple/ntuple"},
+            use_remote=False,
+            verbosity = self.verbosity
+        )
+        result = importer.import_branches()
+        # Entries line up by index
+        assert result["nt"]["event"].to_list() == result["crv"]["evt"]["event"].to_list()
+        return result
+
+    def _local_import_joined_by_key(self):
+        import os, tempfile
+        import numpy as np
+        import awkward as ak
+        import uproot
+        file_name = os.path.join(tempfile.mkdtemp(), "joined.root")
+        events = np.arange(10, dtype=np.int32)
+        # The second tree is reordered, misses events 3 and 7, repeats event 5 and has extra events 100 and 101
+        crv_events = np.array([9, 8, 5, 6, 5, 4, 100, 2, 1, 101, 0], dtype=np.int32)
+        with uproot.recreate(file_name) as file:
+            file.mktree("EventNtuple/ntuple", {"run": np.int32, "subrun": np.int32, "event": np.int32, "x": np.float64})
+            file["EventNtuple/ntuple"].extend({"run": np.full(10, 1201, dtype=np.int32), "subrun": events // 5, "event": events, "x": events * 0.5})
+            file.mktree("EventNtuple/crv", {"run": np.int32, "subrun": np.int32, "event": np.int32, "nhits": np.int32})
+            file["EventNtuple/crv"].extend({"run": np.full(11, 1201, dtype=np.int32), "subrun": crv_events // 5, "event": crv_events, "nhits": crv_events * 10 + (np.arange(11) == 4)})
+        tree_path = {"nt": "EventNtuple/ntuple", "crv": "EventNtuple/crv"}
+        join_on = ("run", "subrun", "event")
+        importer = Importer(file_name=file_name, branches={"nt": ["event", "x"], "crv": ["event", "nhits"]}, 
+            tree_path=tree_path, join_on=join_on, verbosity=self.verbosity)
+        result = importer.import_branches()
+        # The reference order is kept, with None where the other tree has no matching key (and the first of repeated keys)
+        assert result["nt"]["event"].to_list() == events.tolist()
+        assert result["crv"]["nhits"].to_list() == [0, 10, 20, None, 40, 50, 60, None, 80, 90]
+        assert result["crv"].layout.is_option and ak.is_none(result["crv"]).to_list() == [i in (3, 7) for i in range(10)]
+        # Only the reference tree follows the entry range, the other is searched whole
+        importer = Importer(file_name=file_name, branches={"nt": ["event"], "crv": ["nhits"]}, 
+            tree_path=tree_path, join_on=join_on, entry_start=8, verbosity=self.verbosity)
+        assert importer.import_branches()["crv"]["nhits"].to_list() == [80, 90]
+        # A reordered copy of the reference matches every entry, so no option type is needed
+        importer = Importer(file_name=file_name, branches={"nt": ["x"], "copy": ["event", "x"]}, 
+            tree_path={"nt": "EventNtuple/ntuple", "copy": "EventNtuple/ntuple"}, join_on=join_on, verbosity=self.verbosity)
+        copy = importer.import_branches()
+        assert copy["copy"]["x"].to_list() == copy["nt"]["x"].to_list() and not copy["copy"].layout.is_option
+        # Joining by entry index needs equal lengths
+        importer = Importer(file_name=file_name, branches={"nt": ["event"], "crv": ["event"]}, 
+            tree_path=tree_path, verbosity=self.verbosity)
+        try:
+            importer.import_branches()
+            raise AssertionError("Trees with different lengths were joined by index")
+        except ValueError:
+            pass
+        return result
+
+    def _local_import_rntuple(self):
+        import os, tempfile
+        import numpy as np
+        import awkward as ak
+        import uproot
+        file_name = os.path.join(tempfile.mkdtemp(), "rntuple.root")
+        data = ak.Array({
+            "event": np.arange(100, dtype=np.int32),
+            "trk": ak.zip({"pdg": ak.unflatten(np.full(200, 11, dtype=np.int32), np.full(100, 2)), "mom": ak.unflatten(np.linspace(90, 110, 200), np.full(100, 2))})
+        })
+        with uproot.recreate(file_name) as file:
+            if not hasattr(file, "mkrntuple"):
+                self.logger.log("Skipping RNTuple import: this uproot cannot write RNTuples (needs 5.6+)", "warning")
+                return "skipped"
+            file.mkrntuple("ntuple", data)
+        importer = Importer(file_name=file_name, branches=["event", "trk"], tree_path="ntuple", verbosity=self.verbosity)
+        result = importer.import_branches()
+        assert result["event"].to_list() == data["event"].to_list()
+        assert result["trk"]["mom"].to_list() == data["trk"]["mom"].to_list()
+        # Sized from the page list, so plans and the byte limiter see the data
+        with uproot.open(file_name) as file:
+            sizes = importer.branch_sizes(file["ntuple"])
+        assert set(sizes) == {"event", "trk"} and all(compressed > 0 and uncompressed > 0 for compressed, uncompressed in sizes.values())
+        return result
     
     def _test_importer(
         self, 
@@ -179,7 +397,10 @@ class Tester:
         local_import_special_branch=True,
         remote_import_branch=True,
         local_import_grouped_branches=True,
-        local_import_all_branches=True 
+        local_import_all_branches=True,
+        local_import_joined_trees=True,
+        local_import_joined_by_key=True,
+        local_import_rntuple=True
     ):
         """Test pyimport:Importer module"""
         self.logger.log("Testing pyimport:Importer", "info")  
@@ -201,6 +422,18 @@ class Tester:
         if local_import_all_branches:
             self._safe_test("pyimport:Importer:import_branches (local, all branches)", self._local_import_all_branches)
 
+        if local_import_all_branches:
+            self._safe_test("pyimport:Importer:import_branches (local, all split branches)", self._local_import_all_split_branches)
+
+        if local_import_joined_trees:
+            self._safe_test("pyimport:Importer:import_branches (local, joined trees)", self._local_import_joined_trees)
+
+        if local_import_joined_by_key:
+            self._safe_test("pyimport:Importer:import_branches (local, trees joined on keys)", self._local_import_joined_by_key)
+
+        if local_import_rntuple:
+            self._safe_test("pyimport:Importer:import_branches (local, RNTuple)", self._local_import_rntuple)
+
         # if remote_wideband_import_branch:
         #     self._safe_test("pyimport:Importer:import_branches (remote, wideband, single branch)", self._remote_wideband_import_branch)
             
@@ -282,6 +515,21 @@ class Tester:
         )
         return processor.get_file_list(defname=self.defname)
 
+    def _fake_sam_get_file_list(self):
+        manifest = Manifest(samweb=self.fake_samweb, verbosity=self.verbosity)
+        file_list = manifest.get_file_list(defname=self.defname, refresh=True)
+        # Check natural (sort -V) ordering and that the cache returns the same list
+        assert file_list[0].endswith("00000001.root") and file_list[-1].endswith("00000100.root")
+        assert manifest.get_file_list(defname=self.defname) == file_list
+        return file_list
+
+    def _fake_sam_get_metadata(self):
+        manifest = Manifest(samweb=self.fake_samweb, batch_size=2, verbosity=self.verbosity)
+        file_list = manifest.get_file_list(defname=self.defname)
+        metadata = manifest.get_metadata(file_list, refresh=True)
+        assert all(metadata[f]["size"] and metadata[f]["entries"] for f in file_list)
+        return metadata
+
     def _basic_multithread(self):
         processor = Processor(
             verbosity=self.verbosity
@@ -311,6 +559,36 @@ class Tester:
             branches = ["event"]
         )
         
+    def _validated_bad_multithread(self):
+        processor = Processor(
+            verbosity=self.verbosity
+        )
+        return processor.process_data(
+            file_list_path=self.bad_local_file_list,
+            branches = ["event"],
+            validate=True
+        )
+
+    def _validate_files(self):
+        processor = Processor(
+            verbosity=self.verbosity
+        )
+        file_list = processor.get_file_list(file_list_path=self.bad_local_file_list)
+        good_files, rejected = processor.validate_files(file_list, use_cache=False)
+        assert len(good_files) + len(rejected) == len(file_list)
+        return good_files
+
+    def _local_plan(self):
+        processor = Processor(
+            verbosity=self.verbosity
+        )
+        plan = processor.plan(
+            file_list_path=self.local_file_list,
+            branches = ["event"]
+        )
+        assert plan["read_mb"] > 0 and plan["max_workers"] >= 1
+        return plan
+
     def _basic_multiprocess(self):
         processor = Processor(
             verbosity=self.verbosity, 
@@ -343,6 +621,540 @@ class Tester:
         my_processor = MyProcessor(self.local_file_list, True)
         return my_processor.execute()
 
+    def _cached_multithread(self):
+        my_processor = MyProcessor(self.local_file_list, False)
+        my_processor.cache_results = True
+        first = my_processor.execute()
+        # Second pass is served from the cache
+        assert sorted(my_processor.execute()) == sorted(first)
+        my_processor.clear_cache()
+        return first
+
+    def _cached_with_objects(self):
+        # Helper objects have default reprs with memory addresses, which must not reach the cache key
+        keys = []
+        for _ in range(2):
+            my_processor = MyProcessor(self.local_file_list, False)
+            my_processor.cache_results = True
+            my_processor.selector = Select(verbosity=0)
+            my_processor.vector = Vector(verbosity=0)
+            results = my_processor.execute()
+            keys.append(my_processor._analysis_key())
+        assert keys[0] == keys[1]
+        my_processor.clear_cache()
+        return results
+
+    def _incremental_multithread(self):
+        import os, tempfile
+        my_processor = MyProcessor(self.local_file_list, False)
+        my_processor.state_path = os.path.join(tempfile.mkdtemp(), "state.pkl")
+        first = my_processor.execute()
+        # Nothing new, so the stored result comes straight back
+        assert sorted(my_processor.execute()) == sorted(first)
+        return first
+
+    def _incremental_sam_definition(self):
+        import os, tempfile
+        work_dir = tempfile.mkdtemp()
+        extra_path = os.path.join(work_dir, "extra_files.txt")
+        saved = {key: os.environ.get(key) for key in ("PATH", "FAKE_SAMWEB_EXTRA_FILES")}
+        os.environ["PATH"] = os.path.abspath(os.path.dirname(self.fake_samweb)) + os.pathsep + os.environ["PATH"]
+        os.environ["FAKE_SAMWEB_EXTRA_FILES"] = extra_path
+        try:
+            my_processor = MyProcessor(None, False)
+            my_processor.use_processes = False
+            my_processor.defname = f"incremental.{os.path.basename(work_dir)}"
+            my_processor.state_path = os.path.join(work_dir, "state.pkl")
+            first = my_processor.execute()
+            assert len(first) == 5
+            # A file added to the definition within the manifest TTL is still picked up
+            with open(extra_path, "w") as f:
+                f.write("nts.mu2e.fakeDataset.MDC2025-001.001430_00000200.root\n")
+            second = my_processor.execute()
+            assert sorted(second) == sorted(first + ["nts.mu2e.fakeDataset.MDC2025-001.001430_00000200.root"])
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        return second
+
+    def _multiplexed_multithread(self):
+        multiplexer = Multiplexer({
+            "event": MyArrayProcessor(self.local_file_list, ["event"]),
+            "crv": MyArrayProcessor(self.local_file_list, {"evt": ["event"], "crv": ["crvcoincs.nHits"]})
+        })
+        results = multiplexer.execute()
+        # Both analyses see every event from the one shared import
+        assert sum(results["event"]) == sum(results["crv"]) > 0
+        return results
+
+    def _skimmed_multithread(self):
+        import tempfile
+        skimmer = Skimmer(tempfile.mkdtemp(), branches=["event"], verbosity=self.verbosity)
+        processor = Processor(verbosity=self.verbosity)
+        summaries = processor.process_data(file_list_path=self.local_file_list, custom_worker_func=skimmer)
+        skimmer.write_manifest(summaries)
+        # One skim per input file, each recording where it came from
+        provenance = read_provenance(summaries[0]["output"])
+        assert provenance["events_out"] == summaries[0]["events_out"]
+        return summaries
+
+    def _skimmed_root(self):
+        import tempfile, uproot
+        skimmer = Skimmer(tempfile.mkdtemp(), branches=["event"], output_format="root", verbosity=self.verbosity)
+        data = self._local_process_file()
+        summary = skimmer.write(data, self.local_file_path, mask=data["event"] % 2 == 0)
+        # A TTree which the Importer reads back
+        with uproot.open(summary["output"]) as file:
+            assert file[skimmer.tree_path].classname == "TTree"
+        skim = Importer(file_name=summary["output"], branches=["event"], tree_path=skimmer.tree_path, verbosity=self.verbosity).import_branches()
+        assert len(skim) == summary["events_out"]
+        assert read_provenance(summary["output"])["events_in"] == len(data)
+        return skim
+
+    def _stored_process_file(self):
+        import os, tempfile
+        data = self._local_process_file()
+        path = pystore.save(data, os.path.join(tempfile.mkdtemp(), "store"), verbosity=self.verbosity)
+        loaded = pystore.load(path, verbosity=self.verbosity)
+        assert loaded.to_list() == data.to_list()
+        return loaded
+
+    def _multiplexed_single_file(self):
+        analyses = {}
+        for name, branches in (("event", ["event"]), ("crv", {"evt": ["event"], "crv": ["crvcoincs.nHits"]})):
+            analyses[name] = MyArrayProcessor(None, branches)
+            analyses[name].file_name = self.local_file_path
+        results = Multiplexer(analyses).execute()
+        # One result per analysis, as for a single-file Skeleton
+        assert results["event"] == results["crv"] > 0
+        return results
+
+    def _sampled_multithread(self):
+        processor = Processor(verbosity=self.verbosity)
+        results, estimate = processor.process_data(file_list_path=self.local_file_list, branches=["event"], sample=100)
+        # Entry counts come from the file headers, so the sample scales up to the full list
+        assert estimate["scale"] is not None and estimate["total_entries"] >= estimate["entries"]
+        return results
+
+    def _async_iteration(self):
+        import asyncio
+        async def run():
+            processor = Processor(verbosity=self.verbosity)
+            job = processor.submit_async(file_list_path=self.local_file_list, branches=["event"])
+            received = [array async for array in job] # Each file as it completes
+            final = await job
+            assert len(received) == len(job.results) == len(final) > 0
+            return received
+        return asyncio.run(run())
+
+    def _async_cancel(self):
+        import asyncio, os, tempfile
+        file_list_path = os.path.join(tempfile.mkdtemp(), "files.txt")
+        with open(file_list_path, "w") as f:
+            f.write("\n".join(f"file_{i}.root" for i in range(20)) + "\n")
+        async def run():
+            processor = Processor(verbosity=self.verbosity)
+            job = processor.submit_async(file_list_path=file_list_path, custom_worker_func=slow_worker, max_workers=2)
+            async for _ in job:
+                job.cancel() # After the first result
+            await job
+            # Pending tasks never started
+            assert job.cancelled() and 0 < len(job.results) < 20
+            return job.results
+        return asyncio.run(run())
+
+    def _async_overlapping_jobs(self):
+        import asyncio
+        file_list = [f"0.3s_{i}.root" for i in range(4)]
+        async def run():
+            profiled = Processor(verbosity=self.verbosity).submit_async(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2, profile=True)
+            await asyncio.sleep(0.1)
+            # Tracing would switch on process-wide state while the first job's profiler is in use
+            try:
+                await Processor(verbosity=self.verbosity).submit_async(file_list=file_list, custom_worker_func=sleepy_worker, trace="overlap.json")
+                raise AssertionError("Overlapping traced job was not rejected")
+            except RuntimeError:
+                pass
+            # A job without process-wide options runs alongside
+            plain = Processor(verbosity=self.verbosity).submit_async(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2)
+            results = await asyncio.gather(profiled, plain)
+            assert all(sorted(result) == sorted(file_list) for result in results)
+            # ... and once the first job is done, the options are free again
+            processor = Processor(verbosity=self.verbosity)
+            await processor.submit_async(file_list=file_list[:1], custom_worker_func=sleepy_worker, profile=True)
+            assert processor.profile_report.n_tasks == 1
+            return results
+        return asyncio.run(run())
+
+    def _credentials_shared(self):
+        import os
+        from pyutils import _credentials
+        saved = os.environ.get("BEARER_TOKEN_FILE")
+        first = _credentials.acquire_shared(verbosity=self.verbosity)
+        second = _credentials.acquire_shared(verbosity=self.verbosity)
+        # Overlapping jobs share one manager, and the first to finish leaves the token variables alone
+        assert first is second
+        _credentials.release_shared()
+        assert os.environ.get("BEARER_TOKEN_FILE") == first.token_path and first._thread is not None
+        _credentials.release_shared()
+        assert os.environ.get("BEARER_TOKEN_FILE") == saved and first._thread is None
+        return first.token_path
+
+    def _pyrun_local(self):
+        import os, json, tempfile
+        from pyutils import pyrun
+        work_dir = tempfile.mkdtemp()
+        with open(os.path.join(work_dir, "pyrun_test_analysis.py"), "w") as f:
+            f.write(
+                "from pyutils.pyprocess import Skeleton\n"
+                "class EventCount(Skeleton):\n"
+                "    def process_array(self, data, file_name):\n"
+                "        return len(data)\n"
+                "    def postprocess(self, results):\n"
+                "        return {'events': sum(results)}\n"
+            )
+        spec = f"{os.path.join(work_dir, 'pyrun_test_analysis.py')}:EventCount"
+        output = os.path.join(work_dir, "output")
+        args = [spec, "--set", f"file_list_path={self.local_file_list}", "--set", 'branches=["event"]', "-o", output]
+        assert pyrun.main(args) == 0
+        with open(os.path.join(output, "events.json"), "r") as f:
+            assert json.load(f) > 0
+        assert os.path.exists(os.path.join(output, "metadata.json"))
+        # Bad constructor arguments are a configuration error, not a traceback
+        assert pyrun.main(args + ["--set", 'analysis_args={"bogus": 1}']) == 2
+        return True
+
+    def _pyrun_no_arg_constructor(self):
+        import os, json, tempfile
+        from pyutils import pyrun
+        work_dir = tempfile.mkdtemp()
+        with open(os.path.join(work_dir, "pyrun_no_arg_analysis.py"), "w") as f:
+            f.write(
+                "from pyutils.pyprocess import Skeleton\n"
+                "class FileNames(Skeleton):\n"
+                "    def __init__(self):\n"
+                "        super().__init__()\n"
+                "        self.use_processes = False\n"
+                "    def process_file(self, file_name):\n"
+                "        return file_name\n"
+                "    def postprocess(self, results):\n"
+                "        return {'files': sorted(results), 'verbosity': self.verbosity}\n"
+            )
+        file_list_path = os.path.join(work_dir, "files.txt")
+        with open(file_list_path, "w") as f:
+            f.write("file_0.root\nfile_1.root\n")
+        spec = f"{os.path.join(work_dir, 'pyrun_no_arg_analysis.py')}:FileNames"
+        output = os.path.join(work_dir, "output")
+        # No verbosity argument to pass, so it is set on the analysis instead
+        assert pyrun.main([spec, "--set", f"file_list_path={file_list_path}", "-o", output, "-v", "0"]) == 0
+        with open(os.path.join(output, "files.json"), "r") as f:
+            assert json.load(f) == ["file_0.root", "file_1.root"]
+        with open(os.path.join(output, "verbosity.json"), "r") as f:
+            assert json.load(f) == 0
+        return True
+
+    def _timeout_queued_tasks(self):
+        processor = Processor(verbosity=self.verbosity)
+        file_list = [f"0.6s_{i}.root" for i in range(6)]
+        # Tasks waiting in the pool's queue are not timed, so none of these 0.6s tasks times out
+        results = processor.process_data(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2, use_processes=True, task_timeout=1)
+        assert sorted(results) == sorted(file_list)
+        return results
+
+    def _timeout_hung_task(self):
+        import time
+        processor = Processor(verbosity=self.verbosity)
+        file_list = [f"0.1s_{i}.root" for i in range(4)] + ["60s_hung.root"]
+        start = time.time()
+        results = processor.process_data(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2, use_processes=True, task_timeout=1)
+        # The hung task counts as failed, and its worker is terminated rather than waited for
+        assert sorted(results) == sorted(file_list[:-1])
+        assert time.time() - start < 20
+        return results
+
+    def _speculative_straggler(self):
+        import time, tempfile, functools
+        processor = Processor(verbosity=self.verbosity)
+        file_list = [f"fast_{i}.root" for i in range(6)] + ["straggler.root"]
+        worker_func = functools.partial(straggling_worker, marker_dir=tempfile.mkdtemp())
+        start = time.time()
+        results = processor.process_data(file_list=file_list, custom_worker_func=worker_func, max_workers=2, use_processes=True, straggler_factor=3, speculative=True)
+        # The duplicate of the straggler finishes long before the original would have
+        assert sorted(results) == sorted(file_list)
+        assert time.time() - start < 20
+        return results
+
+    def _batched_failures(self):
+        import os, io, tempfile, contextlib
+        work_dir = tempfile.mkdtemp()
+        file_list = []
+        for i in range(10):
+            file_name = os.path.join(work_dir, f"{'bad' if 3 <= i <= 5 else 'good'}_{i}.root")
+            with open(file_name, "wb") as f:
+                f.write(b"\0" * int(0.3 * 1024**2))
+            file_list.append(file_name)
+        processor = Processor(verbosity=max(1, self.verbosity)) # The failure count is checked in the log
+        # Packed by size in order, the second batch holding only failing files
+        batches = processor._make_batches(file_list, batch_size_mb=1)
+        assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            results = processor.process_data(file_list=file_list, custom_worker_func=failing_worker, batch_size_mb=1)
+        # Per-file outputs are unpacked from the batches, and each failed file is counted
+        assert sorted(results) == sorted(os.path.basename(f) for f in file_list if "good" in f)
+        assert "3 of 10 files failed" in output.getvalue()
+        return results
+
+    def _telemetry_summary(self):
+        import os, json, tempfile
+        from pyutils.pytelemetry import Telemetry
+        telemetry = Telemetry(verbosity=self.verbosity)
+        for i in range(4):
+            telemetry.add_record({
+                "file": f"file_{i}.root", "events": 1000, "read_bytes": 1024**2, "queue_wait": 0.5,
+                "open_time": 0.1, "read_time": 0.4, "wall_time": 1.0, "cpu_time": 0.25, "rss_delta": None
+            })
+        telemetry.start, telemetry.end = 0.0, 2.0 # Fixed run wall time
+        summary = telemetry.summary()
+        assert summary["tasks"] == 4 and summary["events"] == 4000 and summary["read_mb"] == 4.0
+        assert summary["events_per_s"] == 2000.0 and summary["mb_per_s"] == 2.0
+        assert summary["mean_queue_wait"] == 0.5 and summary["mean_read_time"] == 0.4
+        assert summary["cpu_fraction"] == 0.25
+        # One JSON line per record, and one gauge per summary key
+        prefix = os.path.join(tempfile.mkdtemp(), "run")
+        telemetry.write_jsonl(f"{prefix}.jsonl")
+        with open(f"{prefix}.jsonl") as f:
+            records = [json.loads(line) for line in f]
+        assert [record["file"] for record in records] == [f"file_{i}.root" for i in range(4)]
+        telemetry.write_prometheus(f"{prefix}.prom", job="test")
+        with open(f"{prefix}.prom") as f:
+            lines = f.read().splitlines()
+        assert "# TYPE pyutils_processor_events_per_s gauge" in lines
+        assert 'pyutils_processor_events_per_s{job="test"} 2000.0' in lines
+        assert len(lines) == 2 * len(summary)
+        return summary
+
+    def _telemetry_process_data(self):
+        import os, tempfile
+        prefix = os.path.join(tempfile.mkdtemp(), "run")
+        file_list = [f"0.2s_{i}.root" for i in range(4)]
+        results = {}
+        for use_processes in (False, True):
+            processor = Processor(verbosity=self.verbosity)
+            results[use_processes] = processor.process_data(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2, use_processes=use_processes, telemetry=prefix)
+            records = processor.telemetry.records
+            assert sorted(record["file"] for record in records) == sorted(file_list)
+            assert all(record["wall_time"] >= 0.2 and record["queue_wait"] >= 0 for record in records)
+            # RSS is shared by threads, so the per-task change is only reported for processes
+            assert all((record["rss_delta"] is not None) == use_processes for record in records)
+            assert os.path.exists(f"{prefix}.jsonl") and os.path.exists(f"{prefix}.prom")
+        return results
+
+    def _profile_report(self):
+        from pyutils import pyprofile
+        report = pyprofile.ProfileReport(verbosity=self.verbosity)
+        for i in range(3):
+            result, stats = pyprofile.profile_call(numpy_worker, f"file_{i}.root")
+            assert result > 0 and stats is not None
+            report.add(stats)
+        # Another thread holding the profiler means no stats, which are skipped when merged
+        with pyprofile._PROFILE_LOCK:
+            result, stats = pyprofile.profile_call(numpy_worker, "busy.root")
+        assert result > 0 and stats is None
+        report.add(stats)
+        assert report.n_tasks == 3
+        # Calls from every task are merged into one entry per function
+        calls = [ncalls for (_, _, name), (_, ncalls, _, _, _) in report.stats.stats.items() if name == "numpy_worker"]
+        assert calls == [3], calls
+        breakdown = report.module_breakdown()
+        assert "numpy" in breakdown and list(breakdown.values()) == sorted(breakdown.values(), reverse=True)
+        text = report.format_report(n_lines=5)
+        assert text.startswith("Merged profile of 3 tasks") and "Self time by module" in text
+        return breakdown
+
+    def _profile_process_data(self):
+        file_list = [f"file_{i}.root" for i in range(4)]
+        processor = Processor(verbosity=self.verbosity)
+        results = processor.process_data(file_list=file_list, custom_worker_func=numpy_worker, max_workers=1, profile=True)
+        assert len(results) == 4 and processor.profile_report.n_tasks == 4
+        # One in every two tasks, profiled in the worker processes and merged in the parent
+        processor = Processor(verbosity=self.verbosity)
+        results = processor.process_data(file_list=file_list, custom_worker_func=numpy_worker, max_workers=2, use_processes=True, profile=2)
+        assert len(results) == 4 and processor.profile_report.n_tasks == 2
+        return results
+
+    def _calibrate_routing(self):
+        from unittest import mock
+        file_list = [f"0.2s_{i}.root" for i in range(8)]
+        # Waiting on I/O: threads, several per core
+        processor = Processor(verbosity=self.verbosity)
+        results = processor.process_data(file_list=file_list, custom_worker_func=sleepy_worker, use_processes="auto")
+        assert processor.calibration["use_processes"] is False and processor.calibration["cpu_fraction"] < 0.5
+        assert sorted(results) == sorted(file_list) # Calibration results are kept
+        # Holding the GIL: processes, given the cores to run them (pretended, so this runs anywhere)
+        file_list = [f"cpu_{i}.root" for i in range(8)]
+        with mock.patch("os.cpu_count", return_value=4):
+            processor = Processor(verbosity=self.verbosity)
+            results = processor.process_data(file_list=file_list, custom_worker_func=spinning_worker, use_processes="auto")
+        assert processor.calibration["use_processes"] is True and processor.calibration["cpu_fraction"] > 0.5
+        assert sorted(results) == sorted(file_list)
+        # ... but threads if the worker cannot be pickled
+        with mock.patch("os.cpu_count", return_value=4):
+            processor = Processor(verbosity=self.verbosity)
+            results = processor.process_data(file_list=file_list, custom_worker_func=lambda f: spinning_worker(f), use_processes="auto")
+        assert processor.calibration["use_processes"] is False and "cannot be sent" in processor.calibration["reason"]
+        assert sorted(results) == sorted(file_list)
+        return results
+
+    def _trace_timeline(self):
+        import os, json, tempfile, threading
+        from pyutils import pytrace
+        work_dir = tempfile.mkdtemp()
+        @pytrace.traced(name="traced_sleep")
+        def traced_sleep(file_name):
+            return sleepy_worker(file_name)
+        pytrace.enable(os.path.join(work_dir, "events"))
+        try:
+            # Several threads tracing and flushing at once
+            def run(i):
+                for j in range(5):
+                    traced_sleep(f"0.01s_{i}_{j}.root")
+                    pytrace.flush()
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            pytrace.write_chrome_trace(os.path.join(work_dir, "trace.json"), verbosity=self.verbosity)
+        finally:
+            pytrace.disable()
+        assert not pytrace.enabled() and pytrace.TRACE_DIR_VAR not in os.environ
+        with open(os.path.join(work_dir, "trace.json")) as f:
+            events = json.load(f)["traceEvents"]
+        spans = [event for event in events if event["ph"] == "X"]
+        assert len(spans) == 20 and all(span["name"] == "traced_sleep" and span["dur"] >= 1e4 for span in spans)
+        assert len({span["tid"] for span in spans}) == 4
+        # End to end, with a span for each task from the worker processes
+        trace_path = os.path.join(work_dir, "process_data.json")
+        file_list = [f"0.1s_{i}.root" for i in range(4)]
+        processor = Processor(verbosity=self.verbosity)
+        results = processor.process_data(file_list=file_list, custom_worker_func=sleepy_worker, max_workers=2, use_processes=True, trace=trace_path)
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+        tasks = [event for event in events if event["ph"] == "X" and event["name"] == "task"]
+        assert sorted(task["args"]["file"] for task in tasks) == sorted(file_list)
+        assert all(task["pid"] != os.getpid() for task in tasks)
+        return results
+
+    def _write_ntuples(self, work_dir, n_files, n_entries=1000, tree_path="EventNtuple/ntuple"):
+        """Write small EventNtuple-like files with uproot, for tests which do not need Mu2e data"""
+        import os
+        import numpy as np
+        import awkward as ak
+        import uproot
+        file_list = []
+        rng = np.random.default_rng(0)
+        for i in range(n_files):
+            file_name = os.path.join(work_dir, f"ntuple_{i}.root")
+            with uproot.recreate(file_name) as file:
+                tree = file.mktree(tree_path, {"event": np.int32, "x": "var * float64"})
+                tree.extend({
+                    "event": np.arange(i * n_entries, (i + 1) * n_entries, dtype=np.int32),
+                    "x": ak.unflatten(rng.random(3 * n_entries), np.full(n_entries, 3))
+                })
+            file_list.append(file_name)
+        return file_list
+
+    def _plan_unreadable_sample(self):
+        import os, tempfile
+        work_dir = tempfile.mkdtemp()
+        file_list = self._write_ntuples(work_dir, 3)
+        corrupted = os.path.join(work_dir, "corrupted.root")
+        with open(corrupted, "wb") as f:
+            f.write(b"root" + b"\0" * 1000)
+        file_list_path = os.path.join(work_dir, "files.txt")
+        with open(file_list_path, "w") as f:
+            f.write("\n".join(file_list + [corrupted, os.path.join(work_dir, "missing.root")]) + "\n")
+        processor = Processor(verbosity=self.verbosity)
+        plan = processor.plan(file_list_path=file_list_path, branches=["event", "x"])
+        # Estimated from the three good files, with the others reported
+        assert plan["sampled_files"] == 3 and plan["files"] == 5
+        assert plan["read_mb"] > 0 and any("2 of 5 sampled files" in warning for warning in plan["warnings"])
+        return plan
+
+    def _skim_jagged_mask_and_collisions(self):
+        import os, tempfile
+        import awkward as ak
+        work_dir = tempfile.mkdtemp()
+        data = ak.Array({"event": [1, 2, 3], "trk.pdg": [[11, 13], [13], [11]]})
+        skimmer = Skimmer(os.path.join(work_dir, "skims"), verbosity=self.verbosity)
+        # A per-track mask keeps every event with a passing track
+        summary = skimmer.write(data, "/data/a/file.root", mask=data["trk.pdg"] == 11)
+        assert summary["events_out"] == 2
+        assert ak.from_parquet(summary["output"])["event"].to_list() == [1, 3]
+        # Rewriting the same input is fine, but another input with the same base name is refused
+        skimmer.write(data, "/data/a/file.root")
+        try:
+            skimmer.write(data, "/data/b/file.root")
+            raise AssertionError("Output name collision was not detected")
+        except ValueError:
+            pass
+        # ... including when the worker would otherwise skip it as already skimmed
+        file_list = []
+        for sub_dir in ("a", "b"):
+            os.makedirs(os.path.join(work_dir, sub_dir))
+            file_list += self._write_ntuples(os.path.join(work_dir, sub_dir), 1, n_entries=10)
+        skimmer = Skimmer(os.path.join(work_dir, "worker_skims"), branches=["event"], verbosity=self.verbosity)
+        assert skimmer(file_list[0])["events_out"] == 10
+        try:
+            skimmer(file_list[1])
+            raise AssertionError("Output name collision was not detected")
+        except ValueError:
+            pass
+        assert read_provenance(skimmer.output_path(file_list[0]))["input_file"] == file_list[0]
+        return summary
+
+    def _credentials_refresh(self):
+        import os, tempfile, subprocess
+        from pyutils._credentials import CredentialManager
+        token_path = os.path.join(tempfile.mkdtemp(), "token")
+        env = dict(os.environ, BEARER_TOKEN_FILE=token_path, FAKE_TOKEN_LIFETIME="5")
+        subprocess.run([self.fake_get_token], env=env, check=True) # About to expire
+        saved = {key: os.environ.get(key) for key in ("BEARER_TOKEN_FILE", "BEARER_TOKEN")}
+        os.environ["BEARER_TOKEN"] = "inline"
+        try:
+            manager = CredentialManager(refresh_margin=60, token_path=token_path, token_cmd=self.fake_get_token, verbosity=self.verbosity)
+            with manager:
+                # Refreshed on start, since the token had less than the margin left
+                assert manager.seconds_left() > 3600
+                assert os.environ["BEARER_TOKEN_FILE"] == token_path and "BEARER_TOKEN" not in os.environ
+            # The caller's variables are back once stopped
+            assert os.environ.get("BEARER_TOKEN") == "inline" and os.environ.get("BEARER_TOKEN_FILE") == saved["BEARER_TOKEN_FILE"]
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        return manager.seconds_left()
+
+    def _credentials_backoff(self):
+        import os, time, tempfile
+        from pyutils._credentials import CredentialManager
+        token_path = os.path.join(tempfile.mkdtemp(), "token")
+        with open(token_path, "w") as f:
+            f.write("not a JWT")
+        manager = CredentialManager(refresh_margin=0.4, check_interval=0.05, token_path=token_path, verbosity=self.verbosity)
+        calls = []
+        manager.refresh = lambda: calls.append(time.time()) or False
+        with manager:
+            time.sleep(1.2)
+        # Unknown expiry backs off (0.05, 0.1, 0.2, 0.4, 0.4s...) rather than refreshing every check
+        assert 2 <= len(calls) <= 6, f"{len(calls)} refreshes"
+        return calls
+
     def _test_processor(
         self, 
         local_process_file=True,
@@ -350,7 +1162,8 @@ class Tester:
         remote_process_file=True,
         get_file_list=True,
         basic_multifile=True,
-        advanced_multifile=True
+        advanced_multifile=True,
+        job_control=True
     ):
         """Test pyprocess module"""
         if local_process_file:
@@ -370,12 +1183,18 @@ class Tester:
             self._safe_test("pyprocess:Processor:get_file_list (local file list path)", self._local_get_file_list)
             self._safe_test("pyprocess:Processor:get_file_list (remote file list path)", self._remote_get_file_list)
             self._safe_test("pyprocess:Processor:get_file_list (SAM definition)", self._sam_get_file_list)
+            self._safe_test("pymanifest:Manifest:get_file_list (fake samweb)", self._fake_sam_get_file_list)
+            self._safe_test("pymanifest:Manifest:get_metadata (fake samweb)", self._fake_sam_get_metadata)
             # self._safe_test("pyprocess:Processor:get_file_list (SAM definition)", self._sam_get_file_list_TEST)
 
         if basic_multifile:
             self._safe_test("pyprocess:Processor:process_data (basic multithread)", self._basic_multithread)
             self._safe_test("pyprocess:Processor:process_data (basic remote multithread)", self._basic_remote_multithread)
             # self._safe_test("pyprocess:Processor:process_data (basic bad multithread)", self._basic_bad_multithread)
+            self._safe_test("pyprocess:Processor:validate_files (bad file list)", self._validate_files)
+            self._safe_test("pyprocess:Processor:process_data (validated bad multithread)", self._validated_bad_multithread)
+            self._safe_test("pyprocess:Processor:plan (local file list)", self._local_plan)
+            self._safe_test("pyprocess:Processor:process_data (sampled events, local file list)", self._sampled_multithread)
             self._safe_test("pyprocess:Processor:process_data (basic multiprocess)", self._basic_multiprocess)
             self._safe_test("pyprocess:Processor:process_data (basic remote multiprocess)", self._basic_remote_multiprocess)
             # self._safe_test("pyprocess:Processor:process_data (basic remote multithread)", self._basic_remote_multiprocess)
@@ -383,6 +1202,37 @@ class Tester:
         if advanced_multifile:
             self._safe_test("pyprocess:Skeleton (advanced multithread)", self._advanced_multithread)
             self._safe_test("pyprocess:Skeleton (advanced multiprocess)", self._advanced_multiprocess)
+            self._safe_test("pyprocess:Skeleton (cached results)", self._cached_multithread)
+            self._safe_test("pyprocess:Skeleton (cached results, object attributes)", self._cached_with_objects)
+            self._safe_test("pyprocess:Skeleton (incremental)", self._incremental_multithread)
+            self._safe_test("pyprocess:Skeleton (incremental, files added to a SAM definition)", self._incremental_sam_definition)
+            self._safe_test("pyprocess:Multiplexer (two analyses, one pass)", self._multiplexed_multithread)
+            self._safe_test("pyprocess:Processor:submit_async (results as they complete)", self._async_iteration)
+            self._safe_test("pyprocess:Processor:submit_async (cancel)", self._async_cancel)
+            self._safe_test("pyrun:main (local file list)", self._pyrun_local)
+            self._safe_test("pyprocess:Multiplexer (two analyses, single file)", self._multiplexed_single_file)
+            self._safe_test("pyskim:Skimmer (per-file Parquet skims)", self._skimmed_multithread)
+            self._safe_test("pyskim:Skimmer (ROOT TTree skim)", self._skimmed_root)
+            self._safe_test("pystore:save/load (memory-mapped round trip)", self._stored_process_file)
+
+        if job_control: # Custom worker functions, no Mu2e data needed
+            self._safe_test("pyprocess:Processor:process_data (task_timeout, queued tasks)", self._timeout_queued_tasks)
+            self._safe_test("pyprocess:Processor:process_data (task_timeout, hung task)", self._timeout_hung_task)
+            self._safe_test("pyprocess:Processor:process_data (speculative straggler)", self._speculative_straggler)
+            self._safe_test("pyprocess:Processor:process_data (batched files, per-file failures)", self._batched_failures)
+            self._safe_test("pytelemetry:Telemetry (summary, jsonl and Prometheus export)", self._telemetry_summary)
+            self._safe_test("pyprocess:Processor:process_data (telemetry, threads and processes)", self._telemetry_process_data)
+            self._safe_test("pyprofile:ProfileReport (merged task profiles)", self._profile_report)
+            self._safe_test("pyprocess:Processor:process_data (profile, threads and processes)", self._profile_process_data)
+            self._safe_test("pyprocess:Processor:process_data (use_processes=\"auto\" calibration)", self._calibrate_routing)
+            self._safe_test("pytrace:write_chrome_trace (traced threads and worker processes)", self._trace_timeline)
+            self._safe_test("pyprocess:Processor:plan (unreadable sampled files)", self._plan_unreadable_sample)
+            self._safe_test("pyprocess:Processor:submit_async (overlapping jobs, process-wide options)", self._async_overlapping_jobs)
+            self._safe_test("pyrun:main (analysis without a verbosity argument)", self._pyrun_no_arg_constructor)
+            self._safe_test("pyskim:Skimmer (jagged masks, output name collisions)", self._skim_jagged_mask_and_collisions)
+            self._safe_test("_credentials:CredentialManager (refresh a token near expiry)", self._credentials_refresh)
+            self._safe_test("_credentials:CredentialManager (back off without a readable expiry)", self._credentials_backoff)
+            self._safe_test("_credentials:acquire_shared (one manager for overlapping jobs)", self._credentials_shared)
 
     ###### pyselect ######
 
@@ -415,6 +1265,35 @@ class Tester:
 
     def _has_n_hits(self, selector, data):
         return selector.has_n_hits(data, n_hits=1) 
+
+    def _cut_variations(self, selector, data):
+        import operator, functools
+        variations = CutVariations(verbosity=self.verbosity)
+        variations.add_cut("trkqual", "Track quality", lambda data, quality: selector.select_trkqual(data, quality=quality), quality=0.5)
+        variations.add_cut("nactive", "Active hits", lambda data, n_hits: selector.has_n_hits(data, n_hits=n_hits), n_hits=20)
+        # List-valued parameters
+        is_any = lambda data, particles: functools.reduce(operator.or_, [selector.is_particle(data, particle) for particle in particles])
+        variations.add_cut("particle", "Particle type", is_any, particles=["e-", "e+"])
+        variations.add_variation("tight", trkqual={"quality": 0.8}, nactive={"n_hits": 30})
+        variations.add_variation("no_nactive", nactive=None)
+        variations.add_variation("electrons", particle={"particles": ["e-"]})
+        results = variations.evaluate(data)
+        # Each variation's cut flow matches a CutManager given the same masks
+        expected_cuts = {
+            "nominal": (0.5, 20, ["e-", "e+"]), 
+            "tight": (0.8, 30, ["e-", "e+"]), 
+            "no_nactive": (0.5, None, ["e-", "e+"]),
+            "electrons": (0.5, 20, ["e-"])
+        }
+        for name, (quality, n_hits, particles) in expected_cuts.items():
+            cut_manager = CutManager(verbosity=0)
+            cut_manager.add_cut("trkqual", "Track quality", selector.select_trkqual(data, quality=quality))
+            if n_hits is not None:
+                cut_manager.add_cut("nactive", "Active hits", selector.has_n_hits(data, n_hits=n_hits))
+            cut_manager.add_cut("particle", "Particle type", is_any(data, particles))
+            expected = cut_manager.create_cut_flow(data)
+            assert [entry["events_passing"] for entry in results[name]["cut_flow"]] == [entry["events_passing"] for entry in expected]
+        return results
         
     def _test_select(
         self,
@@ -449,6 +1328,7 @@ class Tester:
         if trk_masks: 
             self._safe_test("pyselect:Selector:select_trkqual (local, single file)", self._select_trkqual, selector, data["v"])
             self._safe_test("pyselect:Selector:has_n_hits (local, single file)", self._has_n_hits, selector, data["v"])
+            self._safe_test("pycut:CutVariations:evaluate (local, single file)", self._cut_variations, selector, data["v"])
             
     ###### pyprint ######   
     
@@ -506,6 +1386,52 @@ class Tester:
             self._safe_test("pyvector:Vector:get_vector (local, single file, trksegs, mom)", self._get_mag, vector, data["trksegs"], "mom") 
             self._safe_test("pyvector:Vector:get_vector (local, single file, trksegs, pos)", self._get_mag, vector, data["trksegs"], "pos") 
             
+    ###### pylogger ######
+
+    def _lazy_logging(self):
+        import io, contextlib
+        formatted = []
+        class Expensive:
+            def __str__(self):
+                formatted.append(True)
+                return "expensive"
+        quiet = Logger(print_prefix="[pytest]", verbosity=0)
+        quiet.log("Value %s", "info", Expensive())
+        quiet.log(lambda: str(Expensive()), "max")
+        # Nothing below the active level is formatted
+        assert not formatted
+        loud = Logger(print_prefix="[pytest]", verbosity=2)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            loud.log("Value %s", "info", Expensive())
+            loud.log(lambda: str(Expensive()), "max")
+        assert len(formatted) == 2 and output.getvalue().count("expensive") == 2
+        return True
+
+    def _aggregated_logging(self):
+        import os, re, tempfile
+        from concurrent.futures import ProcessPoolExecutor
+        from pyutils.pylogger import LogListener, set_log_queue
+        output = os.path.join(tempfile.mkdtemp(), "logs.txt")
+        with LogListener(output=output) as listener:
+            with ProcessPoolExecutor(max_workers=2, initializer=set_log_queue, initargs=(listener.queue,)) as executor:
+                list(executor.map(log_from_worker, ["a.root", "b.root"]))
+        with open(output, "r") as f:
+            lines = f.read().splitlines()
+        # Printed once, tagged with the worker process and file, then counted at the end
+        tagged = [line for line in lines if "Same warning every time" in line and "(repeated" not in line]
+        assert len(tagged) == 1 and ("[a.root]" in tagged[0] or "[b.root]" in tagged[0])
+        worker_pid = int(re.search(r"\[(\d+):", tagged[0]).group(1))
+        assert worker_pid != os.getpid()
+        assert any("(repeated 5 more times)" in line for line in lines)
+        return lines
+
+    def _test_logger(self, lazy_logging=True, aggregated_logging=True):
+        """Test pylogger module"""
+        if lazy_logging:
+            self._safe_test("pylogger:Logger:log (lazy formatting below the level)", self._lazy_logging)
+        if aggregated_logging:
+            self._safe_test("pylogger:LogListener (dedup and tagging from worker processes)", self._aggregated_logging)
+
     ####### TODO: Add more test methods for plot ######
     
     def _test_plot(self):
@@ -515,7 +1441,7 @@ class Tester:
 
     def print_summary(self):
        """Print test summary"""
-       failed_tests_str = "\n".join([f"  - {test}" for test in self.failed_tests]) if self.failed_tests else ""
+       failed_tests_str = "Failed tests:\n" + "\n".join([f"  - {test}" for test in self.failed_tests]) if self.failed_tests else ""
        final_status = "🎉 All tests passed!" if self.error_count == 0 else f"⚠️ {self.error_count} test(s) failed"
        
        summary = f"""
@@ -525,7 +1451,7 @@ class Tester:
                 Total tests run: {self.test_count}
                 Passed: {self.test_count - self.error_count}
                 Failed: {self.error_count}
-                {f'Failed tests:\n{failed_tests_str}' if self.failed_tests else ''}
+                {failed_tests_str}
                 {final_status}"""
        
        self.logger.log(summary, "test")
@@ -540,7 +1466,8 @@ class Tester:
         test_select=False,
         test_plot=False,
         test_print=False,
-        test_vector=False
+        test_vector=False,
+        test_logger=False
         ): 
         """Run all specified tests"""
         
@@ -571,6 +1498,10 @@ class Tester:
         if test_vector:
             self.logger.log("************ Testing pyvector ************", "test")
             self._test_vector()
+
+        if test_logger:
+            self.logger.log("************ Testing pylogger ************", "test")
+            self._test_logger()
         
         # Print final summary
         self.print_summary()
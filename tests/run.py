@@ -11,6 +11,7 @@ Usage examples:
 """
 
 import os
+import sys
 import argparse
 import importlib.util
 from pyutils.pylogger import Logger
@@ -34,6 +35,8 @@ _this_dir = os.path.dirname(__file__)
 _pytest_path = os.path.join(_this_dir, "pytest.py")
 _spec = importlib.util.spec_from_file_location("local_pytest", _pytest_path)
 _local_pytest = importlib.util.module_from_spec(_spec)
+# Registered so that spawned worker processes can unpickle the test helpers
+sys.modules[_spec.name] = _local_pytest
 _spec.loader.exec_module(_local_pytest)
 
 Tester = _local_pytest.Tester
@@ -48,6 +51,7 @@ def main():
     parser.add_argument("--plot", action="store_true", help="Run plot tests")
     parser.add_argument("--print", dest="print_tests", action="store_true", help="Run print tests")
     parser.add_argument("--vector", action="store_true", help="Run vector tests")
+    parser.add_argument("--logger", action="store_true", help="Run logger tests")
     parser.add_argument("--all", action="store_true", help="Run all test groups")
 
     args = parser.parse_args()
@@ -64,6 +68,7 @@ def main():
             test_plot=True,
             test_print=True,
             test_vector=True,
+            test_logger=True,
         )
     else:
         result = tester.run(
@@ -74,6 +79,7 @@ def main():
             test_plot=args.plot,
             test_print=args.print_tests,
             test_vector=args.vector,
+            test_logger=args.logger,
         )
 
     if result: